@@ -0,0 +1,40 @@
+"""add next_review_at to student_topic_mastery
+
+Revision ID: 0cc1d7fd95fb
+Revises: b91c11dc32d3
+Create Date: 2026-10-19 15:52:40.771903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0cc1d7fd95fb'
+down_revision: Union[str, Sequence[str], None] = 'b91c11dc32d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('student_topic_mastery', sa.Column('next_review_at', sa.DateTime(), nullable=True))
+    op.create_index('ix_mastery_student_next_review', 'student_topic_mastery', ['student_id', 'next_review_at'], unique=False)
+    # Первичное расписание (формула из app/services/review_scheduler.py: 1..60 дней)
+    op.execute(
+        """
+        UPDATE student_topic_mastery
+        SET next_review_at = last_tested_at + interval '1 day' * power(
+            60.0, coalesce(mastery_level, 0) / 100 * (0.5 + 0.5 * coalesce(confidence, 0))
+        )
+        WHERE last_tested_at IS NOT NULL
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_mastery_student_next_review', table_name='student_topic_mastery')
+    op.drop_column('student_topic_mastery', 'next_review_at')
@@ -0,0 +1,33 @@
+"""add retest exam to learning sessions
+
+Revision ID: 1600aacddf98
+Revises: c7cd0ef5d5d3
+Create Date: 2026-10-19 20:58:27.904113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '1600aacddf98'
+down_revision: Union[str, Sequence[str], None] = 'c7cd0ef5d5d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('learning_sessions', sa.Column('retest_exam_id', sa.UUID(), nullable=True))
+    op.create_foreign_key(
+        'learning_sessions_retest_exam_id_fkey', 'learning_sessions', 'exams',
+        ['retest_exam_id'], ['id'], ondelete='SET NULL'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('learning_sessions_retest_exam_id_fkey', 'learning_sessions', type_='foreignkey')
+    op.drop_column('learning_sessions', 'retest_exam_id')
@@ -0,0 +1,38 @@
+"""add student_recommendations
+
+Revision ID: 295fb9e8f1ad
+Revises: 0cc1d7fd95fb
+Create Date: 2026-10-19 16:24:09.338215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '295fb9e8f1ad'
+down_revision: Union[str, Sequence[str], None] = '0cc1d7fd95fb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('student_recommendations',
+    sa.Column('student_id', sa.UUID(), nullable=False),
+    sa.Column('rank', sa.SmallInteger(), nullable=False),
+    sa.Column('topic_id', sa.UUID(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('reason', sa.String(length=50), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['student_id'], ['users.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['topic_id'], ['topics.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('student_id', 'rank')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('student_recommendations')
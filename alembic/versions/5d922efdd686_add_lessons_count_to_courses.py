@@ -0,0 +1,36 @@
+"""add lessons_count to courses
+
+Revision ID: 5d922efdd686
+Revises: cf58eacc3081
+Create Date: 2026-10-19 11:20:41.512307
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d922efdd686'
+down_revision: Union[str, Sequence[str], None] = 'cf58eacc3081'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('courses', sa.Column('lessons_count', sa.Integer(), server_default='0', nullable=False))
+    # Заполняем счетчик для уже существующих курсов
+    op.execute(
+        """
+        UPDATE courses SET lessons_count = sub.cnt
+        FROM (SELECT course_id, count(*) AS cnt FROM lessons GROUP BY course_id) AS sub
+        WHERE courses.id = sub.course_id
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('courses', 'lessons_count')
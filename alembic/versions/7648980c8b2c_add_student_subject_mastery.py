@@ -0,0 +1,55 @@
+"""add student_subject_mastery
+
+Revision ID: 7648980c8b2c
+Revises: 79081f287ac3
+Create Date: 2026-10-19 14:05:33.218764
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7648980c8b2c'
+down_revision: Union[str, Sequence[str], None] = '79081f287ac3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('student_subject_mastery',
+    sa.Column('student_id', sa.UUID(), nullable=False),
+    sa.Column('subject_id', sa.UUID(), nullable=False),
+    sa.Column('mastery_sum', sa.Float(), nullable=False),
+    sa.Column('tested_topics', sa.Integer(), nullable=False),
+    sa.Column('weighted_sum', sa.Float(), nullable=False),
+    sa.Column('attempts_total', sa.Integer(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['student_id'], ['users.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['subject_id'], ['subjects.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('student_id', 'subject_id')
+    )
+    # Бэкфилл (то же самое делает python -m app.services.mastery_aggregates)
+    op.execute(
+        """
+        INSERT INTO student_subject_mastery
+            (student_id, subject_id, mastery_sum, tested_topics, weighted_sum, attempts_total)
+        SELECT m.student_id, t.subject_id,
+               sum(coalesce(m.mastery_level, 0)),
+               count(*),
+               sum(coalesce(m.mastery_level, 0) * coalesce(m.attempts_count, 0)),
+               sum(coalesce(m.attempts_count, 0))
+        FROM student_topic_mastery m
+        JOIN topics t ON t.id = m.topic_id
+        WHERE m.attempts_count > 0
+        GROUP BY m.student_id, t.subject_id
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('student_subject_mastery')
@@ -0,0 +1,50 @@
+"""add topic_closure
+
+Revision ID: 79081f287ac3
+Revises: dca88c5df1f8
+Create Date: 2026-10-19 13:31:52.660174
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '79081f287ac3'
+down_revision: Union[str, Sequence[str], None] = 'dca88c5df1f8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('topic_closure',
+    sa.Column('ancestor_id', sa.UUID(), nullable=False),
+    sa.Column('descendant_id', sa.UUID(), nullable=False),
+    sa.Column('depth', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['ancestor_id'], ['topics.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['descendant_id'], ['topics.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id')
+    )
+    op.create_index('ix_topic_closure_descendant', 'topic_closure', ['descendant_id'], unique=False)
+    # Строим замыкание для существующих тем
+    op.execute(
+        """
+        INSERT INTO topic_closure (ancestor_id, descendant_id, depth)
+        WITH RECURSIVE tree AS (
+            SELECT id AS ancestor_id, id AS descendant_id, 0 AS depth FROM topics
+            UNION ALL
+            SELECT tree.ancestor_id, t.id, tree.depth + 1
+            FROM tree JOIN topics t ON t.parent_id = tree.descendant_id
+        )
+        SELECT ancestor_id, descendant_id, depth FROM tree
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_topic_closure_descendant', table_name='topic_closure')
+    op.drop_table('topic_closure')
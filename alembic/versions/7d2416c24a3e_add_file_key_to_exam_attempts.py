@@ -0,0 +1,44 @@
+"""add file_key to exam attempts
+
+Revision ID: 7d2416c24a3e
+Revises: 913c6711e0bb
+Create Date: 2026-10-19 22:17:31.584106
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d2416c24a3e'
+down_revision: Union[str, Sequence[str], None] = '913c6711e0bb'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('exam_attempts', sa.Column('file_key', sa.String(length=255), nullable=True))
+    # Файлы больше не раздаются статикой из /uploads: ключ хранилища - из старой ссылки,
+    # ссылки - на эндпоинт с проверкой доступа
+    op.execute(
+        "UPDATE exam_attempts SET "
+        "file_key = substring(file_url from length('/uploads/') + 1), "
+        "file_url = '/exams/attempts/' || id || '/file', "
+        "thumbnail_url = CASE WHEN thumbnail_url IS NOT NULL "
+        "THEN '/exams/attempts/' || id || '/file?thumbnail=true' END "
+        "WHERE file_url LIKE '/uploads/%'"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(
+        "UPDATE exam_attempts SET "
+        "file_url = '/uploads/' || file_key, "
+        "thumbnail_url = CASE WHEN thumbnail_url IS NOT NULL THEN '/uploads/' || file_key || '.thumb.jpg' END "
+        "WHERE file_key IS NOT NULL"
+    )
+    op.drop_column('exam_attempts', 'file_key')
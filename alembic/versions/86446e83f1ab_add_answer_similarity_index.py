@@ -0,0 +1,63 @@
+"""add answer similarity index
+
+Revision ID: 86446e83f1ab
+Revises: f9e52115e101
+Create Date: 2026-10-19 20:11:36.208417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '86446e83f1ab'
+down_revision: Union[str, Sequence[str], None] = 'f9e52115e101'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('answer_signatures',
+    sa.Column('attempt_id', sa.UUID(), nullable=False),
+    sa.Column('exam_id', sa.UUID(), nullable=False),
+    sa.Column('student_id', sa.UUID(), nullable=False),
+    sa.Column('signature', postgresql.ARRAY(sa.Integer()), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['attempt_id'], ['exam_attempts.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['exam_id'], ['exams.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['student_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('attempt_id')
+    )
+    op.create_index(op.f('ix_answer_signatures_exam_id'), 'answer_signatures', ['exam_id'], unique=False)
+
+    op.create_table('answer_lsh_bands',
+    sa.Column('band', sa.SmallInteger(), nullable=False),
+    sa.Column('bucket', sa.BigInteger(), nullable=False),
+    sa.Column('attempt_id', sa.UUID(), nullable=False),
+    sa.ForeignKeyConstraint(['attempt_id'], ['exam_attempts.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('band', 'bucket', 'attempt_id')
+    )
+
+    op.create_table('answer_similarity_flags',
+    sa.Column('attempt_id', sa.UUID(), nullable=False),
+    sa.Column('other_attempt_id', sa.UUID(), nullable=False),
+    sa.Column('similarity', sa.Float(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.ForeignKeyConstraint(['attempt_id'], ['exam_attempts.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['other_attempt_id'], ['exam_attempts.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('attempt_id', 'other_attempt_id')
+    )
+    op.create_index(op.f('ix_answer_similarity_flags_other_attempt_id'), 'answer_similarity_flags', ['other_attempt_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_answer_similarity_flags_other_attempt_id'), table_name='answer_similarity_flags')
+    op.drop_table('answer_similarity_flags')
+    op.drop_table('answer_lsh_bands')
+    op.drop_index(op.f('ix_answer_signatures_exam_id'), table_name='answer_signatures')
+    op.drop_table('answer_signatures')
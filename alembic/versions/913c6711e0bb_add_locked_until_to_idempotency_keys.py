@@ -0,0 +1,28 @@
+"""add locked_until to idempotency keys
+
+Revision ID: 913c6711e0bb
+Revises: ab4fac2097ae
+Create Date: 2026-10-19 21:58:44.027519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '913c6711e0bb'
+down_revision: Union[str, Sequence[str], None] = 'ab4fac2097ae'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('idempotency_keys', sa.Column('locked_until', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('idempotency_keys', 'locked_until')
@@ -0,0 +1,58 @@
+"""add content_hash to lessons
+
+Revision ID: a41c7e9b20d3
+Revises: 5d922efdd686
+Create Date: 2026-10-19 12:02:17.904415
+
+"""
+from typing import Sequence, Union
+import hashlib
+import json
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41c7e9b20d3'
+down_revision: Union[str, Sequence[str], None] = '5d922efdd686'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 500
+
+
+def _lesson_content_hash(title, description, content, video_url, duration_minutes, order_num, is_published) -> str:
+    # Должно совпадать с app/routers/courses._lesson_content_hash
+    payload = json.dumps(
+        [title, description, content, video_url, duration_minutes or 0, order_num or 0, bool(is_published)],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('lessons', sa.Column('content_hash', sa.String(length=64), nullable=True))
+
+    # Хеш существующих уроков считаем здесь, а не при чтении: GET не должен писать в БД
+    conn = op.get_bind()
+    select_batch = sa.text(
+        "SELECT id, title, description, content, video_url, duration_minutes, order_num, is_published "
+        "FROM lessons WHERE content_hash IS NULL LIMIT :limit"
+    )
+    update_lesson = sa.text("UPDATE lessons SET content_hash = :content_hash WHERE id = :id")
+
+    while True:
+        rows = conn.execute(select_batch, {"limit": BATCH_SIZE}).fetchall()
+        if not rows:
+            break
+        conn.execute(
+            update_lesson,
+            [{"id": row[0], "content_hash": _lesson_content_hash(*row[1:])} for row in rows],
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('lessons', 'content_hash')
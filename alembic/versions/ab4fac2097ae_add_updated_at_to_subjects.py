@@ -0,0 +1,28 @@
+"""add updated_at to subjects
+
+Revision ID: ab4fac2097ae
+Revises: 1600aacddf98
+Create Date: 2026-10-19 21:40:05.318274
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ab4fac2097ae'
+down_revision: Union[str, Sequence[str], None] = '1600aacddf98'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('subjects', sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('subjects', 'updated_at')
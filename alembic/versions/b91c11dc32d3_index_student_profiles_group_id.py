@@ -0,0 +1,28 @@
+"""index student_profiles.group_id
+
+Revision ID: b91c11dc32d3
+Revises: 7648980c8b2c
+Create Date: 2026-10-19 14:40:12.093821
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b91c11dc32d3'
+down_revision: Union[str, Sequence[str], None] = '7648980c8b2c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_student_profiles_group_id'), 'student_profiles', ['group_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_student_profiles_group_id'), table_name='student_profiles')
@@ -0,0 +1,91 @@
+"""content-addressed questions
+
+Revision ID: bb07c252f312
+Revises: beeab028972a
+Create Date: 2026-10-19 18:30:14.882051
+
+"""
+from typing import Sequence, Union
+import hashlib
+import json
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'bb07c252f312'
+down_revision: Union[str, Sequence[str], None] = 'beeab028972a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 500
+
+
+def _question_hash(question) -> str:
+    # Должно совпадать с app/services/question_store.question_hash
+    canonical = json.dumps(question, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('questions',
+    sa.Column('id', sa.String(length=64), nullable=False),
+    sa.Column('body', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.add_column('exams', sa.Column('question_ids', postgresql.ARRAY(sa.String(length=64)), nullable=True))
+    op.alter_column('exams', 'questions',
+               existing_type=postgresql.JSONB(astext_type=sa.Text()),
+               nullable=True)
+
+    # Переносим вопросы существующих экзаменов в хранилище и освобождаем JSONB
+    conn = op.get_bind()
+    select_batch = sa.text(
+        "SELECT id, questions FROM exams "
+        "WHERE question_ids IS NULL AND jsonb_typeof(questions) = 'array' LIMIT :limit"
+    ).columns(id=sa.UUID(), questions=postgresql.JSONB())
+    insert_question = sa.text(
+        "INSERT INTO questions (id, body) VALUES (:id, :body) ON CONFLICT (id) DO NOTHING"
+    ).bindparams(sa.bindparam("body", type_=postgresql.JSONB()))
+    update_exam = sa.text(
+        "UPDATE exams SET question_ids = :question_ids, questions = NULL WHERE id = :id"
+    ).bindparams(sa.bindparam("question_ids", type_=postgresql.ARRAY(sa.String(length=64))))
+
+    while True:
+        rows = conn.execute(select_batch, {"limit": BATCH_SIZE}).fetchall()
+        if not rows:
+            break
+        questions, exams = {}, []
+        for exam_id, exam_questions in rows:
+            ids = []
+            for q in exam_questions:
+                qid = _question_hash(q)
+                questions[qid] = q
+                ids.append(qid)
+            exams.append({"id": exam_id, "question_ids": ids})
+        if questions:
+            conn.execute(insert_question, [{"id": qid, "body": body} for qid, body in questions.items()])
+        conn.execute(update_exam, exams)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(
+        """
+        UPDATE exams SET questions = coalesce((
+            SELECT jsonb_agg(q.body ORDER BY t.ord)
+            FROM unnest(exams.question_ids) WITH ORDINALITY AS t(id, ord)
+            JOIN questions q ON q.id = t.id
+        ), '[]'::jsonb)
+        WHERE question_ids IS NOT NULL
+        """
+    )
+    op.alter_column('exams', 'questions',
+               existing_type=postgresql.JSONB(astext_type=sa.Text()),
+               nullable=False)
+    op.drop_column('exams', 'question_ids')
+    op.drop_table('questions')
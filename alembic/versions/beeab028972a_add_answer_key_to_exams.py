@@ -0,0 +1,46 @@
+"""add answer_key to exams
+
+Revision ID: beeab028972a
+Revises: ef114cf7e543
+Create Date: 2026-10-19 17:46:51.604122
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'beeab028972a'
+down_revision: Union[str, Sequence[str], None] = 'ef114cf7e543'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('exams', sa.Column('answer_key', postgresql.ARRAY(sa.SmallInteger()), nullable=True))
+    # Индекс верного варианта в options (с нуля), -1 если вариант не найден
+    op.execute(
+        """
+        UPDATE exams SET answer_key = ARRAY(
+            SELECT coalesce((
+                SELECT (o.ord - 1)::smallint
+                FROM jsonb_array_elements_text(q.value -> 'options') WITH ORDINALITY AS o(val, ord)
+                WHERE o.val = q.value ->> 'correct_answer'
+                ORDER BY o.ord
+                LIMIT 1
+            ), -1::smallint)
+            FROM jsonb_array_elements(exams.questions) WITH ORDINALITY AS q(value, qord)
+            ORDER BY q.qord
+        )
+        WHERE jsonb_typeof(questions) = 'array'
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('exams', 'answer_key')
@@ -0,0 +1,40 @@
+"""add errors_recorded to exam attempts
+
+Revision ID: c58e31f0a9d2
+Revises: 7d2416c24a3e
+Create Date: 2026-10-19 23:05:42.318907
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c58e31f0a9d2'
+down_revision: Union[str, Sequence[str], None] = '7d2416c24a3e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('exam_attempts', sa.Column('errors_recorded', sa.Boolean(), server_default='false', nullable=False))
+    # Попытки с записанными ошибками и не-тестовые попытки уже разобраны;
+    # полностью верные старые попытки backfill разберет один раз и отметит
+    op.execute(
+        "UPDATE exam_attempts SET errors_recorded = true "
+        "WHERE answer_type <> 'multiple_choice' "
+        "OR EXISTS (SELECT 1 FROM error_history WHERE error_history.attempt_id = exam_attempts.id)"
+    )
+    op.create_index(
+        'ix_exam_attempts_errors_pending', 'exam_attempts', ['id'],
+        unique=False, postgresql_where=sa.text('errors_recorded IS false'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_exam_attempts_errors_pending', table_name='exam_attempts')
+    op.drop_column('exam_attempts', 'errors_recorded')
@@ -0,0 +1,40 @@
+"""add item statistics to questions
+
+Revision ID: c7cd0ef5d5d3
+Revises: 86446e83f1ab
+Create Date: 2026-10-19 20:34:12.661840
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7cd0ef5d5d3'
+down_revision: Union[str, Sequence[str], None] = '86446e83f1ab'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('questions', sa.Column('responses_count', sa.Integer(), nullable=True))
+    op.add_column('questions', sa.Column('p_value', sa.Float(), nullable=True))
+    op.add_column('questions', sa.Column('discrimination', sa.Float(), nullable=True))
+    op.add_column('questions', sa.Column('irt_difficulty', sa.Float(), nullable=True))
+    op.add_column('questions', sa.Column('calibrated_difficulty', sa.SmallInteger(), nullable=True))
+    op.add_column('questions', sa.Column('calibrated_at', sa.DateTime(), nullable=True))
+    op.create_index(op.f('ix_questions_calibrated_difficulty'), 'questions', ['calibrated_difficulty'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_questions_calibrated_difficulty'), table_name='questions')
+    op.drop_column('questions', 'calibrated_at')
+    op.drop_column('questions', 'calibrated_difficulty')
+    op.drop_column('questions', 'irt_difficulty')
+    op.drop_column('questions', 'discrimination')
+    op.drop_column('questions', 'p_value')
+    op.drop_column('questions', 'responses_count')
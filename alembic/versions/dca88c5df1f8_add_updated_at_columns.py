@@ -0,0 +1,34 @@
+"""add updated_at columns
+
+Revision ID: dca88c5df1f8
+Revises: a41c7e9b20d3
+Create Date: 2026-10-19 12:48:05.117930
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'dca88c5df1f8'
+down_revision: Union[str, Sequence[str], None] = 'a41c7e9b20d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('courses', sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True))
+    op.add_column('lessons', sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True))
+    op.add_column('topics', sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True))
+    op.add_column('student_topic_mastery', sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('student_topic_mastery', 'updated_at')
+    op.drop_column('topics', 'updated_at')
+    op.drop_column('lessons', 'updated_at')
+    op.drop_column('courses', 'updated_at')
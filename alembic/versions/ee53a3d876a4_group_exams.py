@@ -0,0 +1,47 @@
+"""group exams
+
+Revision ID: ee53a3d876a4
+Revises: bfa4e042cdd6
+Create Date: 2026-10-19 19:24:07.330918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ee53a3d876a4'
+down_revision: Union[str, Sequence[str], None] = 'bfa4e042cdd6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.alter_column('exams', 'session_id', existing_type=sa.UUID(), nullable=True)
+    op.add_column('exams', sa.Column('group_id', sa.UUID(), nullable=True))
+    op.create_index(op.f('ix_exams_group_id'), 'exams', ['group_id'], unique=False)
+    op.create_foreign_key('exams_group_id_fkey', 'exams', 'groups', ['group_id'], ['id'], ondelete='CASCADE')
+
+    op.add_column('learning_sessions', sa.Column('assigned_exam_id', sa.UUID(), nullable=True))
+    op.create_index(op.f('ix_learning_sessions_assigned_exam_id'), 'learning_sessions', ['assigned_exam_id'], unique=False)
+    op.create_foreign_key(
+        'learning_sessions_assigned_exam_id_fkey', 'learning_sessions', 'exams',
+        ['assigned_exam_id'], ['id'], ondelete='CASCADE'
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint('learning_sessions_assigned_exam_id_fkey', 'learning_sessions', type_='foreignkey')
+    op.drop_index(op.f('ix_learning_sessions_assigned_exam_id'), table_name='learning_sessions')
+    op.drop_column('learning_sessions', 'assigned_exam_id')
+
+    op.drop_constraint('exams_group_id_fkey', 'exams', type_='foreignkey')
+    op.drop_index(op.f('ix_exams_group_id'), table_name='exams')
+    op.drop_column('exams', 'group_id')
+    # Групповые тесты без сессии не переживут NOT NULL
+    op.execute("DELETE FROM exams WHERE session_id IS NULL")
+    op.alter_column('exams', 'session_id', existing_type=sa.UUID(), nullable=False)
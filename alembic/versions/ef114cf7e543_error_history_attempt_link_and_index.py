@@ -0,0 +1,36 @@
+"""error_history attempt link and index
+
+Revision ID: ef114cf7e543
+Revises: 295fb9e8f1ad
+Create Date: 2026-10-19 17:03:26.480517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'ef114cf7e543'
+down_revision: Union[str, Sequence[str], None] = '295fb9e8f1ad'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('error_history', sa.Column('attempt_id', sa.UUID(), nullable=True))
+    op.add_column('error_history', sa.Column('question_index', sa.SmallInteger(), nullable=True))
+    op.create_foreign_key('error_history_attempt_id_fkey', 'error_history', 'exam_attempts', ['attempt_id'], ['id'], ondelete='CASCADE')
+    op.create_index(op.f('ix_error_history_attempt_id'), 'error_history', ['attempt_id'], unique=False)
+    op.create_index('ix_error_history_student_topic_created', 'error_history', ['student_id', 'topic_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_error_history_student_topic_created', table_name='error_history')
+    op.drop_index(op.f('ix_error_history_attempt_id'), table_name='error_history')
+    op.drop_constraint('error_history_attempt_id_fkey', 'error_history', type_='foreignkey')
+    op.drop_column('error_history', 'question_index')
+    op.drop_column('error_history', 'attempt_id')
@@ -0,0 +1,34 @@
+"""add upload fields to exam attempts
+
+Revision ID: f9e52115e101
+Revises: ee53a3d876a4
+Create Date: 2026-10-19 19:48:52.104736
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f9e52115e101'
+down_revision: Union[str, Sequence[str], None] = 'ee53a3d876a4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('exam_attempts', sa.Column('file_hash', sa.String(length=64), nullable=True))
+    op.add_column('exam_attempts', sa.Column('file_size', sa.BigInteger(), nullable=True))
+    op.add_column('exam_attempts', sa.Column('thumbnail_url', sa.Text(), nullable=True))
+    op.add_column('exam_attempts', sa.Column('extracted_text', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('exam_attempts', 'extracted_text')
+    op.drop_column('exam_attempts', 'thumbnail_url')
+    op.drop_column('exam_attempts', 'file_size')
+    op.drop_column('exam_attempts', 'file_hash')
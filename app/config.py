@@ -9,5 +9,21 @@ class Settings:
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7 # 7 дней
     LM_STUDIO_URL: str = os.getenv("LM_STUDIO_URL", "http://localhost:1234/v1")
+    # Читать количество уроков из денормализованного счетчика courses.lessons_count
+    USE_LESSONS_COUNTER: bool = os.getenv("USE_LESSONS_COUNTER", "false").lower() == "true"
+    # Загрузка файлов с ответами (фото, документы)
+    UPLOAD_BACKEND: str = os.getenv("UPLOAD_BACKEND", "local")
+    UPLOAD_DIR: str = os.getenv("UPLOAD_DIR", "uploads")
+    # UPLOAD_BACKEND=s3: S3-совместимое хранилище (нужен aiobotocore)
+    S3_BUCKET: str = os.getenv("S3_BUCKET", "")
+    S3_ENDPOINT_URL: str = os.getenv("S3_ENDPOINT_URL", "")
+    S3_REGION: str = os.getenv("S3_REGION", "")
+    MAX_UPLOAD_BYTES: int = int(os.getenv("MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+    # Метрики Prometheus на /metrics (нужен prometheus_client)
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    # Заголовок Server-Timing с числом и временем SQL-запросов, предупреждения о N+1
+    SQL_PROFILER: bool = os.getenv("SQL_PROFILER", "false").lower() == "true"
+    # Токен для /admin (профилировщик); пустой - админские эндпоинты отключены
+    ADMIN_TOKEN: str = os.getenv("ADMIN_TOKEN", "")
 
 settings = Settings()
\ No newline at end of file
@@ -3,10 +3,11 @@ from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from uuid import UUID
 
 from app.database import AsyncSessionLocal
 from app.config import settings
-from app.models.models import User
+from app.models.models import User, UserRole, Group
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
@@ -32,4 +33,16 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession
     user = result.scalars().first()
     if user is None:
         raise credentials_exception
-    return user
\ No newline at end of file
+    return user
+
+async def get_teacher_group(group_id: UUID, current_user: User, db: AsyncSession) -> Group:
+    if current_user.role != UserRole.teacher:
+        raise HTTPException(
+            status_code=403,
+            detail="Только преподаватель может выполнять это действие"
+        )
+    res = await db.execute(select(Group).where(Group.id == group_id))
+    group = res.scalars().first()
+    if not group or group.teacher_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Группа не найдена")
+    return group
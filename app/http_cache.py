@@ -0,0 +1,75 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import HTTPException, Request, Response, status
+
+
+def weak_etag(*parts) -> str:
+    # Версия ответа (updated_at, количества, id пользователя) -> слабый ETag
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # Слабое сравнение (RFC 9110): префикс W/ не учитывается
+    if not if_none_match:
+        return False
+    opaque = etag.removeprefix("W/")
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == opaque:
+            return True
+    return False
+
+
+def latest(*values: Optional[datetime]) -> Optional[datetime]:
+    # Last-Modified ответа - самая поздняя из меток его версии, иначе If-Modified-Since дает ложный 304
+    present = [v for v in values if v is not None]
+    return max(present) if present else None
+
+
+def _as_utc(value: datetime) -> datetime:
+    # В БД хранятся naive-даты, считаем их UTC
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+class ConditionalRequest:
+    """Зависимость для GET-эндпоинтов с валидаторами кеша.
+
+    Эндпоинт сначала дешево вычисляет версию данных и вызывает check():
+    если клиент прислал совпадающий If-None-Match / If-Modified-Since,
+    сразу отдается 304 без построения тела ответа.
+    """
+
+    def __init__(self, request: Request, response: Response):
+        self.request = request
+        self.response = response
+        self.headers: dict = {}
+
+    def check(self, etag: str, last_modified: Optional[datetime] = None):
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if last_modified is not None:
+            headers["Last-Modified"] = format_datetime(_as_utc(last_modified), usegmt=True)
+        self.headers = headers
+
+        if self._is_not_modified(etag, last_modified):
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        self.response.headers.update(headers)
+
+    def _is_not_modified(self, etag: str, last_modified: Optional[datetime]) -> bool:
+        if_none_match = self.request.headers.get("if-none-match")
+        if if_none_match is not None:
+            return etag_matches(if_none_match, etag)
+
+        if_modified_since = self.request.headers.get("if-modified-since")
+        if if_modified_since is None or last_modified is None:
+            return False
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return _as_utc(last_modified).replace(microsecond=0) <= _as_utc(since)
@@ -1,12 +1,19 @@
 from fastapi import FastAPI, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 
+from app.database import engine
 from app.dependencies import get_db
-from app.routers import auth, exams, subjects, courses
+from app.metrics import install_metrics
+from app.sql_profiler import install_sql_profiler
+from app.profiler import RequestProfilerMiddleware, profiler_enabled
+from app.responses import DefaultJSONResponse
+from app.routers import auth, exams, subjects, courses, groups, sessions, admin
 
-app = FastAPI(title="BilimPath")
+# Остальные эндпоинты кодируются orjson, если он установлен
+app = FastAPI(title="BilimPath", default_response_class=DefaultJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,10 +23,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Сжимаем только крупные ответы (тексты уроков); brotli используется, если установлен brotli-asgi
+try:
+    from brotli_asgi import BrotliMiddleware
+    app.add_middleware(BrotliMiddleware, minimum_size=1024)
+except ImportError:
+    app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+install_sql_profiler(app, engine)
+if profiler_enabled():
+    app.add_middleware(RequestProfilerMiddleware)
+# Добавляется последним, чтобы замерять запрос целиком, включая сжатие
+install_metrics(app, engine)
+
 app.include_router(auth.router)
 app.include_router(exams.router)
 app.include_router(subjects.router)
 app.include_router(courses.router)
+app.include_router(groups.router)
+app.include_router(sessions.router)
+app.include_router(admin.router)
 
 @app.get("/")
 async def root():
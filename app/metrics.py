@@ -0,0 +1,168 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI, Response
+from sqlalchemy import event
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app.config import settings
+from app.profiler import require_admin
+from app.sql_profiler import profile_queries
+
+try:
+    from prometheus_client import (
+        CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess,
+    )
+except ImportError:  # без prometheus_client метрики отключены
+    Counter = None
+
+
+# Метрики в формате Prometheus: маршруты, пул соединений, запросы к БД, задержка цикла событий.
+# При нескольких воркерах uvicorn/gunicorn нужно задать PROMETHEUS_MULTIPROC_DIR
+# (общий пустой каталог) - тогда /metrics собирает значения всех процессов.
+# /metrics закрыт тем же ADMIN_TOKEN, что и /admin (Authorization: Bearer или X-Admin-Token).
+# Накладные расходы middleware: python -m benchmarks.metrics_overhead
+METRICS_ENABLED = Counter is not None and settings.METRICS_ENABLED
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+LOOP_LAG_INTERVAL = 0.5
+_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+_DB_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 100)
+
+
+if METRICS_ENABLED:
+    HTTP_REQUESTS = Counter(
+        "http_requests_total", "HTTP requests", ["method", "route", "status"]
+    )
+    HTTP_LATENCY = Histogram(
+        "http_request_duration_seconds", "HTTP request latency", ["method", "route"], buckets=_LATENCY_BUCKETS
+    )
+    HTTP_IN_PROGRESS = Gauge(
+        "http_requests_in_progress", "HTTP requests in progress", ["method"], multiprocess_mode="livesum"
+    )
+    DB_STATEMENTS = Histogram(
+        "db_statements_per_request", "SQL statements per HTTP request", ["route"], buckets=_DB_COUNT_BUCKETS
+    )
+    DB_TIME = Histogram(
+        "db_time_per_request_seconds", "Total SQL time per HTTP request", ["route"], buckets=_LATENCY_BUCKETS
+    )
+    DB_POOL_CHECKED_OUT = Gauge(
+        "db_pool_checked_out", "Connections checked out of the pool", multiprocess_mode="livesum"
+    )
+    DB_POOL_OVERFLOW = Gauge(
+        "db_pool_overflow", "Connections opened above pool_size", multiprocess_mode="livesum"
+    )
+    DB_POOL_WAIT = Histogram(
+        "db_pool_wait_seconds", "Time waiting for a pool connection", buckets=_LATENCY_BUCKETS
+    )
+    LOOP_LAG = Histogram(
+        "event_loop_lag_seconds", "Event loop scheduling delay",
+        buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+    )
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    # Время ожидания свободного соединения: у пула нет события "до выдачи", поэтому замер здесь
+    def _do_get(self):
+        if not METRICS_ENABLED:
+            return super()._do_get()
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT.observe(time.perf_counter() - start)
+
+
+def instrument_pool(engine):
+    """Состояние пула соединений по событиям выдачи и возврата."""
+    pool = engine.sync_engine.pool
+
+    def _update_pool_gauges(*args):
+        DB_POOL_CHECKED_OUT.set(pool.checkedout())
+        DB_POOL_OVERFLOW.set(max(pool.overflow(), 0))
+
+    event.listen(pool, "checkout", _update_pool_gauges)
+    event.listen(pool, "checkin", _update_pool_gauges)
+
+
+class MetricsMiddleware:
+    """Чистый ASGI-middleware: без лишней задачи и копирования тела, как у BaseHTTPMiddleware."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] == "/metrics":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_IN_PROGRESS.labels(method).inc()
+        start = time.perf_counter()
+        try:
+            # Счетчики SQL без разбора формы операторов (см. sql_profiler.py)
+            with profile_queries(track_shapes=False) as stats:
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            HTTP_IN_PROGRESS.labels(method).dec()
+
+            # Шаблон пути ("/exams/{exam_id}"), а не сам путь - иначе метки не ограничены
+            route = scope.get("route")
+            route_label = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUESTS.labels(method, route_label, str(status_code)).inc()
+            HTTP_LATENCY.labels(method, route_label).observe(elapsed)
+            DB_STATEMENTS.labels(route_label).observe(stats.count)
+            DB_TIME.labels(route_label).observe(stats.duration)
+
+
+async def _monitor_loop_lag():
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        LOOP_LAG.observe(max(loop.time() - start - LOOP_LAG_INTERVAL, 0.0))
+
+
+def install_metrics(app: FastAPI, engine):
+    if not METRICS_ENABLED:
+        return
+
+    instrument_pool(engine)
+    app.add_middleware(MetricsMiddleware)
+
+    # Оборачиваем lifespan приложения: add_event_handler/on_event в новых версиях FastAPI удалены
+    app_lifespan = app.router.lifespan_context
+
+    @asynccontextmanager
+    async def lifespan(app_):
+        lag_task = asyncio.create_task(_monitor_loop_lag())
+        try:
+            async with app_lifespan(app_) as state:
+                yield state
+        finally:
+            lag_task.cancel()
+            if MULTIPROCESS:
+                multiprocess.mark_process_dead(os.getpid())
+
+    app.router.lifespan_context = lifespan
+
+    @app.get("/metrics", include_in_schema=False, dependencies=[Depends(require_admin)])
+    async def metrics():
+        if MULTIPROCESS:
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+            data = generate_latest(registry)
+        else:
+            data = generate_latest()
+        return Response(content=data, media_type=CONTENT_TYPE_LATEST)
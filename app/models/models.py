@@ -1,6 +1,6 @@
-from sqlalchemy import Column, String, Float, Integer, Boolean, Text, DateTime, Enum, ForeignKey, SmallInteger, func, UniqueConstraint
-from sqlalchemy.dialects.postgresql import UUID, JSONB
-from sqlalchemy.orm import relationship, DeclarativeBase
+from sqlalchemy import Column, String, Float, Integer, BigInteger, Boolean, Text, DateTime, Enum, ForeignKey, SmallInteger, func, UniqueConstraint, Index, event, inspect, literal, select
+from sqlalchemy.dialects.postgresql import UUID, JSONB, ARRAY
+from sqlalchemy.orm import relationship, deferred, DeclarativeBase
 from sqlalchemy.ext.declarative import declarative_base
 from uuid import uuid4
 from datetime import datetime
@@ -62,7 +62,7 @@ class User(Base):
 class StudentProfile(Base):
     __tablename__ = "student_profiles"
     user_id  = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
-    group_id = Column(UUID(as_uuid=True), ForeignKey("groups.id"), nullable=True)
+    group_id = Column(UUID(as_uuid=True), ForeignKey("groups.id"), nullable=True, index=True)
 
     user  = relationship("User", back_populates="student_profile")
     group = relationship("Group", back_populates="students")
@@ -102,6 +102,7 @@ class Subject(Base):
     id         = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
     name       = Column(String(255), nullable=False)
     created_by = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
     
     created_by_user   = relationship("User", back_populates="subjects_created")
     topics            = relationship("Topic", back_populates="subject")
@@ -116,6 +117,7 @@ class Topic(Base):
     parent_id  = Column(UUID(as_uuid=True), ForeignKey("topics.id"), nullable=True)
     title      = Column(String(255), nullable=False)
     order_num  = Column(Integer, default=0)
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
     
     subject   = relationship("Subject", back_populates="topics")
     parent    = relationship("Topic", back_populates="children", remote_side=[id])
@@ -125,6 +127,65 @@ class Topic(Base):
     errors    = relationship("ErrorHistory", back_populates="topic")
 
 
+class TopicClosure(Base):
+    # Таблица замыкания иерархии тем: все пары (предок, потомок), включая саму тему с depth = 0
+    __tablename__ = "topic_closure"
+    ancestor_id   = Column(UUID(as_uuid=True), ForeignKey("topics.id", ondelete="CASCADE"), primary_key=True)
+    descendant_id = Column(UUID(as_uuid=True), ForeignKey("topics.id", ondelete="CASCADE"), primary_key=True)
+    depth         = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        Index("ix_topic_closure_descendant", "descendant_id"),
+    )
+
+
+@event.listens_for(Topic, "after_insert")
+def _topic_closure_on_insert(mapper, connection, target):
+    closure = TopicClosure.__table__
+    topic_id = literal(target.id, UUID(as_uuid=True))
+    connection.execute(
+        closure.insert().from_select(
+            ["ancestor_id", "descendant_id", "depth"],
+            select(closure.c.ancestor_id, topic_id, closure.c.depth + 1)
+            .where(closure.c.descendant_id == target.parent_id)
+            .union_all(select(topic_id, topic_id, literal(0))),
+        )
+    )
+
+
+@event.listens_for(Topic, "after_update")
+def _topic_closure_on_move(mapper, connection, target):
+    if not inspect(target).attrs.parent_id.history.has_changes():
+        return
+
+    closure = TopicClosure.__table__
+    # Отрываем поддерево от старых предков...
+    subtree = select(closure.c.descendant_id).where(closure.c.ancestor_id == target.id)
+    old_ancestors = select(closure.c.ancestor_id).where(
+        closure.c.descendant_id == target.id,
+        closure.c.ancestor_id != target.id,
+    )
+    connection.execute(
+        closure.delete().where(
+            closure.c.descendant_id.in_(subtree),
+            closure.c.ancestor_id.in_(old_ancestors),
+        )
+    )
+
+    # ...и подвешиваем к новому родителю
+    if target.parent_id is None:
+        return
+    sup = closure.alias("sup")
+    sub = closure.alias("sub")
+    connection.execute(
+        closure.insert().from_select(
+            ["ancestor_id", "descendant_id", "depth"],
+            select(sup.c.ancestor_id, sub.c.descendant_id, sup.c.depth + sub.c.depth + 1)
+            .where(sup.c.descendant_id == target.parent_id, sub.c.ancestor_id == target.id),
+        )
+    )
+
+
 class LearningSession(Base):
     __tablename__ = "learning_sessions"
     id           = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
@@ -133,26 +194,53 @@ class LearningSession(Base):
     status       = Column(Enum(SessionStatus), default=SessionStatus.testing)
     started_at   = Column(DateTime, server_default=func.now())
     completed_at = Column(DateTime, nullable=True)
+    # Групповой тест, назначенный преподавателем (у такого экзамена нет session_id)
+    assigned_exam_id = Column(
+        UUID(as_uuid=True), ForeignKey("exams.id", ondelete="CASCADE", use_alter=True), nullable=True, index=True
+    )
+    # Повторный тест этапа retesting, готовится заранее (services/session_orchestrator.py)
+    retest_exam_id = Column(
+        UUID(as_uuid=True), ForeignKey("exams.id", ondelete="SET NULL", use_alter=True), nullable=True
+    )
     
     student = relationship("User", back_populates="learning_sessions")
     subject = relationship("Subject", back_populates="learning_sessions")
-    exams   = relationship("Exam", back_populates="session")
+    exams   = relationship("Exam", back_populates="session", foreign_keys="Exam.session_id")
+    assigned_exam = relationship("Exam", foreign_keys=[assigned_exam_id])
+    retest_exam   = relationship("Exam", foreign_keys=[retest_exam_id])
 
 
 class Exam(Base):
     __tablename__ = "exams"
     id         = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
-    session_id = Column(UUID(as_uuid=True), ForeignKey("learning_sessions.id"), nullable=False)
+    session_id = Column(UUID(as_uuid=True), ForeignKey("learning_sessions.id"), nullable=True) # NULL у групповых тестов
+    group_id   = Column(UUID(as_uuid=True), ForeignKey("groups.id", ondelete="CASCADE"), nullable=True, index=True)
     topic_id   = Column(UUID(as_uuid=True), ForeignKey("topics.id"), nullable=True)
     difficulty = Column(SmallInteger, default=3)
-    questions  = Column(JSONB, nullable=False)
+    questions  = deferred(Column(JSONB, nullable=True)) # устаревшее поле, см. question_ids
+    question_ids = Column(ARRAY(String(64)), nullable=True) # ключи таблицы questions по порядку
+    answer_key = Column(ARRAY(SmallInteger), nullable=True) # индексы верных вариантов, см. services/grading.py
     is_retest  = Column(Boolean, default=False)
     created_at = Column(DateTime, server_default=func.now())
     
-    session  = relationship("LearningSession", back_populates="exams")
+    session  = relationship("LearningSession", back_populates="exams", foreign_keys=[session_id])
     topic    = relationship("Topic", back_populates="exams")
     attempts = relationship("ExamAttempt", back_populates="exam")
 
+class Question(Base):
+    # Хранилище вопросов с адресацией по содержимому: id = sha256 канонического JSON
+    __tablename__ = "questions"
+    id         = Column(String(64), primary_key=True)
+    body       = Column(JSONB, nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+    # Статистика по ответам студентов, см. services/item_statistics.py
+    responses_count = Column(Integer, nullable=True)
+    p_value         = Column(Float, nullable=True)
+    discrimination  = Column(Float, nullable=True)
+    irt_difficulty  = Column(Float, nullable=True) # логиты модели Раша
+    calibrated_difficulty = Column(SmallInteger, nullable=True, index=True) # 1..5, как Exam.difficulty
+    calibrated_at   = Column(DateTime, nullable=True)
+
 class ExamAttempt(Base):
     __tablename__ = "exam_attempts"
     id           = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
@@ -160,14 +248,26 @@ class ExamAttempt(Base):
     student_id   = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     answers      = Column(JSONB, nullable=True)
     file_url     = Column(Text, nullable=True)
+    file_key     = Column(String(255), nullable=True) # ключ в хранилище (services/file_storage.py)
+    file_hash    = Column(String(64), nullable=True) # sha256 загруженного файла
+    file_size    = Column(BigInteger, nullable=True)
+    thumbnail_url  = Column(Text, nullable=True)
+    extracted_text = deferred(Column(Text, nullable=True)) # заполняется фоновой обработкой
     answer_type  = Column(Enum(AnswerType), default=AnswerType.multiple_choice)
     score        = Column(Float, nullable=True)
     submitted_at = Column(DateTime, server_default=func.now())
-    
+    # Ошибки попытки разобраны в error_history (в том числе когда ошибок не было), см. services/error_history.py
+    errors_recorded = Column(Boolean, nullable=False, default=False, server_default="false")
+
     exam     = relationship("Exam", back_populates="attempts")
     student  = relationship("User", back_populates="exam_attempts")
     analysis = relationship("AiAnalysis", back_populates="attempt", uselist=False)
 
+    __table_args__ = (
+        # Очередь backfill_error_history: в индексе только неразобранные попытки
+        Index("ix_exam_attempts_errors_pending", "id", postgresql_where=errors_recorded.is_(False)),
+    )
+
 
 class AiAnalysis(Base):
     __tablename__ = "ai_analysis"
@@ -193,22 +293,52 @@ class StudentTopicMastery(Base):
     confidence     = Column(Float, default=0.0)
     attempts_count = Column(Integer, default=0)
     last_tested_at = Column(DateTime, nullable=True)
+    next_review_at = Column(DateTime, nullable=True)
+    updated_at     = Column(DateTime, server_default=func.now(), onupdate=func.now())
     
     __table_args__ = (
         UniqueConstraint("student_id", "topic_id", name="uq_student_topic"),
+        Index("ix_mastery_student_next_review", "student_id", "next_review_at"),
     )
     
     student = relationship("User", back_populates="topic_masteries")
     topic   = relationship("Topic", back_populates="masteries")
 
+class StudentSubjectMastery(Base):
+    # Агрегат по предмету, обновляется в той же транзакции, что и student_topic_mastery
+    __tablename__ = "student_subject_mastery"
+    student_id     = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    subject_id     = Column(UUID(as_uuid=True), ForeignKey("subjects.id", ondelete="CASCADE"), primary_key=True)
+    mastery_sum    = Column(Float, nullable=False, default=0.0)
+    tested_topics  = Column(Integer, nullable=False, default=0)
+    weighted_sum   = Column(Float, nullable=False, default=0.0) # sum(mastery_level * attempts_count)
+    attempts_total = Column(Integer, nullable=False, default=0)
+    updated_at     = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+class StudentRecommendation(Base):
+    # Предрасчитанный топ-K следующих тем для студента, перестраивается при каждой сдаче теста
+    __tablename__ = "student_recommendations"
+    student_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    rank       = Column(SmallInteger, primary_key=True)
+    topic_id   = Column(UUID(as_uuid=True), ForeignKey("topics.id", ondelete="CASCADE"), nullable=False)
+    score      = Column(Float, nullable=False)
+    reason     = Column(String(50), nullable=False)
+    updated_at = Column(DateTime, server_default=func.now())
+
 class ErrorHistory(Base):
     __tablename__ = "error_history"
     id         = Column(UUID(as_uuid=True), primary_key=True, default=uuid4)
     student_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False)
     topic_id   = Column(UUID(as_uuid=True), ForeignKey("topics.id"), nullable=False)
+    attempt_id = Column(UUID(as_uuid=True), ForeignKey("exam_attempts.id", ondelete="CASCADE"), nullable=True, index=True)
+    question_index = Column(SmallInteger, nullable=True)
     question   = Column(Text, nullable=True)
     error_type = Column(String(100), nullable=True)
     created_at = Column(DateTime, server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_error_history_student_topic_created", "student_id", "topic_id", "created_at"),
+    )
     
     student = relationship("User", back_populates="error_history")
     topic   = relationship("Topic", back_populates="errors")
@@ -223,7 +353,9 @@ class Course(Base):
     institution_id = Column(UUID(as_uuid=True), ForeignKey("institutions.id"), nullable=True)
     created_by     = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
     is_active      = Column(Boolean, default=True)
+    lessons_count  = Column(Integer, nullable=False, default=0, server_default="0")
     created_at     = Column(DateTime, server_default=func.now())
+    updated_at     = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
     lessons     = relationship("Lesson", back_populates="course")
     enrollments = relationship("CourseEnrollment", back_populates="course")
@@ -236,12 +368,15 @@ class Lesson(Base):
     topic_id         = Column(UUID(as_uuid=True), ForeignKey("topics.id"), nullable=True)
     title            = Column(String(255), nullable=False)
     description      = Column(Text, nullable=True)
-    content          = Column(Text, nullable=True)
+    # Полный текст урока грузится только по запросу (undefer / отдельный эндпоинт)
+    content          = deferred(Column(Text, nullable=True))
+    content_hash     = Column(String(64), nullable=True)
     video_url        = Column(Text, nullable=True)
     duration_minutes = Column(Integer, default=0)
     order_num        = Column(Integer, default=0)
     is_published     = Column(Boolean, default=False)
     created_at       = Column(DateTime, server_default=func.now())
+    updated_at       = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
     course    = relationship("Course", back_populates="lessons")
     topic     = relationship("Topic")
@@ -268,4 +403,43 @@ class CourseEnrollment(Base):
     student_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), primary_key=True)
     enrolled_at = Column(DateTime, server_default=func.now())
 
-    course = relationship("Course", back_populates="enrollments")
\ No newline at end of file
+    course = relationship("Course", back_populates="enrollments")
+
+
+class AnswerSignature(Base):
+    # MinHash-сигнатура текста ответа (открытые ответы, текст документов), см. services/near_duplicates.py
+    __tablename__ = "answer_signatures"
+    attempt_id = Column(UUID(as_uuid=True), ForeignKey("exam_attempts.id", ondelete="CASCADE"), primary_key=True)
+    exam_id    = Column(UUID(as_uuid=True), ForeignKey("exams.id", ondelete="CASCADE"), nullable=False, index=True)
+    student_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    signature  = Column(ARRAY(Integer), nullable=False)
+    created_at = Column(DateTime, server_default=func.now())
+
+class AnswerLshBand(Base):
+    # LSH-бакеты: кандидаты в дубликаты ищутся по индексу (band, bucket), а не перебором всех ответов
+    __tablename__ = "answer_lsh_bands"
+    band       = Column(SmallInteger, primary_key=True)
+    bucket     = Column(BigInteger, primary_key=True)
+    attempt_id = Column(UUID(as_uuid=True), ForeignKey("exam_attempts.id", ondelete="CASCADE"), primary_key=True)
+
+class AnswerSimilarityFlag(Base):
+    # Пара похожих ответов разных студентов (attempt_id - более поздний)
+    __tablename__ = "answer_similarity_flags"
+    attempt_id       = Column(UUID(as_uuid=True), ForeignKey("exam_attempts.id", ondelete="CASCADE"), primary_key=True)
+    other_attempt_id = Column(UUID(as_uuid=True), ForeignKey("exam_attempts.id", ondelete="CASCADE"), primary_key=True, index=True)
+    similarity       = Column(Float, nullable=False)
+    created_at       = Column(DateTime, server_default=func.now())
+
+
+class IdempotencyKey(Base):
+    # Ответы на запросы с заголовком Idempotency-Key (см. services/idempotency.py)
+    __tablename__ = "idempotency_keys"
+    user_id       = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    key           = Column(String(255), primary_key=True)
+    scope         = Column(String(100), nullable=False)
+    request_hash  = Column(String(64), nullable=False)
+    status_code   = Column(Integer, nullable=True) # NULL - запрос еще выполняется
+    locked_until  = Column(DateTime, nullable=True) # аренда выполняющего воркера
+    response_body = Column(JSONB, nullable=True)
+    created_at    = Column(DateTime, server_default=func.now())
+    expires_at    = Column(DateTime, nullable=False, index=True)
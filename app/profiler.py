@@ -0,0 +1,203 @@
+import hmac
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Callable, Optional
+
+from fastapi import Header, HTTPException
+
+from app.config import settings
+
+
+# Сэмплирующий профилировщик для работающего воркера. Отдельный поток каждые
+# interval секунд снимает стек потока цикла событий (sys._current_frames) - код приложения
+# не трассируется, поэтому накладные расходы малы и не зависят от нагрузки.
+# Без ADMIN_TOKEN профилировщик выключен полностью: ни middleware, ни потоков.
+# Результат - collapsed stacks (flamegraph.pl, speedscope) или JSON speedscope.
+DEFAULT_INTERVAL = 0.005
+MIN_INTERVAL = 0.001
+MAX_DURATION_SECONDS = 60
+MAX_STORED_PROFILES = 20
+
+# Одновременно работает только один сэмплер
+_sampler_lock = threading.Lock()
+_profiles: "OrderedDict[str, Sampler]" = OrderedDict()
+
+
+class Sampler:
+    def __init__(
+        self,
+        name: str,
+        interval: float = DEFAULT_INTERVAL,
+        thread_id: Optional[int] = None,
+        on_exit: Optional[Callable[[], None]] = None,
+    ):
+        self.name = name
+        self.interval = max(interval, MIN_INTERVAL)
+        self.thread_id = thread_id if thread_id is not None else threading.get_ident()
+        self.stacks: Counter = Counter()
+        self.started_at = 0.0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._on_exit = on_exit
+
+    def _run(self):
+        try:
+            while not self._stop.wait(self.interval):
+                frame = sys._current_frames().get(self.thread_id)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                    frame = frame.f_back
+                self.stacks[tuple(reversed(stack))] += 1
+        finally:
+            if self._on_exit is not None:
+                self._on_exit()
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        # Без join: stop() вызывается из цикла событий посреди ответа, а поток
+        # завершится сам, досняв текущий сэмпл. Дождаться его можно через join()
+        self._stop.set()
+        self.duration = time.perf_counter() - self.started_at
+
+    def join(self):
+        if self._thread is not None:
+            self._thread.join()
+
+    def collapsed(self) -> str:
+        lines = []
+        for stack, count in self.stacks.most_common():
+            frames = ";".join(f"{name} ({filename}:{line})" for name, filename, line in stack)
+            lines.append(f"{frames} {count}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self) -> dict:
+        frame_index, frames = {}, []
+        samples, weights = [], []
+        for stack, count in self.stacks.items():
+            indexes = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                indexes.append(frame_index[frame])
+            samples.append(indexes)
+            weights.append(count * self.interval)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": self.name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }],
+            "name": self.name,
+            "exporter": "app.profiler",
+        }
+
+
+def profiler_enabled() -> bool:
+    return bool(settings.ADMIN_TOKEN)
+
+
+def _token_valid(token: Optional[str]) -> bool:
+    if not profiler_enabled() or token is None:
+        return False
+    return hmac.compare_digest(token.encode("utf-8", "replace"), settings.ADMIN_TOKEN.encode("utf-8"))
+
+
+def require_admin(
+    x_admin_token: Optional[str] = Header(None),
+    authorization: Optional[str] = Header(None),
+):
+    # Без ADMIN_TOKEN эндпоинты не существуют (404), с неверным токеном - 403.
+    # Authorization: Bearer - для сборщиков вроде Prometheus, которые не умеют свои заголовки
+    if not profiler_enabled():
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None and authorization and authorization.lower().startswith("bearer "):
+        x_admin_token = authorization[7:].strip()
+    if not _token_valid(x_admin_token):
+        raise HTTPException(status_code=403, detail="Доступ запрещен")
+
+
+def try_start(name: str, interval: float = DEFAULT_INTERVAL) -> Optional[Sampler]:
+    if not _sampler_lock.acquire(blocking=False):
+        return None
+    # Блокировку освобождает сам поток сэмплера при выходе: следующий сэмплер
+    # не запустится, пока предыдущий еще снимает стек
+    sampler = Sampler(name, interval, on_exit=_sampler_lock.release)
+    sampler.start()
+    return sampler
+
+
+def finish(sampler: Sampler) -> str:
+    sampler.stop()
+    profile_id = uuid.uuid4().hex
+    _profiles[profile_id] = sampler
+    while len(_profiles) > MAX_STORED_PROFILES:
+        _profiles.popitem(last=False)
+    return profile_id
+
+
+def get_profile(profile_id: str) -> Optional[Sampler]:
+    return _profiles.get(profile_id)
+
+
+class RequestProfilerMiddleware:
+    """Профиль одного запроса: заголовки X-Profile: 1 и X-Admin-Token.
+
+    Идентификатор профиля возвращается в X-Profile-Id, результат - GET /admin/profiles/{id}.
+    Сэмплируется поток цикла событий, то есть в профиль попадают и параллельные запросы.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        if headers.get(b"x-profile") != b"1" or not _token_valid(
+            headers.get(b"x-admin-token", b"").decode("latin-1")
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        sampler = try_start(f"{scope['method']} {scope['path']}")
+        if sampler is None:
+            # Уже идет другое профилирование - запрос выполняется как обычно
+            await self.app(scope, receive, send)
+            return
+
+        finished = False
+
+        async def send_wrapper(message):
+            nonlocal finished
+            if message["type"] == "http.response.start" and not finished:
+                finished = True
+                profile_id = finish(sampler)
+                message["headers"] = list(message.get("headers", [])) + [(b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if not finished:
+                finish(sampler)
@@ -0,0 +1,47 @@
+from functools import lru_cache
+from typing import Any, Mapping, Optional
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+try:
+    from fastapi.responses import ORJSONResponse
+    import orjson  # noqa: F401 - ORJSONResponse импортируется и без orjson, падает только при отдаче
+    DefaultJSONResponse = ORJSONResponse
+except ImportError:  # без orjson - стандартный json
+    DefaultJSONResponse = JSONResponse
+
+
+# Быстрый путь ответа для крупных списков (курсы, уроки, прогресс).
+# Обычно FastAPI валидирует возвращенные модели повторно по response_model, переводит их
+# в dict (jsonable_encoder) и только потом кодирует в JSON. Здесь модели собираются через
+# model_construct (без валидации - данные уже из БД), а TypeAdapter.dump_json сериализует их
+# сразу в байты в pydantic-core. response_model у эндпоинта остается для схемы OpenAPI.
+@lru_cache(maxsize=None)
+def _adapter(response_type) -> TypeAdapter:
+    return TypeAdapter(response_type)
+
+
+class ModelResponse(Response):
+    """JSON-ответ из уже собранных моделей: response_type - тип содержимого, например List[CourseOut].
+
+    Возвращается из эндпоинта напрямую, поэтому заголовки зависимостей (ConditionalRequest)
+    нужно передать явно: headers=cache.headers.
+    """
+
+    media_type = "application/json"
+
+    def __init__(
+        self,
+        content: Any,
+        response_type: Any,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+    ):
+        # render() вызывается в Response.__init__, поэтому тип нужен до него
+        self.response_type = response_type
+        super().__init__(content=content, status_code=status_code, headers=headers)
+
+    def render(self, content: Any) -> bytes:
+        return _adapter(self.response_type).dump_json(content)
@@ -0,0 +1,42 @@
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from app.profiler import (
+    DEFAULT_INTERVAL, MAX_DURATION_SECONDS, MIN_INTERVAL, finish, get_profile, require_admin, try_start
+)
+
+router = APIRouter(prefix="/admin", tags=["Admin"], dependencies=[Depends(require_admin)], include_in_schema=False)
+
+async def _render(sampler, fmt: str):
+    # Поток сэмплера после stop() доснимает последний сэмпл - ждем его вне цикла событий
+    await asyncio.to_thread(sampler.join)
+    if fmt == "speedscope":
+        return JSONResponse(sampler.speedscope())
+    return PlainTextResponse(sampler.collapsed())
+
+@router.get("/profile")
+async def profile_worker(
+    seconds: float = Query(10, gt=0, le=MAX_DURATION_SECONDS),
+    interval: float = Query(DEFAULT_INTERVAL, ge=MIN_INTERVAL, le=1),
+    format: str = Query("collapsed", pattern="^(collapsed|speedscope)$"),
+):
+    # Сэмплирование всего воркера на N секунд; воркер продолжает обслуживать запросы
+    sampler = try_start(f"worker {seconds}s", interval)
+    if sampler is None:
+        raise HTTPException(status_code=409, detail="Профилирование уже выполняется")
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        finish(sampler)
+    return await _render(sampler, format)
+
+@router.get("/profiles/{profile_id}")
+async def get_request_profile(
+    profile_id: str,
+    format: str = Query("collapsed", pattern="^(collapsed|speedscope)$"),
+):
+    sampler = get_profile(profile_id)
+    if sampler is None:
+        raise HTTPException(status_code=404, detail="Профиль не найден")
+    return await _render(sampler, format)
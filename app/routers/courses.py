@@ -1,18 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, update, func, exists
+from sqlalchemy.orm import undefer
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Optional, List, Union
 from uuid import UUID
 from datetime import datetime
+import hashlib
+import json
 
 from app.dependencies import get_db, get_current_user
+from app.http_cache import ConditionalRequest, latest, weak_etag
+from app.responses import ModelResponse
 from app.models.models import (
     User, UserRole, Course, Lesson, LessonProgress,
     CourseEnrollment, Topic, LearningSession, Exam, SessionStatus
 )
-from app.services.ai_service import generate_quiz
+from app.services.grading import build_answer_key
+from app.services.question_store import store_questions, quiz_questions
+from app.services.read_layer import course_header_row, course_lesson_rows, course_list_rows
 
 router = APIRouter(prefix="/courses", tags=["Courses"])
 
@@ -20,20 +26,22 @@ class LessonProgressOut(BaseModel):
     status: str
     progress_percent: float
 
-class LessonOut(BaseModel):
+class LessonOutlineOut(BaseModel):
     id: UUID
     title: str
     description: Optional[str]
     duration_minutes: int
     order_num: int
     is_published: bool
-    video_url: Optional[str]
-    content: Optional[str]
     progress: Optional[LessonProgressOut] = None
 
     class Config:
         from_attributes = True
 
+class LessonOut(LessonOutlineOut):
+    video_url: Optional[str]
+    content: Optional[str]
+
 class CourseOut(BaseModel):
     id: UUID
     title: str
@@ -51,7 +59,7 @@ class CourseDetailOut(BaseModel):
     description: Optional[str]
     is_active: bool
     enrolled: bool
-    lessons: List[LessonOut]
+    lessons: List[Union[LessonOut, LessonOutlineOut]]
 
     class Config:
         from_attributes = True
@@ -96,8 +104,11 @@ async def _get_course_or_404(course_id: UUID, db: AsyncSession) -> Course:
         raise HTTPException(status_code=404, detail="Курс не найден")
     return course
 
-async def _get_lesson_or_404(lesson_id: UUID, db: AsyncSession) -> Lesson:
-    res = await db.execute(select(Lesson).where(Lesson.id == lesson_id))
+async def _get_lesson_or_404(lesson_id: UUID, db: AsyncSession, with_content: bool = False) -> Lesson:
+    query = select(Lesson).where(Lesson.id == lesson_id)
+    if with_content:
+        query = query.options(undefer(Lesson.content))
+    res = await db.execute(query)
     lesson = res.scalars().first()
     if not lesson:
         raise HTTPException(status_code=404, detail="Урок не найден")
@@ -112,35 +123,68 @@ async def _is_enrolled(user_id: UUID, course_id: UUID, db: AsyncSession) -> bool
     )
     return res.scalars().first() is not None
 
+def _lesson_content_hash(lesson: Lesson) -> str:
+    payload = json.dumps(
+        [
+            lesson.title,
+            lesson.description,
+            lesson.content,
+            lesson.video_url,
+            lesson.duration_minutes or 0,
+            lesson.order_num or 0,
+            bool(lesson.is_published),
+        ],
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+async def _bump_lessons_count(course_id: UUID, delta: int, db: AsyncSession):
+    # Атомарный инкремент в SQL, чтобы параллельные запросы не теряли обновления
+    await db.execute(
+        update(Course)
+        .where(Course.id == course_id)
+        .values(lessons_count=Course.lessons_count + delta)
+    )
+
 @router.get("", response_model=List[CourseOut])
 async def list_courses(
+    after: Optional[UUID] = None,
+    limit: Optional[int] = Query(None, ge=1, le=200),
+    cache: ConditionalRequest = Depends(),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    res = await db.execute(
-        select(Course)
-        .where(
-            Course.institution_id == current_user.institution_id,
-            Course.is_active == True,
-        )
-        .options(selectinload(Course.lessons), selectinload(Course.enrollments))
+    # Версия списка: курсы учреждения (добавление урока тоже обновляет courses.updated_at) и записи пользователя.
+    # Время изменения берется и по неактивным курсам: снятый с показа курс тоже меняет список
+    courses_version = (
+        select(func.count(Course.id).filter(Course.is_active == True), func.max(Course.updated_at))
+        .where(Course.institution_id == current_user.institution_id)
+        .subquery()
     )
-    courses = res.scalars().all()
-
-    result = []
-    for c in courses:
-        enrolled = any(e.student_id == current_user.id for e in c.enrollments)
-        result.append(
-            CourseOut(
-                id=c.id,
-                title=c.title,
-                description=c.description,
-                is_active=c.is_active,
-                lessons_count=len(c.lessons),
-                enrolled=enrolled,
-            )
+    enrollments_version = (
+        select(func.count(), func.max(CourseEnrollment.enrolled_at))
+        .where(CourseEnrollment.student_id == current_user.id)
+        .subquery()
+    )
+    version_res = await db.execute(select(courses_version, enrollments_version))
+    version = version_res.one()
+    cache.check(weak_etag(current_user.id, *version), last_modified=latest(version[1], version[3]))
+
+    rows = await course_list_rows(db, current_user.institution_id, current_user.id, after, limit)
+
+    # Строки из БД не валидируются повторно - сразу сериализуются (см. app/responses.py)
+    courses = [
+        CourseOut.model_construct(
+            id=row.id,
+            title=row.title,
+            description=row.description,
+            is_active=row.is_active,
+            lessons_count=row.lessons_count,
+            enrolled=row.enrolled,
         )
-    return result
+        for row in rows
+    ]
+    return ModelResponse(courses, List[CourseOut], headers=cache.headers)
 
 @router.post("", response_model=CourseOut, status_code=status.HTTP_201_CREATED)
 async def create_course(
@@ -172,33 +216,82 @@ async def create_course(
 @router.get("/{course_id}", response_model=CourseDetailOut)
 async def get_course(
     course_id: UUID,
+    outline: bool = False,
+    cache: ConditionalRequest = Depends(),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    res = await db.execute(
-        select(Course)
+    lessons_version = (
+        select(func.count(Lesson.id), func.max(Lesson.updated_at))
+        .where(Lesson.course_id == course_id)
+        .subquery()
+    )
+    progress_version = (
+        select(func.count(LessonProgress.id), func.max(LessonProgress.last_accessed_at))
+        .join(Lesson, Lesson.id == LessonProgress.lesson_id)
+        .where(
+            Lesson.course_id == course_id,
+            LessonProgress.student_id == current_user.id,
+        )
+        .subquery()
+    )
+    enrolled_exists = (
+        select(CourseEnrollment.course_id)
+        .where(
+            CourseEnrollment.course_id == course_id,
+            CourseEnrollment.student_id == current_user.id,
+        )
+        .exists()
+    )
+    version_res = await db.execute(
+        select(Course.updated_at, lessons_version, progress_version, enrolled_exists)
         .where(Course.id == course_id)
-        .options(selectinload(Course.lessons))
     )
-    course = res.scalars().first()
-    if not course:
+    version = version_res.first()
+    if not version:
         raise HTTPException(status_code=404, detail="Курс не найден")
 
-    enrolled = await _is_enrolled(current_user.id, course_id, db)
+    enrolled = version[-1]
+    cache.check(
+        weak_etag(current_user.id, current_user.role.value, outline, *version),
+        last_modified=latest(version[0], version[2], version[4]),
+    )
 
-    progress_res = await db.execute(
-        select(LessonProgress).where(LessonProgress.student_id == current_user.id)
+    # Только нужные колонки, без ORM-сущностей; в режиме outline текст уроков не читается вовсе
+    course = await course_header_row(db, course_id)
+    if not course:
+        raise HTTPException(status_code=404, detail="Курс не найден")
+    lesson_rows = await course_lesson_rows(
+        db,
+        course_id,
+        current_user.id,
+        with_content=not outline,
+        published_only=current_user.role == UserRole.student,
     )
-    progress_map = {p.lesson_id: p for p in progress_res.scalars().all()}
 
     lessons_out = []
-    for lesson in sorted(course.lessons, key=lambda l: l.order_num):
-        if not lesson.is_published and current_user.role == UserRole.student:
+    for lesson in lesson_rows:
+        progress = LessonProgressOut.model_construct(
+            status=lesson.progress_status,
+            progress_percent=lesson.progress_percent,
+        ) if lesson.progress_status is not None else None
+
+        if outline:
+            lessons_out.append(
+                LessonOutlineOut.model_construct(
+                    id=lesson.id,
+                    title=lesson.title,
+                    description=lesson.description,
+                    duration_minutes=lesson.duration_minutes,
+                    order_num=lesson.order_num,
+                    is_published=lesson.is_published,
+                    progress=progress,
+                )
+            )
             continue
 
-        prog = progress_map.get(lesson.id)
         lessons_out.append(
-            LessonOut(
+            LessonOut.model_construct(
                 id=lesson.id,
                 title=lesson.title,
                 description=lesson.description,
@@ -207,14 +300,11 @@ async def get_course(
                 is_published=lesson.is_published,
                 video_url=lesson.video_url,
                 content=lesson.content,
-                progress=LessonProgressOut(
-                    status=prog.status,
-                    progress_percent=prog.progress_percent,
-                ) if prog else None,
+                progress=progress,
             )
         )
 
-    return CourseDetailOut(
+    detail = CourseDetailOut.model_construct(
         id=course.id,
         title=course.title,
         description=course.description,
@@ -222,6 +312,7 @@ async def get_course(
         enrolled=enrolled,
         lessons=lessons_out,
     )
+    return ModelResponse(detail, CourseDetailOut, headers=cache.headers)
 
 @router.post("/{course_id}/enroll", status_code=status.HTTP_201_CREATED)
 async def enroll(
@@ -258,9 +349,10 @@ async def create_lesson(
         order_num=data.order_num,
         topic_id=data.topic_id,
     )
+    lesson.content_hash = _lesson_content_hash(lesson)
     db.add(lesson)
+    await _bump_lessons_count(course_id, 1, db)
     await db.commit()
-    await db.refresh(lesson)
 
     return LessonOut(
         id=lesson.id,
@@ -282,16 +374,52 @@ async def update_lesson(
     db: AsyncSession = Depends(get_db),
 ):
     await _require_teacher(current_user)
-    lesson = await _get_lesson_or_404(lesson_id, db)
+    lesson = await _get_lesson_or_404(lesson_id, db, with_content=True)
 
     if lesson.course_id != course_id:
         raise HTTPException(status_code=400, detail="Урок не принадлежит этому курсу")
 
     for field, value in data.model_dump(exclude_none=True).items():
         setattr(lesson, field, value)
+    lesson.content_hash = _lesson_content_hash(lesson)
 
     await db.commit()
-    await db.refresh(lesson)
+
+    return LessonOut(
+        id=lesson.id,
+        title=lesson.title,
+        description=lesson.description,
+        duration_minutes=lesson.duration_minutes,
+        order_num=lesson.order_num,
+        is_published=lesson.is_published,
+        video_url=lesson.video_url,
+        content=lesson.content,
+    )
+
+@router.get("/{course_id}/lessons/{lesson_id}", response_model=LessonOut)
+async def get_lesson(
+    course_id: UUID,
+    lesson_id: UUID,
+    cache: ConditionalRequest = Depends(),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    # Сначала только служебные поля: при совпадении ETag текст урока не читается
+    res = await db.execute(
+        select(Lesson.course_id, Lesson.is_published, Lesson.content_hash, Lesson.updated_at)
+        .where(Lesson.id == lesson_id)
+    )
+    head = res.first()
+    if not head or (not head.is_published and current_user.role == UserRole.student):
+        raise HTTPException(status_code=404, detail="Урок не найден")
+    if head.course_id != course_id:
+        raise HTTPException(status_code=400, detail="Урок не принадлежит этому курсу")
+
+    # Слабый ETag: GZip/Brotli меняют байты ответа, а не его смысл
+    if head.content_hash:
+        cache.check(weak_etag(head.content_hash), last_modified=head.updated_at)
+
+    lesson = await _get_lesson_or_404(lesson_id, db, with_content=True)
 
     return LessonOut(
         id=lesson.id,
@@ -318,6 +446,7 @@ async def delete_lesson(
         raise HTTPException(status_code=400, detail="Урок не принадлежит этому курсу")
 
     await db.delete(lesson)
+    await _bump_lessons_count(course_id, -1, db)
     await db.commit()
 
 @router.post("/{course_id}/lessons/{lesson_id}/progress")
@@ -374,24 +503,49 @@ async def generate_exam_for_lesson(
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    lesson = await _get_lesson_or_404(lesson_id, db)
+    # Урок, завершенность, тема и открытая сессия - одним запросом вместо четырех
+    completed = exists().where(
+        LessonProgress.lesson_id == Lesson.id,
+        LessonProgress.student_id == current_user.id,
+        LessonProgress.status == "completed",
+    )
+    open_session = (
+        select(LearningSession.id)
+        .where(
+            LearningSession.student_id == current_user.id,
+            LearningSession.subject_id == Topic.subject_id,
+            LearningSession.status == SessionStatus.testing,
+            LearningSession.assigned_exam_id.is_(None),
+        )
+        .limit(1)
+        .scalar_subquery()
+    )
+    res = await db.execute(
+        select(
+            Lesson.course_id,
+            Lesson.title,
+            Lesson.topic_id,
+            completed.label("completed"),
+            Topic.id.label("found_topic_id"),
+            Topic.title.label("topic_title"),
+            Topic.subject_id,
+            open_session.label("session_id"),
+        )
+        .outerjoin(Topic, Topic.id == Lesson.topic_id)
+        .where(Lesson.id == lesson_id)
+    )
+    lesson = res.first()
+    if not lesson:
+        raise HTTPException(status_code=404, detail="Урок не найден")
 
     if lesson.course_id != course_id:
         raise HTTPException(status_code=400, detail="Урок не принадлежит этому курсу")
 
-    if current_user.role == UserRole.student:
-        res = await db.execute(
-            select(LessonProgress).where(
-                LessonProgress.lesson_id == lesson_id,
-                LessonProgress.student_id == current_user.id,
-                LessonProgress.status == "completed",
-            )
+    if current_user.role == UserRole.student and not lesson.completed:
+        raise HTTPException(
+            status_code=400,
+            detail="Сначала завершите урок (прогресс 100%), чтобы пройти экзамен",
         )
-        if not res.scalars().first():
-            raise HTTPException(
-                status_code=400,
-                detail="Сначала завершите урок (прогресс 100%), чтобы пройти экзамен",
-            )
 
     if not lesson.topic_id:
         raise HTTPException(
@@ -399,49 +553,40 @@ async def generate_exam_for_lesson(
             detail="У этого урока не привязана тема (topic_id). Преподаватель должен указать topic_id при создании урока.",
         )
 
-    topic_res = await db.execute(select(Topic).where(Topic.id == lesson.topic_id))
-    topic = topic_res.scalars().first()
-
-    if not topic:
+    if not lesson.found_topic_id:
         raise HTTPException(status_code=404, detail="Привязанная тема не найдена")
 
-    session_res = await db.execute(
-        select(LearningSession).where(
-            LearningSession.student_id == current_user.id,
-            LearningSession.subject_id == topic.subject_id,
-            LearningSession.status == SessionStatus.testing,
-        )
-    )
-    learning_session = session_res.scalars().first()
-
-    if not learning_session:
+    session_id = lesson.session_id
+    if session_id is None:
         learning_session = LearningSession(
             student_id=current_user.id,
-            subject_id=topic.subject_id,
+            subject_id=lesson.subject_id,
             status=SessionStatus.testing,
         )
         db.add(learning_session)
         await db.flush()
+        session_id = learning_session.id
 
     try:
-        questions_json = await generate_quiz(topic_name=topic.title, difficulty=difficulty)
+        # Откалиброванные вопросы из пула, если их хватает, - без вызова LLM
+        questions_json = await quiz_questions(db, lesson.topic_id, lesson.topic_title, difficulty, current_user.id)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка генерации AI: {str(e)}")
 
     exam = Exam(
-        session_id=learning_session.id,
-        topic_id=topic.id,
+        session_id=session_id,
+        topic_id=lesson.topic_id,
         difficulty=difficulty,
-        questions=questions_json,
+        question_ids=await store_questions(db, questions_json),
+        answer_key=build_answer_key(questions_json),
     )
     db.add(exam)
     await db.commit()
-    await db.refresh(exam)
 
     return {
         "exam_id": exam.id,
         "lesson_title": lesson.title,
-        "topic": topic.title,
-        "questions": exam.questions,
+        "topic": lesson.topic_title,
+        "questions": questions_json,
         "submit_url": f"/exams/{exam.id}/submit",
     }
\ No newline at end of file
@@ -1,14 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException
+from collections import OrderedDict
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Header, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
-from pydantic import BaseModel
+from sqlalchemy import select, exists, or_, func, literal
+from sqlalchemy.dialects.postgresql import insert
+from pydantic import BaseModel, Field
+from typing import List, Optional
+import mimetypes
 import uuid
 from datetime import datetime, timezone
 
-from app.dependencies import get_db, get_current_user
-from app.models.models import User, Topic, Subject, LearningSession, Exam, SessionStatus
-from app.services.ai_service import generate_quiz, analyze_errors
+from app.dependencies import get_db, get_current_user, get_teacher_group
+from app.http_cache import ConditionalRequest, weak_etag
+from app.models.models import (
+    User, UserRole, Topic, Subject, LearningSession, Exam, SessionStatus, StudentTopicMastery, StudentProfile, Group,
+    AnswerSimilarityFlag,
+)
+from app.schemas import ExamView, ExamQuestion, AssignedExam, SimilarAnswer, SimilarityCluster
+from app.services.mastery_aggregates import apply_topic_mastery_change
+from app.services.mastery_engine import estimate_mastery
+from app.services.review_scheduler import next_review_at
+from app.services.recommendations import refresh_recommendations
+from app.services.grading import build_answer_key, resolve_selected, grade_with_key, is_open_question, OPEN_TEXT
+from app.services.open_text_grader import grade_open_answers_locally, escalate_uncertain_answers
+from app.services.error_history import record_errors
+from app.services.question_store import store_questions, load_exam_questions, load_question_texts, quiz_questions
+from app.services.idempotency import run_idempotent
+from app.services.file_storage import get_storage
+from app.services.uploads import receive_upload, process_upload, is_image, attempt_file_url, thumbnail_key
+from app.services.near_duplicates import index_answer, attempt_text
+from app.services.session_orchestrator import on_exam_submitted
 
 router = APIRouter(prefix="/exams", tags=["Exams"])
 
@@ -16,13 +37,24 @@ router = APIRouter(prefix="/exams", tags=["Exams"])
 class GenerateExamRequest(BaseModel):
     topic_id: str
     difficulty: int = 3
+    open_questions: int = Field(0, ge=0, le=5) # сколько вопросов с открытым ответом добавить
 
 @router.post("/generate")
 async def create_ai_exam(
     request: GenerateExamRequest, 
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
     current_user: User = Depends(get_current_user), 
     db: AsyncSession = Depends(get_db)
 ):
+    return await run_idempotent(
+        idempotency_key,
+        current_user.id,
+        scope="exams.generate",
+        payload=request.model_dump(),
+        handler=lambda: _create_ai_exam(request, current_user, db),
+    )
+
+async def _create_ai_exam(request: GenerateExamRequest, current_user: User, db: AsyncSession):
     res = await db.execute(select(Topic).where(Topic.id == request.topic_id))
     topic = res.scalars().first()
     if not topic:
@@ -32,7 +64,8 @@ async def create_ai_exam(
         select(LearningSession).where(
             LearningSession.student_id == current_user.id,
             LearningSession.subject_id == topic.subject_id,
-            LearningSession.status == SessionStatus.testing
+            LearningSession.status == SessionStatus.testing,
+            LearningSession.assigned_exam_id.is_(None)
         )
     )
     learning_session = session_res.scalars().first()
@@ -46,8 +79,20 @@ async def create_ai_exam(
         db.add(learning_session)
         await db.flush()
 
+    # Если по теме подошел срок повторения, это повторный тест
+    review_res = await db.execute(
+        select(StudentTopicMastery.next_review_at).where(
+            StudentTopicMastery.student_id == current_user.id,
+            StudentTopicMastery.topic_id == topic.id
+        )
+    )
+    review_due = review_res.scalar()
+
     try:
-        questions_json = await generate_quiz(topic_name=topic.title, difficulty=request.difficulty)
+        # Откалиброванные вопросы из пула, если их хватает, - без вызова LLM
+        questions_json = await quiz_questions(
+            db, topic.id, topic.title, request.difficulty, current_user.id, open_questions=request.open_questions
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ошибка генерации ИИ: {str(e)}")
 
@@ -55,7 +100,9 @@ async def create_ai_exam(
         session_id=learning_session.id,
         topic_id=topic.id,
         difficulty=request.difficulty,
-        questions=questions_json
+        question_ids=await store_questions(db, questions_json),
+        answer_key=build_answer_key(questions_json),
+        is_retest=review_due is not None and review_due <= datetime.now()
     )
     db.add(new_exam)
     await db.commit()
@@ -64,34 +111,250 @@ async def create_ai_exam(
     return {
         "exam_id": new_exam.id,
         "topic": topic.title,
-        "questions": new_exam.questions
+        "questions": questions_json
     }
 
 
+class GroupExamRequest(BaseModel):
+    group_id: uuid.UUID
+    topic_id: uuid.UUID
+    difficulty: int = 3
+
+@router.post("/group")
+async def create_group_exam(
+    request: GroupExamRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    return await run_idempotent(
+        idempotency_key,
+        current_user.id,
+        scope="exams.group",
+        payload=request.model_dump(),
+        handler=lambda: _create_group_exam(request, current_user, db),
+    )
+
+async def _create_group_exam(request: GroupExamRequest, current_user: User, db: AsyncSession):
+    # Тест собирается один раз (из пула или одним вызовом LLM) и назначается всем студентам группы
+    await get_teacher_group(request.group_id, current_user, db)
+
+    res = await db.execute(select(Topic).where(Topic.id == request.topic_id))
+    topic = res.scalars().first()
+    if not topic:
+        raise HTTPException(status_code=404, detail="Тема не найдена")
 
-from app.models.models import ExamAttempt, AiAnalysis, StudentTopicMastery, AnswerType
+    try:
+        questions_json = await quiz_questions(db, topic.id, topic.title, request.difficulty, None)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ошибка генерации ИИ: {str(e)}")
+
+    exam = Exam(
+        group_id=request.group_id,
+        topic_id=topic.id,
+        difficulty=request.difficulty,
+        question_ids=await store_questions(db, questions_json),
+        answer_key=build_answer_key(questions_json),
+    )
+    db.add(exam)
+    await db.flush()
+
+    # Сессии всех студентов группы создаются одним INSERT ... SELECT
+    students = (
+        select(
+            func.gen_random_uuid(),
+            StudentProfile.user_id,
+            literal(topic.subject_id, LearningSession.subject_id.type),
+            literal(SessionStatus.testing, LearningSession.status.type),
+            literal(exam.id, LearningSession.assigned_exam_id.type),
+        )
+        .where(StudentProfile.group_id == request.group_id)
+    )
+    inserted = await db.execute(
+        LearningSession.__table__.insert().from_select(
+            ["id", "student_id", "subject_id", "status", "assigned_exam_id"], students
+        )
+    )
+    await db.commit()
+
+    return {
+        "exam_id": exam.id,
+        "topic": topic.title,
+        "assigned_students": inserted.rowcount,
+    }
+
+
+@router.get("/assigned", response_model=List[AssignedExam])
+async def list_assigned_exams(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    res = await db.execute(
+        select(
+            LearningSession.id.label("session_id"),
+            LearningSession.status,
+            LearningSession.started_at,
+            LearningSession.completed_at,
+            Exam.id.label("exam_id"),
+            Exam.topic_id,
+            Exam.difficulty,
+            Topic.title,
+        )
+        .join(Exam, Exam.id == LearningSession.assigned_exam_id)
+        .outerjoin(Topic, Topic.id == Exam.topic_id)
+        .where(LearningSession.student_id == current_user.id)
+        .order_by(LearningSession.started_at.desc())
+    )
+    return [
+        AssignedExam(
+            exam_id=row.exam_id,
+            session_id=row.session_id,
+            topic_id=row.topic_id,
+            topic=row.title,
+            difficulty=row.difficulty,
+            status=row.status.value,
+            assigned_at=row.started_at,
+            completed_at=row.completed_at,
+        )
+        for row in res
+    ]
+
+
+# {exam_id: [ExamQuestion]} - вопросы теста не меняются после создания,
+# поэтому кеш процесса не нуждается в инвалидации (LRU по объему)
+_EXAM_CACHE_SIZE = 512
+_exam_questions_cache: "OrderedDict[uuid.UUID, list]" = OrderedDict()
+
+async def _public_questions(db: AsyncSession, exam_id: uuid.UUID) -> list:
+    cached = _exam_questions_cache.get(exam_id)
+    if cached is not None:
+        _exam_questions_cache.move_to_end(exam_id)
+        return cached
+
+    questions = [
+        ExamQuestion(question=q.get("question"), options=q.get("options") or [], open=is_open_question(q))
+        for q in await load_exam_questions(db, exam_id)
+    ]
+    _exam_questions_cache[exam_id] = questions
+    if len(_exam_questions_cache) > _EXAM_CACHE_SIZE:
+        _exam_questions_cache.popitem(last=False)
+    return questions
+
+def _exam_access(user: User):
+    # Доступ: свой тест, назначенный группе тест или тест группы преподавателя
+    owned = exists().where(
+        LearningSession.student_id == user.id,
+        or_(LearningSession.id == Exam.session_id, LearningSession.assigned_exam_id == Exam.id),
+    )
+    taught = exists().where(Group.id == Exam.group_id, Group.teacher_id == user.id)
+    return or_(owned, taught)
+
+@router.get("/{exam_id}", response_model=ExamView)
+async def get_exam(
+    exam_id: uuid.UUID,
+    cache: ConditionalRequest = Depends(),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    res = await db.execute(
+        select(
+            Exam.id, Exam.topic_id, Exam.difficulty, Exam.is_retest, Exam.created_at,
+            Topic.title, _exam_access(current_user).label("allowed"),
+        )
+        .outerjoin(Topic, Topic.id == Exam.topic_id)
+        .where(Exam.id == exam_id)
+    )
+    exam = res.first()
+    if not exam or not exam.allowed:
+        raise HTTPException(status_code=404, detail="Тест не найден")
+
+    cache.check(weak_etag(exam.id, exam.created_at, exam.title), last_modified=exam.created_at)
+
+    return ExamView(
+        id=exam.id,
+        topic_id=exam.topic_id,
+        topic=exam.title,
+        difficulty=exam.difficulty if exam.difficulty is not None else 3,
+        is_retest=bool(exam.is_retest),
+        questions=await _public_questions(db, exam.id),
+    )
+
+
+
+from app.models.models import ExamAttempt, StudentTopicMastery, AnswerType
 from app.schemas import ExamSubmitRequest
 
 @router.post("/{exam_id}/submit")
 async def submit_exam(
     exam_id: uuid.UUID,
     submission: ExamSubmitRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    res = await db.execute(select(Exam).where(Exam.id == exam_id).options(selectinload(Exam.topic)))
-    exam = res.scalars().first()
+    # Повтор отправки с тем же ключом не создает новую попытку и не увеличивает attempts_count
+    return await run_idempotent(
+        idempotency_key,
+        current_user.id,
+        scope=f"exams.submit:{exam_id}",
+        payload=submission.model_dump(),
+        handler=lambda: _submit_exam(exam_id, submission, current_user, db),
+    )
+
+async def _submit_exam(exam_id: uuid.UUID, submission: ExamSubmitRequest, current_user: User, db: AsyncSession):
+    # Для проверки нужен только компактный ключ ответов, полный JSON вопросов не читается
+    assigned_session = (
+        select(LearningSession.id)
+        .where(LearningSession.student_id == current_user.id, LearningSession.assigned_exam_id == Exam.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    res = await db.execute(
+        select(
+            Exam.id, Exam.session_id, Exam.topic_id, Exam.answer_key, Exam.question_ids,
+            Topic.title.label("topic_title"), Topic.subject_id,
+            assigned_session.label("assigned_session_id"),
+        )
+        .outerjoin(Topic, Topic.id == Exam.topic_id)
+        .where(Exam.id == exam_id)
+    )
+    exam = res.first()
     if not exam:
         raise HTTPException(status_code=404, detail="Тест не найден")
 
-    questions = exam.questions
-    correct_count = 0
-    total_questions = len(questions)
-    
-    for i, q in enumerate(questions):
-        user_answer = next((a.selected_option for a in submission.answers if a.question_index == i), None)
-        if user_answer == q['correct_answer']:
-            correct_count += 1
+    questions = None
+    answer_key = exam.answer_key
+    if (
+        answer_key is None
+        or OPEN_TEXT in answer_key
+        or any(a.selected_index is None and a.selected_option is not None for a in submission.answers)
+    ):
+        # Старый тест без ключа, ответы текстом или открытые вопросы - нужны варианты и эталоны
+        questions = await load_exam_questions(db, exam.id)
+        answer_key = answer_key or build_answer_key(questions)
+
+    # Открытые ответы: локальная проверка по эталонам всего экзамена разом, LLM - только для неуверенных
+    open_graded, uncertain = {}, []
+    if OPEN_TEXT in answer_key:
+        texts = {}
+        for a in reversed(submission.answers):
+            if a.answer_text is not None and 0 <= a.question_index < len(answer_key):
+                texts[a.question_index] = a.answer_text
+        open_graded, uncertain = grade_open_answers_locally(
+            questions, {i: t for i, t in texts.items() if answer_key[i] == OPEN_TEXT}
+        )
+    if uncertain:
+        # Чтение закончено: транзакция закрывается и соединение возвращается в пул на время
+        # запросов к LLM. Попытка и оценка пишутся ниже уже в новой транзакции
+        await db.close()
+        open_graded.update(await escalate_uncertain_answers(uncertain))
+
+    total_questions = len(answer_key)
+    correct_count, errors = grade_with_key(
+        answer_key,
+        resolve_selected(submission.answers, questions),
+        {i: r.correct for i, r in open_graded.items()} if OPEN_TEXT in answer_key else None,
+    )
 
     score = (correct_count / total_questions) * 100
 
@@ -101,54 +364,298 @@ async def submit_exam(
         student_id=current_user.id,
         answers=[a.model_dump() for a in submission.answers],
         score=score,
-        answer_type=AnswerType.multiple_choice
+        answer_type=AnswerType.open_text if OPEN_TEXT in answer_key else AnswerType.multiple_choice,
+        errors_recorded=True, # ошибки записываются ниже в той же транзакции
     )
     db.add(attempt)
     await db.flush()
 
+    if errors:
+        # Для истории ошибок нужен только текст вопросов с ошибками - узкая выборка, не полный JSON
+        if questions is None and exam.question_ids is not None:
+            texts = await load_question_texts(db, (exam.question_ids[e["question_index"]] for e in errors))
+            for e in errors:
+                e["question"] = texts.get(exam.question_ids[e["question_index"]])
+        else:
+            if questions is None:
+                questions = await load_exam_questions(db, exam.id)
+            for e in errors:
+                e["question"] = questions[e["question_index"]].get("question")
+        await record_errors(db, current_user.id, exam.topic_id, attempt.id, errors)
+
+    if open_graded:
+        # Открытые ответы - в индекс поиска списанных ответов (поиск кандидатов через LSH-бакеты)
+        await index_answer(db, attempt.id, exam.id, current_user.id, attempt_text(attempt.answers))
 
+    # Строка оценки создается заранее и блокируется до конца транзакции: параллельные отправки
+    # по той же теме выполняются по очереди, иначе обе применят к агрегату предмета одну и ту же
+    # "старую" оценку и он разойдется с суммой по темам
+    await db.execute(
+        insert(StudentTopicMastery.__table__)
+        .values(student_id=current_user.id, topic_id=exam.topic_id, attempts_count=0, mastery_level=0.0)
+        .on_conflict_do_nothing(index_elements=["student_id", "topic_id"])
+    )
     mastery_res = await db.execute(
-        select(StudentTopicMastery).where(
+        select(StudentTopicMastery)
+        .where(
             StudentTopicMastery.student_id == current_user.id,
             StudentTopicMastery.topic_id == exam.topic_id
         )
+        .with_for_update()
     )
-    mastery = mastery_res.scalars().first()
-    
-    if not mastery:
-        mastery = StudentTopicMastery(
-            student_id=current_user.id, 
-            topic_id=exam.topic_id,
-            attempts_count=0,
-            mastery_level=0.0
-        )
-        db.add(mastery)
+    mastery = mastery_res.scalars().one()
 
     if mastery.attempts_count is None:
         mastery.attempts_count = 0
 
-    mastery.mastery_level = score 
+    old_level, old_attempts = mastery.mastery_level, mastery.attempts_count
+
+    mastery.mastery_level, mastery.confidence = estimate_mastery(
+        mastery.mastery_level,
+        mastery.confidence,
+        mastery.attempts_count,
+        correct=correct_count,
+        total=total_questions,
+    )
     mastery.attempts_count += 1
     mastery.last_tested_at = datetime.now()
+    mastery.next_review_at = next_review_at(
+        mastery.mastery_level, mastery.confidence, mastery.last_tested_at
+    )
 
+    await apply_topic_mastery_change(
+        db,
+        student_id=current_user.id,
+        subject_id=exam.subject_id,
+        old_level=old_level,
+        old_attempts=old_attempts,
+        new_level=mastery.mastery_level,
+        new_attempts=mastery.attempts_count,
+    )
 
-    try:
-        analysis_data = await analyze_errors(exam.topic.title, questions, [a.model_dump() for a in submission.answers])
-        ai_analysis = AiAnalysis(
-            attempt_id=attempt.id,
-            score=score,
-            explanation=analysis_data.get("explanation"),
-            weak_topics=analysis_data.get("weak_topics"),
-            recommendations=analysis_data.get("recommendation")
-        )
-        db.add(ai_analysis)
-    except Exception as e:
-        print(f"AI Analysis Error: {e}")
+
+    # Рекомендации пересчитываются здесь, чтобы при чтении не требовался вызов LLM;
+    # со слабыми местами из разбора ИИ - еще раз, когда разбор будет готов
+    await refresh_recommendations(db, student_id=current_user.id, subject_id=exam.subject_id)
 
     await db.commit()
 
+    # Статусом сессии (своей или назначенной группе) управляет session_orchestrator.
+    # Разбор ошибок ИИ готовится там же в фоне (этап explaining) - отправка теста не ждет LLM
+    session_id = exam.session_id or exam.assigned_session_id
+    if session_id is not None:
+        await on_exam_submitted(db, session_id, current_user.id, exam.id)
+
     return {
         "score": score,
         "correct_answers": f"{correct_count}/{total_questions}",
-        "analysis": analysis_data if 'analysis_data' in locals() else "Анализ временно недоступен"
-    }
\ No newline at end of file
+        "open_answers": [
+            {
+                "question_index": r.question_index,
+                "correct": r.correct,
+                "similarity": round(r.similarity, 3),
+                "method": r.method,
+                "feedback": r.feedback,
+            }
+            for r in sorted(open_graded.values(), key=lambda r: r.question_index)
+        ],
+        "session_id": session_id,
+        "analysis": "Разбор ошибок готовится" if session_id is not None else "Анализ временно недоступен",
+    }
+
+
+@router.post("/{exam_id}/submit-file")
+async def submit_exam_file(
+    exam_id: uuid.UUID,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # Ответ фото или документом: multipart/form-data, файл в поле file.
+    # Тело не буферизуется - файл пишется в хранилище по мере чтения
+    res = await db.execute(select(_exam_access(current_user)).select_from(Exam).where(Exam.id == exam_id))
+    if not res.scalar():
+        raise HTTPException(status_code=404, detail="Тест не найден")
+
+    # Соединение возвращается в пул на время загрузки: медленный клиент не держит его
+    # с открытой транзакцией. close() отсоединяет current_user, его поля остаются загруженными
+    await db.close()
+
+    stored, fields = await receive_upload(request)
+
+    # Повторная загрузка того же файла возвращает уже созданную попытку
+    existing_res = await db.execute(
+        select(ExamAttempt.id, ExamAttempt.answer_type).where(
+            ExamAttempt.exam_id == exam_id,
+            ExamAttempt.student_id == current_user.id,
+            ExamAttempt.file_hash == stored.sha256,
+        )
+    )
+    existing = existing_res.first()
+    if existing:
+        return {
+            "attempt_id": existing.id,
+            "file_url": attempt_file_url(existing.id),
+            "answer_type": existing.answer_type,
+            "size": stored.size,
+            "sha256": stored.sha256,
+        }
+
+    image = is_image(stored)
+    attempt_id = uuid.uuid4()
+    attempt = ExamAttempt(
+        id=attempt_id,
+        exam_id=exam_id,
+        student_id=current_user.id,
+        answers={"comment": fields["comment"]} if fields.get("comment") else None,
+        file_url=attempt_file_url(attempt_id),
+        file_key=stored.key,
+        file_hash=stored.sha256,
+        file_size=stored.size,
+        answer_type=AnswerType.photo if image else AnswerType.document,
+        errors_recorded=True, # у файловых ответов разбирать нечего
+    )
+    db.add(attempt)
+    await db.commit()
+
+    background_tasks.add_task(process_upload, attempt.id, stored.key, image)
+
+    return {
+        "attempt_id": attempt.id,
+        "file_url": attempt.file_url,
+        "answer_type": attempt.answer_type,
+        "size": stored.size,
+        "sha256": stored.sha256,
+    }
+
+
+@router.get("/attempts/{attempt_id}/file")
+async def get_attempt_file(
+    attempt_id: uuid.UUID,
+    thumbnail: bool = False,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # Файл ответа видят только автор попытки и преподаватель его группы (или группы назначенного теста)
+    student_group = select(StudentProfile.group_id).where(StudentProfile.user_id == ExamAttempt.student_id)
+    taught = exists().where(
+        Group.teacher_id == current_user.id,
+        or_(Group.id == Exam.group_id, Group.id.in_(student_group)),
+    )
+    res = await db.execute(
+        select(ExamAttempt.file_key, ExamAttempt.thumbnail_url, ExamAttempt.student_id, taught.label("taught"))
+        .join(Exam, Exam.id == ExamAttempt.exam_id)
+        .where(ExamAttempt.id == attempt_id)
+    )
+    row = res.first()
+    if not row or not row.file_key or (row.student_id != current_user.id and not row.taught):
+        raise HTTPException(status_code=404, detail="Файл не найден")
+    if thumbnail and not row.thumbnail_url:
+        raise HTTPException(status_code=404, detail="Миниатюра еще не готова")
+
+    key = thumbnail_key(row.file_key) if thumbnail else row.file_key
+    chunks = get_storage().read(key)
+    # Первый чанк читается до ответа, чтобы отсутствующий файл дал 404, а не оборванный 200
+    try:
+        first = await chunks.__anext__()
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Файл не найден")
+    except StopAsyncIteration:
+        first = b""
+
+    async def body():
+        yield first
+        async for chunk in chunks:
+            yield chunk
+
+    media_type = "image/jpeg" if thumbnail else mimetypes.guess_type(key)[0] or "application/octet-stream"
+    return StreamingResponse(
+        body(),
+        media_type=media_type,
+        headers={"Cache-Control": "private, max-age=3600", "X-Content-Type-Options": "nosniff"},
+    )
+
+
+@router.get("/{exam_id}/similar-answers", response_model=List[SimilarityCluster])
+async def list_similar_answers(
+    exam_id: uuid.UUID,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # Кластеры похожих ответов с участием попыток этого теста (для преподавателя группы)
+    if current_user.role != UserRole.teacher:
+        raise HTTPException(
+            status_code=403,
+            detail="Только преподаватель может выполнять это действие"
+        )
+    student_group = (
+        select(StudentProfile.group_id)
+        .join(LearningSession, LearningSession.student_id == StudentProfile.user_id)
+        .where(LearningSession.id == Exam.session_id)
+    )
+    taught = exists().where(
+        Group.teacher_id == current_user.id,
+        or_(Group.id == Exam.group_id, Group.id.in_(student_group)),
+    )
+    res = await db.execute(select(taught.label("allowed")).where(Exam.id == exam_id))
+    if not res.scalar():
+        raise HTTPException(status_code=404, detail="Тест не найден")
+
+    exam_attempts = select(ExamAttempt.id).where(ExamAttempt.exam_id == exam_id)
+    flags_res = await db.execute(
+        select(
+            AnswerSimilarityFlag.attempt_id,
+            AnswerSimilarityFlag.other_attempt_id,
+            AnswerSimilarityFlag.similarity,
+        ).where(or_(
+            AnswerSimilarityFlag.attempt_id.in_(exam_attempts),
+            AnswerSimilarityFlag.other_attempt_id.in_(exam_attempts),
+        ))
+    )
+    flags = flags_res.all()
+    if not flags:
+        return []
+
+    # Связные компоненты графа похожих пар (union-find)
+    parent = {}
+
+    def find(x):
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b, _ in flags:
+        parent[find(a)] = find(b)
+
+    max_similarity = {}
+    for a, _, similarity in flags:
+        root = find(a)
+        max_similarity[root] = max(max_similarity.get(root, 0.0), similarity)
+
+    attempts_res = await db.execute(
+        select(
+            ExamAttempt.id, ExamAttempt.exam_id, ExamAttempt.student_id,
+            ExamAttempt.submitted_at, User.full_name,
+        )
+        .join(User, User.id == ExamAttempt.student_id)
+        .where(ExamAttempt.id.in_(list(parent)))
+        .order_by(ExamAttempt.submitted_at)
+    )
+    clusters = {}
+    for row in attempts_res:
+        clusters.setdefault(find(row.id), []).append(SimilarAnswer(
+            attempt_id=row.id,
+            exam_id=row.exam_id,
+            student_id=row.student_id,
+            student_name=row.full_name,
+            submitted_at=row.submitted_at,
+        ))
+
+    return sorted(
+        (SimilarityCluster(max_similarity=max_similarity[root], attempts=attempts) for root, attempts in clusters.items()),
+        key=lambda c: c.max_similarity,
+        reverse=True,
+    )
@@ -0,0 +1,118 @@
+from collections import OrderedDict
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, func, and_, String
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from uuid import UUID
+
+from app.dependencies import get_db, get_current_user, get_teacher_group
+from app.http_cache import ConditionalRequest, latest, weak_etag
+from app.models.models import User, StudentProfile, StudentTopicMastery
+from app.schemas import MasteryMatrix
+from app.services.curriculum import get_curriculum
+
+router = APIRouter(prefix="/groups", tags=["Groups"])
+
+# {(group_id, subject_id): (version, MasteryMatrix)} - LRU в памяти процесса.
+# Версия меняется при каждой новой попытке (student_topic_mastery.updated_at) и при смене состава группы:
+# отпечаток состава - md5 отсортированных id студентов, замена одного студента другим тоже его меняет
+_MATRIX_CACHE_SIZE = 256
+_matrix_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+
+@router.get("/{group_id}/mastery-matrix", response_model=MasteryMatrix)
+async def get_mastery_matrix(
+    group_id: UUID,
+    subject_id: UUID,
+    cache: ConditionalRequest = Depends(),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    await get_teacher_group(group_id, current_user, db)
+
+    curriculum = await get_curriculum(db)
+    subject = curriculum.subjects_by_id.get(subject_id)
+    if not subject:
+        raise HTTPException(status_code=404, detail="Предмет не найден")
+    topic_ids = [t.id for t in subject.topics]
+
+    mastery_join = and_(
+        StudentTopicMastery.student_id == StudentProfile.user_id,
+        StudentTopicMastery.topic_id.in_(topic_ids),
+    )
+
+    members_fingerprint = (
+        select(
+            func.md5(func.string_agg(
+                StudentProfile.user_id.cast(String), aggregate_order_by(",", StudentProfile.user_id)
+            ))
+        )
+        .where(StudentProfile.group_id == group_id)
+        .scalar_subquery()
+    )
+    version_res = await db.execute(
+        select(
+            members_fingerprint,
+            func.count(func.distinct(StudentProfile.user_id)),
+            func.max(StudentTopicMastery.updated_at),
+            # Студент попадает в группу при регистрации: время вступления - users.created_at
+            func.max(User.created_at),
+        )
+        .select_from(StudentProfile)
+        .join(User, User.id == StudentProfile.user_id)
+        .outerjoin(StudentTopicMastery, mastery_join)
+        .where(StudentProfile.group_id == group_id)
+    )
+    version = (curriculum.version, *version_res.one())
+    _, subjects_updated_at, _, topics_updated_at = curriculum.version
+    cache.check(
+        weak_etag(group_id, subject_id, *version),
+        last_modified=latest(subjects_updated_at, topics_updated_at, version[-2], version[-1]),
+    )
+
+    key = (group_id, subject_id)
+    cached = _matrix_cache.get(key)
+    if cached and cached[0] == version:
+        _matrix_cache.move_to_end(key)
+        return cached[1]
+
+    # Один агрегирующий запрос: строка на студента, его оценки по темам предмета - в массивах
+    has_mastery = StudentTopicMastery.topic_id.isnot(None)
+    res = await db.execute(
+        select(
+            StudentProfile.user_id,
+            User.full_name,
+            func.array_agg(StudentTopicMastery.topic_id).filter(has_mastery).label("topic_ids"),
+            func.array_agg(StudentTopicMastery.mastery_level).filter(has_mastery).label("levels"),
+        )
+        .join(User, User.id == StudentProfile.user_id)
+        .outerjoin(StudentTopicMastery, mastery_join)
+        .where(StudentProfile.group_id == group_id)
+        .group_by(StudentProfile.user_id, User.full_name)
+        .order_by(User.full_name)
+    )
+
+    column_of = {topic_id: i for i, topic_id in enumerate(topic_ids)}
+    student_ids, student_names, rows = [], [], []
+    for row in res:
+        cells = [None] * len(topic_ids)
+        for topic_id, level in zip(row.topic_ids or (), row.levels or ()):
+            cells[column_of[topic_id]] = level
+        student_ids.append(row.user_id)
+        student_names.append(row.full_name)
+        rows.append(cells)
+
+    matrix = MasteryMatrix(
+        group_id=group_id,
+        subject_id=subject_id,
+        topic_ids=topic_ids,
+        topic_titles=[t.title for t in subject.topics],
+        student_ids=student_ids,
+        student_names=student_names,
+        mastery=rows,
+    )
+
+    _matrix_cache[key] = (version, matrix)
+    _matrix_cache.move_to_end(key)
+    if len(_matrix_cache) > _MATRIX_CACHE_SIZE:
+        _matrix_cache.popitem(last=False)
+    return matrix
@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from uuid import UUID
+
+from app.dependencies import get_db, get_current_user
+from app.models.models import User
+from app.schemas import SessionState
+from app.services.session_orchestrator import advance, get_session_state
+
+router = APIRouter(prefix="/sessions", tags=["Learning Sessions"])
+
+@router.get("/{session_id}", response_model=SessionState)
+async def get_session(
+    session_id: UUID,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    return await get_session_state(db, session_id, current_user.id)
+
+@router.post("/{session_id}/advance", response_model=SessionState)
+async def advance_session(
+    session_id: UUID,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # Переход к следующему этапу; материалы этапа обычно уже подготовлены в фоне
+    return await advance(db, session_id, current_user.id)
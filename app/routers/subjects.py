@@ -1,54 +1,226 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
-from typing import List
+from sqlalchemy import select, func, literal
+from typing import List, Optional
+from uuid import UUID
+from datetime import datetime
 
-from app.dependencies import get_db, get_current_user
-from app.models.models import User, Subject, Topic, StudentTopicMastery
-from app.schemas import SubjectProgress, TopicProgress
+from app.dependencies import get_db, get_current_user, get_teacher_group
+from app.http_cache import ConditionalRequest, weak_etag
+from app.responses import ModelResponse
+from app.models.models import (
+    User, StudentTopicMastery, StudentSubjectMastery, StudentProfile, TopicClosure, StudentRecommendation
+)
+from app.schemas import (
+    SubjectProgress, TopicProgress, SubtreeMastery, SubjectMasterySummary, DueReview, Recommendation
+)
+from app.services.curriculum import curriculum_version_subqueries, get_curriculum
+from app.services.read_layer import topic_mastery_rows
 
 router = APIRouter(prefix="/subjects", tags=["Subjects & Progress"])
 
 @router.get("/my-progress", response_model=List[SubjectProgress])
 async def get_my_progress(
+    cache: ConditionalRequest = Depends(),
     current_user: User = Depends(get_current_user), 
     db: AsyncSession = Depends(get_db)
 ):
-    # 1. Получаем все предметы и загружаем связанные с ними темы
-    subjects_res = await db.execute(
-        select(Subject).options(selectinload(Subject.topics))
+    # 0. Версия ответа: учебный план + оценки студента. При совпадении ETag отдаем 304
+    mastery_version = (
+        select(func.count(StudentTopicMastery.id), func.max(StudentTopicMastery.updated_at))
+        .where(StudentTopicMastery.student_id == current_user.id)
+        .subquery()
     )
-    subjects = subjects_res.scalars().all()
+    version_res = await db.execute(select(*curriculum_version_subqueries(), mastery_version))
+    version = version_res.one()
+    modified_at = [v for v in (version[1], version[3], version[5]) if v is not None]
+    cache.check(
+        weak_etag(current_user.id, *version),
+        last_modified=max(modified_at) if modified_at else None,
+    )
+
+    # 1. Предметы и темы берем из кеша процесса (уже отсортированы по order_num)
+    curriculum = await get_curriculum(db, version=tuple(version[:4]))
 
     # 2. Получаем оценки (прогресс) текущего студента
-    mastery_res = await db.execute(
-        select(StudentTopicMastery).where(StudentTopicMastery.student_id == current_user.id)
-    )
-    # Делаем словарь {topic_id: mastery_object} для быстрого поиска
-    masteries = {m.topic_id: m for m in mastery_res.scalars().all()}
+    # Словарь {topic_id: row} для быстрого поиска; строки Core, без ORM-сущностей
+    masteries = await topic_mastery_rows(db, current_user.id)
 
     # 3. Собираем красивый ответ для фронтенда
     result = []
-    for subj in subjects:
+    for subj in curriculum.subjects:
         topics_data = []
-        
-        # Сортируем темы по порядку (order_num)
-        for topic in sorted(subj.topics, key=lambda t: t.order_num):
+
+        for topic in subj.topics:
             m = masteries.get(topic.id) # Ищем оценку студента по этой теме
-            
-            topics_data.append(TopicProgress(
+
+            topics_data.append(TopicProgress.model_construct(
                 id=topic.id,
                 title=topic.title,
                 order_num=topic.order_num,
                 mastery_level=m.mastery_level if m else 0.0, # Если еще не сдавал - 0
                 attempts_count=m.attempts_count if m else 0
             ))
-        
-        result.append(SubjectProgress(
+
+        result.append(SubjectProgress.model_construct(
             id=subj.id,
             name=subj.name,
             topics=topics_data
         ))
 
-    return result
\ No newline at end of file
+    # Без повторной валидации по response_model (см. app/responses.py)
+    return ModelResponse(result, List[SubjectProgress], headers=cache.headers)
+
+@router.get("/my-summary", response_model=List[SubjectMasterySummary])
+async def get_my_summary(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # O(предметов): агрегаты уже посчитаны в student_subject_mastery, темы берем из кеша
+    curriculum = await get_curriculum(db)
+    res = await db.execute(
+        select(StudentSubjectMastery).where(StudentSubjectMastery.student_id == current_user.id)
+    )
+    aggregates = {a.subject_id: a for a in res.scalars().all()}
+
+    result = []
+    for subj in curriculum.subjects:
+        a = aggregates.get(subj.id)
+        topics_count = len(subj.topics)
+        result.append(SubjectMasterySummary(
+            id=subj.id,
+            name=subj.name,
+            topics_count=topics_count,
+            tested_topics=a.tested_topics if a else 0,
+            mastery_level=a.mastery_sum / topics_count if a and topics_count else 0.0,
+            weighted_mastery=a.weighted_sum / a.attempts_total if a and a.attempts_total else 0.0,
+            attempts_count=a.attempts_total if a else 0,
+        ))
+    return result
+
+@router.get("/due-reviews", response_model=List[DueReview])
+async def get_due_reviews(
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # Диапазонный скан по индексу (student_id, next_review_at) - история оценок не просматривается
+    res = await db.execute(
+        select(
+            StudentTopicMastery.topic_id,
+            StudentTopicMastery.mastery_level,
+            StudentTopicMastery.next_review_at,
+        )
+        .where(
+            StudentTopicMastery.student_id == current_user.id,
+            StudentTopicMastery.next_review_at <= datetime.now(),
+        )
+        .order_by(StudentTopicMastery.next_review_at)
+        .limit(limit)
+    )
+    rows = res.all()
+    if not rows:
+        return []
+
+    curriculum = await get_curriculum(db)
+    result = []
+    for row in rows:
+        topic = curriculum.topics_by_id.get(row.topic_id)
+        if topic is None:
+            continue
+        result.append(DueReview(
+            topic_id=row.topic_id,
+            subject_id=topic.subject_id,
+            title=topic.title,
+            mastery_level=row.mastery_level or 0.0,
+            next_review_at=row.next_review_at,
+        ))
+    return result
+
+@router.get("/recommendations", response_model=List[Recommendation])
+async def get_recommendations(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # Список уже посчитан при последней сдаче теста - только чтение по первичному ключу
+    res = await db.execute(
+        select(StudentRecommendation)
+        .where(StudentRecommendation.student_id == current_user.id)
+        .order_by(StudentRecommendation.rank)
+    )
+    rows = res.scalars().all()
+    if not rows:
+        return []
+
+    curriculum = await get_curriculum(db)
+    result = []
+    for r in rows:
+        topic = curriculum.topics_by_id.get(r.topic_id)
+        if topic is None:
+            continue
+        result.append(Recommendation(
+            topic_id=r.topic_id,
+            subject_id=topic.subject_id,
+            title=topic.title,
+            score=r.score,
+            reason=r.reason,
+        ))
+    return result
+
+@router.get("/topics/{topic_id}/mastery", response_model=SubtreeMastery)
+async def get_subtree_mastery(
+    topic_id: UUID,
+    group_id: Optional[UUID] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    # Без group_id - прогресс самого студента, с group_id - сводка по группе преподавателя
+    if group_id is not None:
+        await get_teacher_group(group_id, current_user, db)
+        students = select(StudentProfile.user_id).where(StudentProfile.group_id == group_id)
+        students_count = (
+            select(func.count())
+            .select_from(StudentProfile)
+            .where(StudentProfile.group_id == group_id)
+            .scalar_subquery()
+        )
+    else:
+        students = select(literal(current_user.id))
+        students_count = literal(1)
+
+    # Все темы поддерева (включая саму тему) берутся из таблицы замыкания одним запросом
+    subtree = select(TopicClosure.descendant_id).where(TopicClosure.ancestor_id == topic_id)
+    topics_count = (
+        select(func.count())
+        .select_from(TopicClosure)
+        .where(TopicClosure.ancestor_id == topic_id)
+        .scalar_subquery()
+    )
+
+    res = await db.execute(
+        select(
+            topics_count.label("topics_count"),
+            students_count.label("students_count"),
+            func.count(StudentTopicMastery.id).label("tested_count"),
+            func.coalesce(func.sum(StudentTopicMastery.mastery_level), 0.0).label("mastery_sum"),
+            func.coalesce(func.sum(StudentTopicMastery.attempts_count), 0).label("attempts_count"),
+            func.max(StudentTopicMastery.last_tested_at).label("last_tested_at"),
+        ).where(
+            StudentTopicMastery.topic_id.in_(subtree),
+            StudentTopicMastery.student_id.in_(students),
+        )
+    )
+    row = res.one()
+    if not row.topics_count:
+        raise HTTPException(status_code=404, detail="Тема не найдена")
+
+    cells = row.topics_count * row.students_count
+    return SubtreeMastery(
+        topic_id=topic_id,
+        topics_count=row.topics_count,
+        students_count=row.students_count,
+        tested_count=row.tested_count,
+        mastery_level=row.mastery_sum / cells if cells else 0.0,
+        attempts_count=row.attempts_count,
+        last_tested_at=row.last_tested_at,
+    )
@@ -1,6 +1,7 @@
 from pydantic import BaseModel, EmailStr
 from uuid import UUID
 from typing import Optional
+from datetime import datetime
 from app.models.models import UserRole
 from typing import List
 
@@ -28,7 +29,9 @@ class Token(BaseModel):
 
 class AnswerSubmission(BaseModel):
     question_index: int
-    selected_option: str
+    selected_option: Optional[str] = None
+    selected_index: Optional[int] = None # индекс варианта в options; если передан, JSON вопросов не читается
+    answer_text: Optional[str] = None # ответ на открытый вопрос
 
 class ExamSubmitRequest(BaseModel):
     answers: List[AnswerSubmission]
@@ -43,4 +46,96 @@ class TopicProgress(BaseModel):
 class SubjectProgress(BaseModel):
     id: UUID
     name: str
-    topics: List[TopicProgress]
\ No newline at end of file
+    topics: List[TopicProgress]
+
+class SubtreeMastery(BaseModel):
+    topic_id: UUID
+    topics_count: int
+    students_count: int
+    tested_count: int
+    mastery_level: float # среднее по всем темам поддерева и студентам, несданные темы = 0
+    attempts_count: int
+    last_tested_at: Optional[datetime]
+
+class SubjectMasterySummary(BaseModel):
+    id: UUID
+    name: str
+    topics_count: int
+    tested_topics: int
+    mastery_level: float # среднее по всем темам предмета, несданные темы = 0
+    weighted_mastery: float # среднее, взвешенное по числу попыток
+    attempts_count: int
+
+class MasteryMatrix(BaseModel):
+    group_id: UUID
+    subject_id: UUID
+    topic_ids: List[UUID]
+    topic_titles: List[str]
+    student_ids: List[UUID]
+    student_names: List[str]
+    mastery: List[List[Optional[float]]] # строки - студенты, столбцы - темы; None - тема не сдавалась
+
+class DueReview(BaseModel):
+    topic_id: UUID
+    subject_id: UUID
+    title: str
+    mastery_level: float
+    next_review_at: datetime
+
+class Recommendation(BaseModel):
+    topic_id: UUID
+    subject_id: UUID
+    title: str
+    score: float
+    reason: str # weak_topic | low_mastery | review_due | next_topic
+
+class ExamQuestion(BaseModel):
+    question: Optional[str] = None
+    options: List[str] = []
+    open: bool = False # открытый вопрос: ответ текстом в answer_text
+
+class ExamView(BaseModel):
+    # Тест для прохождения - без правильных ответов
+    id: UUID
+    topic_id: Optional[UUID]
+    topic: Optional[str]
+    difficulty: int
+    is_retest: bool
+    questions: List[ExamQuestion]
+
+class AssignedExam(BaseModel):
+    exam_id: UUID
+    session_id: UUID
+    topic_id: Optional[UUID]
+    topic: Optional[str]
+    difficulty: int
+    status: str
+    assigned_at: datetime
+    completed_at: Optional[datetime]
+
+class SimilarAnswer(BaseModel):
+    attempt_id: UUID
+    exam_id: UUID
+    student_id: UUID
+    student_name: str
+    submitted_at: Optional[datetime]
+
+class SimilarityCluster(BaseModel):
+    # Группа попыток, связанных парами похожих ответов (оценка Жаккара по MinHash)
+    max_similarity: float
+    attempts: List[SimilarAnswer]
+
+class SessionState(BaseModel):
+    id: UUID
+    status: str
+    subject_id: UUID
+    exam_id: Optional[UUID]
+    topic_id: Optional[UUID]
+    topic: Optional[str]
+    explanation: Optional[str]
+    recommendations: Optional[str]
+    weak_topics: Optional[List[str]]
+    extra_tasks: Optional[List[dict]]
+    retest_exam_id: Optional[UUID]
+    next_status: Optional[str]
+    next_ready: bool # материалы следующего этапа уже подготовлены
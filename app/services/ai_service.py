@@ -8,8 +8,17 @@ client = AsyncOpenAI(
     api_key="lm-studio"
 )
 
-async def generate_quiz(topic_name: str, difficulty: int = 3) -> list:
+async def generate_quiz(topic_name: str, difficulty: int = 3, open_questions: int = 0) -> list:
 
+    open_format = ""
+    if open_questions > 0:
+        open_format = f"""
+    Кроме того, добавь {open_questions} вопрос(а) с открытым ответом в формате:
+      {{
+        "question": "текст вопроса",
+        "reference_answer": "краткий эталонный ответ (1-2 предложения)"
+      }}
+    """
     
     prompt = f"""
     Сгенерируй тест из 3 вопросов по теме '{topic_name}'. Уровень сложности: {difficulty} из 5.
@@ -22,7 +31,7 @@ async def generate_quiz(topic_name: str, difficulty: int = 3) -> list:
         "correct_answer": "вариант1"
       }}
     ]
-    """
+    {open_format}"""
     
     response = await client.chat.completions.create(
         model="local-model",
@@ -65,4 +74,73 @@ async def analyze_errors(topic_name: str, questions: list, user_answers: list) -
         messages=[{"role": "user", "content": prompt}],
         temperature=0.3
     )
-    return json.loads(response.choices[0].message.content.strip())
\ No newline at end of file
+    return json.loads(response.choices[0].message.content.strip())
+
+
+async def grade_open_answer(question: str, references: list, answer: str) -> dict:
+    # Вызывается только для неуверенных случаев локальной проверки (services/open_text_grader.py)
+    prompt = f"""
+    Вопрос: {question}
+    Эталонные ответы: {json.dumps(references, ensure_ascii=False)}
+    Ответ студента: {answer}
+
+    Оцени, верен ли ответ студента по смыслу (формулировка может отличаться от эталона).
+    Ответ верни строго в формате JSON:
+    {{
+      "correct": true,
+      "score": 0.0,
+      "feedback": "короткий комментарий"
+    }}
+    """
+
+    response = await client.chat.completions.create(
+        model="local-model",
+        messages=[
+            {"role": "system", "content": "Ты ИИ-наставник. Ты отвечаешь строго в формате JSON."},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.0
+    )
+
+    raw_content = response.choices[0].message.content.strip()
+    if raw_content.startswith("```json"):
+        raw_content = raw_content[7:]
+    if raw_content.endswith("```"):
+        raw_content = raw_content[:-3]
+
+    return json.loads(raw_content.strip())
+
+
+async def generate_practice_tasks(topic_name: str, weak_topics: list, explanation: str = "") -> list:
+    # Практические задания между разбором ошибок и повторным тестом
+    prompt = f"""
+    Студент изучает тему '{topic_name}'. Слабые места: {json.dumps(weak_topics or [], ensure_ascii=False)}.
+    Разбор его ошибок: {explanation}
+
+    Составь 3 коротких практических задания, которые помогут закрепить слабые места.
+    ОБЯЗАТЕЛЬНО ВЕРНИ ТОЛЬКО ВАЛИДНЫЙ JSON-МАССИВ. Формат строго такой:
+    [
+      {{
+        "task": "условие задания",
+        "hint": "подсказка",
+        "answer": "ответ"
+      }}
+    ]
+    """
+
+    response = await client.chat.completions.create(
+        model="local-model",
+        messages=[
+            {"role": "system", "content": "Ты ИИ-наставник. Ты отвечаешь строго в формате JSON."},
+            {"role": "user", "content": prompt}
+        ],
+        temperature=0.4
+    )
+
+    raw_content = response.choices[0].message.content.strip()
+    if raw_content.startswith("```json"):
+        raw_content = raw_content[7:]
+    if raw_content.endswith("```"):
+        raw_content = raw_content[:-3]
+
+    return json.loads(raw_content.strip())
@@ -0,0 +1,94 @@
+import asyncio
+from typing import Dict, NamedTuple, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import Subject, Topic
+
+
+# Учебный план (предметы и темы) меняется редко, поэтому держим его в памяти процесса
+# в виде компактных кортежей, уже отсортированных по order_num.
+# Актуальность проверяется по версии (количество и max(updated_at) предметов и тем -
+# переименование тоже меняет версию), так что каждый воркер uvicorn сам замечает изменения без общей шины инвалидации.
+
+class TopicNode(NamedTuple):
+    id: UUID
+    subject_id: UUID
+    parent_id: Optional[UUID]
+    title: str
+    order_num: int
+
+
+class SubjectNode(NamedTuple):
+    id: UUID
+    name: str
+    topics: Tuple[TopicNode, ...]
+
+
+class CurriculumTree(NamedTuple):
+    version: tuple
+    subjects: Tuple[SubjectNode, ...]
+    subjects_by_id: Dict[UUID, SubjectNode]
+    topics_by_id: Dict[UUID, TopicNode]
+
+
+_tree: Optional[CurriculumTree] = None
+_lock = asyncio.Lock()
+
+
+def curriculum_version_subqueries():
+    # Однострочные подзапросы, которые эндпоинты могут объединять со своими версиями в один SELECT
+    subjects_version = select(func.count(Subject.id), func.max(Subject.updated_at)).subquery()
+    topics_version = select(func.count(Topic.id), func.max(Topic.updated_at)).subquery()
+    return subjects_version, topics_version
+
+
+async def get_curriculum_version(db: AsyncSession) -> tuple:
+    res = await db.execute(select(*curriculum_version_subqueries()))
+    return tuple(res.one())
+
+
+async def _load_tree(db: AsyncSession, version: tuple) -> CurriculumTree:
+    # Только нужные колонки: ORM-объекты Subject/Topic не создаются
+    subjects_res = await db.execute(select(Subject.id, Subject.name).order_by(Subject.name, Subject.id))
+    topics_res = await db.execute(
+        select(Topic.id, Topic.subject_id, Topic.parent_id, Topic.title, Topic.order_num)
+        .order_by(Topic.subject_id, Topic.order_num, Topic.id)
+    )
+
+    topics_by_subject: Dict[UUID, list] = {}
+    topics_by_id: Dict[UUID, TopicNode] = {}
+    for row in topics_res:
+        node = TopicNode(row.id, row.subject_id, row.parent_id, row.title, row.order_num or 0)
+        topics_by_subject.setdefault(row.subject_id, []).append(node)
+        topics_by_id[node.id] = node
+
+    subjects = tuple(
+        SubjectNode(row.id, row.name, tuple(topics_by_subject.get(row.id, ())))
+        for row in subjects_res
+    )
+    return CurriculumTree(
+        version=version,
+        subjects=subjects,
+        subjects_by_id={s.id: s for s in subjects},
+        topics_by_id=topics_by_id,
+    )
+
+
+async def get_curriculum(db: AsyncSession, version: Optional[tuple] = None) -> CurriculumTree:
+    global _tree
+    if version is None:
+        version = await get_curriculum_version(db)
+
+    tree = _tree
+    if tree is not None and tree.version == version:
+        return tree
+
+    async with _lock:
+        # Пока ждали блокировку, дерево мог перестроить другой запрос
+        if _tree is None or _tree.version != version:
+            _tree = await _load_tree(db, version)
+        return _tree
+
@@ -0,0 +1,105 @@
+import asyncio
+from datetime import datetime
+from typing import List, Optional
+from uuid import UUID
+
+from sqlalchemy import select, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal
+from app.models.models import AnswerType, ErrorHistory, Exam, ExamAttempt
+from app.services.grading import grade_answers
+from app.services.question_store import fetch_question_bodies
+
+
+def _error_rows(
+    student_id: UUID,
+    topic_id: UUID,
+    attempt_id: UUID,
+    errors: List[dict],
+    created_at: Optional[datetime] = None,
+) -> List[dict]:
+    rows = []
+    for e in errors:
+        row = {
+            "student_id": student_id,
+            "topic_id": topic_id,
+            "attempt_id": attempt_id,
+            "question_index": e["question_index"],
+            "question": e["question"],
+            "error_type": e["error_type"],
+        }
+        if created_at is not None:
+            row["created_at"] = created_at
+        rows.append(row)
+    return rows
+
+
+async def record_errors(
+    db: AsyncSession,
+    student_id: UUID,
+    topic_id: UUID,
+    attempt_id: UUID,
+    errors: List[dict],
+):
+    # Одна строка на ошибку, все строки попытки - одним многострочным INSERT
+    if errors:
+        await db.execute(insert(ErrorHistory), _error_rows(student_id, topic_id, attempt_id, errors))
+
+
+async def backfill_error_history(chunk_size: int = 1000):
+    # Разбираем старые попытки, которые еще не разбирались (errors_recorded = false).
+    # Отметка ставится и попыткам без ошибок, поэтому повторный запуск читает только новые
+    query = (
+        select(
+            ExamAttempt.id,
+            ExamAttempt.student_id,
+            ExamAttempt.answers,
+            ExamAttempt.submitted_at,
+            Exam.topic_id,
+            Exam.question_ids,
+            Exam.questions,
+        )
+        .join(Exam, Exam.id == ExamAttempt.exam_id)
+        .where(
+            Exam.topic_id.isnot(None),
+            ExamAttempt.answer_type == AnswerType.multiple_choice,
+            ExamAttempt.errors_recorded.is_(False),
+        )
+        .execution_options(yield_per=chunk_size)
+    )
+
+    total = 0
+    async with AsyncSessionLocal() as read_db, AsyncSessionLocal() as write_db:
+        result = await read_db.stream(query)
+        async for partition in result.partitions(chunk_size):
+            # Тексты вопросов всего чанка - одним запросом к хранилищу
+            bodies = await fetch_question_bodies(
+                write_db, (qid for attempt in partition for qid in attempt.question_ids or ())
+            )
+            rows = []
+            for attempt in partition:
+                if attempt.question_ids is not None:
+                    questions = [bodies.get(qid, {}) for qid in attempt.question_ids]
+                else:
+                    questions = attempt.questions or []
+                _, errors = grade_answers(questions, attempt.answers or [])
+                rows.extend(_error_rows(
+                    attempt.student_id, attempt.topic_id, attempt.id, errors, attempt.submitted_at
+                ))
+            if rows:
+                await write_db.execute(insert(ErrorHistory), rows)
+                total += len(rows)
+            # Ошибки и отметка о разборе - в одной транзакции
+            await write_db.execute(
+                update(ExamAttempt)
+                .where(ExamAttempt.id.in_([attempt.id for attempt in partition]))
+                .values(errors_recorded=True)
+            )
+            await write_db.commit()
+    return total
+
+
+if __name__ == "__main__":
+    inserted = asyncio.run(backfill_error_history())
+    print(f"✅ Записано ошибок: {inserted}")
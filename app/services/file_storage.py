@@ -0,0 +1,227 @@
+import asyncio
+import os
+import tempfile
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+from app.config import settings
+
+try:
+    from aiobotocore.session import get_session as get_aws_session
+except ImportError:  # без aiobotocore доступен только локальный диск
+    get_aws_session = None
+
+
+# Файлы хранятся по sha256 содержимого: одинаковые загрузки занимают место один раз.
+# Бэкенд выбирается настройкой UPLOAD_BACKEND (local / s3) и регистрируется в _BACKENDS.
+# Наружу файлы напрямую не раздаются: только через эндпоинт с проверкой доступа
+# (GET /exams/attempts/{attempt_id}/file), поэтому ключ хранилища не является секретом
+READ_CHUNK_BYTES = 64 * 1024
+
+
+@dataclass
+class StoredFile:
+    key: str
+    size: int
+    sha256: str
+    content_type: Optional[str]
+
+
+def content_key(sha256: str, extension: str) -> str:
+    return f"{sha256[:2]}/{sha256}{extension}"
+
+
+class FileStorage(ABC):
+    @abstractmethod
+    async def begin(self):
+        """Открывает временный объект для записи, возвращает дескриптор."""
+
+    @abstractmethod
+    async def write(self, handle, chunk: bytes):
+        ...
+
+    @abstractmethod
+    async def commit(self, handle, sha256: str, extension: str) -> str:
+        """Переносит временный объект под ключ по содержимому, возвращает ключ."""
+
+    @abstractmethod
+    async def abort(self, handle):
+        ...
+
+    @abstractmethod
+    async def save(self, key: str, data: bytes):
+        """Небольшие производные файлы (миниатюры) - целиком."""
+
+    @abstractmethod
+    def read(self, key: str) -> AsyncIterator[bytes]:
+        """Содержимое файла по чанкам; FileNotFoundError, если его нет."""
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Путь для фоновой обработки; None, если файл не лежит на локальном диске."""
+        return None
+
+
+class LocalDiskStorage(FileStorage):
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, key))
+        if not path.startswith(os.path.normpath(self.root) + os.sep):
+            raise FileNotFoundError(key)
+        return path
+
+    async def begin(self):
+        os.makedirs(self.root, exist_ok=True)
+        fd, path = tempfile.mkstemp(dir=self.root, prefix=".upload-")
+        return os.fdopen(fd, "wb"), path
+
+    async def write(self, handle, chunk: bytes):
+        f, _ = handle
+        # Запись на диск не блокирует цикл событий
+        await asyncio.to_thread(f.write, chunk)
+
+    async def commit(self, handle, sha256: str, extension: str) -> str:
+        f, tmp_path = handle
+        await asyncio.to_thread(f.close)
+        key = content_key(sha256, extension)
+        target = self._path(key)
+        if os.path.exists(target):
+            # Такой файл уже загружен - дубликат не сохраняем
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(tmp_path, target)
+        return key
+
+    async def abort(self, handle):
+        f, tmp_path = handle
+        f.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    async def save(self, key: str, data: bytes):
+        path = self._path(key)
+
+        def _write():
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(data)
+
+        await asyncio.to_thread(_write)
+
+    async def read(self, key: str) -> AsyncIterator[bytes]:
+        f = await asyncio.to_thread(open, self._path(key), "rb")
+        try:
+            while chunk := await asyncio.to_thread(f.read, READ_CHUNK_BYTES):
+                yield chunk
+        finally:
+            f.close()
+
+    def local_path(self, key: str) -> Optional[str]:
+        return self._path(key)
+
+
+class S3Storage(FileStorage):
+    """S3-совместимое хранилище (AWS S3, MinIO): загрузка multipart по мере чтения запроса.
+
+    Учетные данные - стандартные переменные AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY.
+    """
+
+    # Минимальный размер части multipart-загрузки в S3 (кроме последней)
+    PART_BYTES = 5 * 1024 * 1024
+
+    def __init__(self, bucket: str, endpoint_url: Optional[str], region: Optional[str]):
+        if get_aws_session is None:
+            raise RuntimeError("Для UPLOAD_BACKEND=s3 нужен пакет aiobotocore")
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url or None
+        self.region = region or None
+
+    def _client(self):
+        return get_aws_session().create_client(
+            "s3", endpoint_url=self.endpoint_url, region_name=self.region
+        )
+
+    async def begin(self):
+        tmp_key = f"tmp/{uuid.uuid4().hex}"
+        async with self._client() as s3:
+            res = await s3.create_multipart_upload(Bucket=self.bucket, Key=tmp_key)
+        return {"key": tmp_key, "upload_id": res["UploadId"], "parts": [], "buffer": bytearray()}
+
+    async def _flush(self, handle):
+        part_number = len(handle["parts"]) + 1
+        async with self._client() as s3:
+            res = await s3.upload_part(
+                Bucket=self.bucket,
+                Key=handle["key"],
+                UploadId=handle["upload_id"],
+                PartNumber=part_number,
+                Body=bytes(handle["buffer"]),
+            )
+        handle["parts"].append({"PartNumber": part_number, "ETag": res["ETag"]})
+        handle["buffer"].clear()
+
+    async def write(self, handle, chunk: bytes):
+        # В памяти - не больше одной части
+        handle["buffer"] += chunk
+        if len(handle["buffer"]) >= self.PART_BYTES:
+            await self._flush(handle)
+
+    async def commit(self, handle, sha256: str, extension: str) -> str:
+        if handle["buffer"] or not handle["parts"]:
+            await self._flush(handle)
+        key = content_key(sha256, extension)
+        async with self._client() as s3:
+            await s3.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=handle["key"],
+                UploadId=handle["upload_id"],
+                MultipartUpload={"Parts": handle["parts"]},
+            )
+            try:
+                await s3.head_object(Bucket=self.bucket, Key=key)
+            except s3.exceptions.ClientError:
+                # Копирование внутри хранилища, через воркер данные не проходят
+                await s3.copy_object(
+                    Bucket=self.bucket, Key=key, CopySource={"Bucket": self.bucket, "Key": handle["key"]}
+                )
+            await s3.delete_object(Bucket=self.bucket, Key=handle["key"])
+        return key
+
+    async def abort(self, handle):
+        async with self._client() as s3:
+            await s3.abort_multipart_upload(Bucket=self.bucket, Key=handle["key"], UploadId=handle["upload_id"])
+
+    async def save(self, key: str, data: bytes):
+        async with self._client() as s3:
+            await s3.put_object(Bucket=self.bucket, Key=key, Body=data)
+
+    async def read(self, key: str) -> AsyncIterator[bytes]:
+        async with self._client() as s3:
+            try:
+                res = await s3.get_object(Bucket=self.bucket, Key=key)
+            except s3.exceptions.NoSuchKey:
+                raise FileNotFoundError(key)
+            async with res["Body"] as body:
+                while chunk := await body.read(READ_CHUNK_BYTES):
+                    yield chunk
+
+
+_BACKENDS = {
+    "local": lambda: LocalDiskStorage(settings.UPLOAD_DIR),
+    "s3": lambda: S3Storage(settings.S3_BUCKET, settings.S3_ENDPOINT_URL, settings.S3_REGION),
+}
+_storage: Optional[FileStorage] = None
+
+
+def get_storage() -> FileStorage:
+    global _storage
+    if _storage is None:
+        backend = _BACKENDS.get(settings.UPLOAD_BACKEND)
+        if backend is None:
+            raise RuntimeError(f"Неизвестный UPLOAD_BACKEND: {settings.UPLOAD_BACKEND}")
+        _storage = backend()
+    return _storage
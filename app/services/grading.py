@@ -0,0 +1,96 @@
+from typing import Dict, List, Optional, Tuple
+
+
+# Ключ ответов экзамена - индексы верных вариантов (ARRAY(SmallInteger) в exams.answer_key).
+# -1: верный вариант не найден среди options (такой вопрос не засчитывается никому)
+# -2: вопрос с открытым ответом, проверяется по эталону (services/open_text_grader.py)
+UNKNOWN_OPTION = -1
+OPEN_TEXT = -2
+
+
+def is_open_question(question: dict) -> bool:
+    return not question.get("options") and bool(reference_answers(question))
+
+
+def reference_answers(question: dict) -> List[str]:
+    refs = question.get("reference_answers") or []
+    if question.get("reference_answer"):
+        refs = [question["reference_answer"], *refs]
+    return [r for r in refs if isinstance(r, str) and r.strip()]
+
+
+def build_answer_key(questions: list) -> List[int]:
+    key = []
+    for q in questions:
+        if is_open_question(q):
+            key.append(OPEN_TEXT)
+            continue
+        options = q.get("options") or []
+        correct = q.get("correct_answer")
+        key.append(options.index(correct) if correct in options else UNKNOWN_OPTION)
+    return key
+
+
+def resolve_selected(answers, questions: Optional[list] = None) -> Dict[int, Optional[int]]:
+    # answers: AnswerSubmission или dict из ExamAttempt.answers.
+    # Ответ текстом (selected_option) переводится в индекс варианта только если переданы questions.
+    # При повторе индекса вопроса учитывается первый ответ
+    selected = {}
+    for a in reversed(answers):
+        if isinstance(a, dict):
+            question_index, option_index, option = a.get("question_index"), a.get("selected_index"), a.get("selected_option")
+        else:
+            question_index, option_index, option = a.question_index, a.selected_index, a.selected_option
+
+        if option_index is None and option is not None and questions is not None:
+            options = []
+            if isinstance(question_index, int) and 0 <= question_index < len(questions):
+                options = questions[question_index].get("options") or []
+            option_index = options.index(option) if option in options else UNKNOWN_OPTION
+        selected[question_index] = option_index
+    return selected
+
+
+def grade_with_key(
+    answer_key: List[int],
+    selected: Dict[int, Optional[int]],
+    open_results: Optional[Dict[int, bool]] = None,
+) -> Tuple[int, List[dict]]:
+    # O(Q + A): ответы уже разложены по индексу вопроса.
+    # Возвращает число верных ответов и список ошибок (по одной на неверный или пропущенный вопрос);
+    # текст вопроса в ошибках заполняется позже, если вопросы загружались.
+    # open_results: {индекс вопроса: верно ли} для открытых вопросов; без него они пропускаются
+    correct_count = 0
+    errors = []
+    for i, correct in enumerate(answer_key):
+        if correct == OPEN_TEXT:
+            if open_results is None:
+                continue
+            answer = open_results.get(i)
+            if answer:
+                correct_count += 1
+                continue
+            errors.append({
+                "question_index": i,
+                "question": None,
+                "error_type": "no_answer" if answer is None else "wrong_answer",
+            })
+            continue
+        answer = selected.get(i)
+        if correct >= 0 and answer == correct:
+            correct_count += 1
+            continue
+        errors.append({
+            "question_index": i,
+            "question": None,
+            "error_type": "no_answer" if answer is None else "wrong_answer",
+        })
+    return correct_count, errors
+
+
+def grade_answers(questions: list, answers) -> Tuple[int, List[dict]]:
+    # Проверка по полному JSON вопросов (бэкфилл старых попыток)
+    correct_count, errors = grade_with_key(build_answer_key(questions), resolve_selected(answers, questions))
+    for e in errors:
+        e["question"] = questions[e["question_index"]].get("question")
+    return correct_count, errors
@@ -0,0 +1,163 @@
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Optional
+from uuid import UUID
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import select, delete, update, and_, or_
+from sqlalchemy.dialects.postgresql import insert
+
+from app.database import AsyncSessionLocal
+from app.models.models import IdempotencyKey
+
+
+# Повтор запроса с тем же заголовком Idempotency-Key возвращает сохраненный ответ,
+# а параллельный дубликат ждет, пока первый запрос завершится.
+# Ключи живут в Postgres (общие для всех воркеров) и истекают через IDEMPOTENCY_TTL.
+# Выполняющий запрос держит ключ не дольше CLAIM_LEASE: если воркер упал, не успев
+# ни сохранить ответ, ни освободить ключ, повтор после истечения аренды перехватывает его.
+IDEMPOTENCY_TTL = timedelta(hours=24)
+CLAIM_LEASE = timedelta(minutes=5)
+WAIT_TIMEOUT_SECONDS = 120.0
+POLL_INTERVAL_SECONDS = 0.25
+
+
+def _request_hash(scope: str, payload: Any) -> str:
+    raw = json.dumps([scope, jsonable_encoder(payload)], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+async def _claim(user_id: UUID, key: str, scope: str, request_hash: str) -> Optional[datetime]:
+    """Занимает ключ; возвращает срок аренды (он же отличает эту попытку от перехвата) или None."""
+    # Отдельная сессия с немедленным коммитом, чтобы ключ сразу увидели другие воркеры
+    async with AsyncSessionLocal() as db:
+        now = datetime.now()
+        await db.execute(
+            delete(IdempotencyKey).where(
+                IdempotencyKey.user_id == user_id,
+                IdempotencyKey.expires_at < now,
+            )
+        )
+        lease = now + CLAIM_LEASE
+        stmt = insert(IdempotencyKey).values(
+            user_id=user_id,
+            key=key,
+            scope=scope,
+            request_hash=request_hash,
+            locked_until=lease,
+            expires_at=now + IDEMPOTENCY_TTL,
+        )
+        # Существующий ключ перехватывается, только если ответа нет, аренда истекла и запрос тот же
+        table = IdempotencyKey.__table__
+        res = await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[IdempotencyKey.user_id, IdempotencyKey.key],
+                set_={"locked_until": lease},
+                where=and_(
+                    table.c.status_code.is_(None),
+                    or_(table.c.locked_until.is_(None), table.c.locked_until < now),
+                    table.c.request_hash == request_hash,
+                ),
+            )
+            .returning(IdempotencyKey.key)
+        )
+        claimed = res.first() is not None
+        await db.commit()
+        return lease if claimed else None
+
+
+async def _complete(user_id: UUID, key: str, status_code: int, body: Any):
+    # Сохраняется первый готовый ответ, даже если ключ успели перехватить
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(IdempotencyKey)
+            .where(
+                IdempotencyKey.user_id == user_id,
+                IdempotencyKey.key == key,
+                IdempotencyKey.status_code.is_(None),
+            )
+            .values(status_code=status_code, response_body=body, locked_until=None)
+        )
+        await db.commit()
+
+
+async def _release(user_id: UUID, key: str, lease: datetime):
+    # Запрос упал - освобождаем ключ, чтобы клиент мог повторить (если его не перехватил другой воркер)
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            delete(IdempotencyKey).where(
+                IdempotencyKey.user_id == user_id,
+                IdempotencyKey.key == key,
+                IdempotencyKey.locked_until == lease,
+            )
+        )
+        await db.commit()
+
+
+async def run_idempotent(
+    key: Optional[str],
+    user_id: UUID,
+    scope: str,
+    payload: Any,
+    handler: Callable[[], Awaitable[Any]],
+    status_code: int = 200,
+):
+    if not key:
+        return await handler()
+
+    request_hash = _request_hash(scope, payload)
+    deadline = asyncio.get_running_loop().time() + WAIT_TIMEOUT_SECONDS
+
+    while (lease := await _claim(user_id, key, scope, request_hash)) is None:
+        async with AsyncSessionLocal() as db:
+            res = await db.execute(
+                select(IdempotencyKey).where(
+                    IdempotencyKey.user_id == user_id,
+                    IdempotencyKey.key == key,
+                )
+            )
+            record = res.scalars().first()
+
+        if record is None:
+            # Первый запрос завершился ошибкой и освободил ключ - пробуем занять его снова
+            continue
+        if record.request_hash != request_hash:
+            raise HTTPException(
+                status_code=422,
+                detail="Ключ идемпотентности уже использован для другого запроса"
+            )
+        if record.status_code is not None:
+            return JSONResponse(
+                content=record.response_body,
+                status_code=record.status_code,
+                headers={"Idempotent-Replayed": "true"},
+            )
+        if asyncio.get_running_loop().time() > deadline:
+            raise HTTPException(status_code=409, detail="Запрос с этим ключом еще выполняется")
+        await asyncio.sleep(POLL_INTERVAL_SECONDS)
+
+    try:
+        result = await handler()
+    except BaseException:
+        await _release(user_id, key, lease)
+        raise
+
+    body = jsonable_encoder(result)
+    await _complete(user_id, key, status_code, body)
+    return body
+
+
+async def purge_expired():
+    async with AsyncSessionLocal() as db:
+        res = await db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < datetime.now()))
+        await db.commit()
+        return res.rowcount
+
+
+if __name__ == "__main__":
+    removed = asyncio.run(purge_expired())
+    print(f"✅ Удалено устаревших ключей: {removed}")
@@ -0,0 +1,227 @@
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import select, update, bindparam
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal
+from app.models.models import AnswerType, Exam, ExamAttempt, Question
+from app.services.grading import resolve_selected
+from app.services.question_store import fetch_question_bodies
+
+
+# Статистика вопросов по всей истории попыток (классическая теория тестов + модель Раша):
+#   p_value        - доля верных ответов
+#   discrimination - точечно-бисериальная корреляция ответа на вопрос с долей верных
+#                    ответов на остальные вопросы попытки
+#   irt_difficulty - трудность в логитах, приближение PROX для неполного плана
+#                    (каждый студент отвечает только на вопросы своего теста):
+#                    b_i = mu_i + sqrt(1 + sigma_i^2 / 2.89) * ln((n_i - s_i) / s_i),
+#                    mu_i, sigma_i^2 - среднее и дисперсия способностей ответивших на вопрос.
+# Попытки читаются серверным курсором, в памяти - один чанк и счетчики по вопросам.
+# Каждый проход уточняет способности студентов по трудностям предыдущего прохода
+PROX_PASSES = 2
+PROX_SCALE = 2.89 # 1.7^2
+MIN_RESPONSES = 20 # меньше ответов - трудность не калибруется
+
+# Логиты трудности -> шкала 1..5 (как Exam.difficulty)
+DIFFICULTY_BINS = np.array([-1.5, -0.5, 0.5, 1.5])
+
+
+class _ItemAccumulator:
+    """Счетчики по вопросам; массивы растут по мере появления новых question_id."""
+
+    FIELDS = ("n", "s", "theta_sum", "theta_sq", "rest_n", "rest_x", "rest_sum", "rest_sq", "x_rest")
+
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+        for name in self.FIELDS:
+            setattr(self, name, np.zeros(0))
+
+    def ids(self, question_ids: List[str]) -> np.ndarray:
+        for qid in question_ids:
+            self.index.setdefault(qid, len(self.index))
+        size = len(self.index)
+        if size > len(self.n):
+            grow = max(size, 2 * len(self.n))
+            for name in self.FIELDS:
+                arr = getattr(self, name)
+                setattr(self, name, np.concatenate([arr, np.zeros(grow - len(arr))]))
+        return np.fromiter((self.index[q] for q in question_ids), dtype=np.int64, count=len(question_ids))
+
+    def add(self, items: np.ndarray, x: np.ndarray, theta: np.ndarray, rest: np.ndarray, has_rest: np.ndarray):
+        size = len(self.n)
+
+        def acc(weights):
+            return np.bincount(items, weights=weights, minlength=size)
+
+        self.n += acc(np.ones_like(x))
+        self.s += acc(x)
+        self.theta_sum += acc(theta)
+        self.theta_sq += acc(theta ** 2)
+        # Для корреляции учитываются только попытки, где есть остальные вопросы
+        r = rest * has_rest
+        self.rest_n += acc(has_rest.astype(np.float64))
+        self.rest_x += acc(x * has_rest)
+        self.rest_sum += acc(r)
+        self.rest_sq += acc(r ** 2)
+        self.x_rest += acc(x * r)
+
+
+def _responses(rows, bodies: Dict[str, dict]):
+    """Плоские массивы по чанку: (question_id, верно, номер попытки)."""
+    question_ids, correct, attempt_idx = [], [], []
+    for i, row in enumerate(rows):
+        questions = None
+        if any(isinstance(a, dict) and a.get("selected_index") is None for a in row.answers or ()):
+            questions = [bodies.get(qid, {}) for qid in row.question_ids]
+        selected = resolve_selected(row.answers or [], questions)
+        for q, (qid, key) in enumerate(zip(row.question_ids, row.answer_key)):
+            if key < 0:
+                # Вопрос без верного варианта или открытый - по сохраненным ответам не оценить
+                continue
+            question_ids.append(qid)
+            correct.append(1.0 if selected.get(q) == key else 0.0)
+            attempt_idx.append(i)
+    return question_ids, np.asarray(correct), np.asarray(attempt_idx, dtype=np.int64)
+
+
+def _person_theta(raw: np.ndarray, k: np.ndarray, item_mean: np.ndarray, item_var: np.ndarray) -> np.ndarray:
+    # PROX для студента: сдвиг на среднюю трудность его вопросов, поправка на их разброс;
+    # +0.5 убирает бесконечности при 0 и 100% верных
+    logit = np.log((raw + 0.5) / (k - raw + 0.5))
+    return item_mean + np.sqrt(1.0 + item_var / PROX_SCALE) * logit
+
+
+async def _accumulate(
+    read_db: AsyncSession,
+    write_db: AsyncSession,
+    chunk_size: int,
+    difficulty: Optional[np.ndarray],
+    index: Optional[Dict[str, int]],
+) -> _ItemAccumulator:
+    query = (
+        select(ExamAttempt.answers, Exam.question_ids, Exam.answer_key)
+        .join(Exam, Exam.id == ExamAttempt.exam_id)
+        .where(
+            ExamAttempt.answer_type == AnswerType.multiple_choice,
+            Exam.question_ids.isnot(None),
+            Exam.answer_key.isnot(None),
+        )
+        .execution_options(yield_per=chunk_size)
+    )
+    acc = _ItemAccumulator()
+    if index is not None:
+        # Тот же порядок вопросов, что и в предыдущем проходе
+        acc.ids(list(index))
+
+    result = await read_db.stream(query)
+    async for partition in result.partitions(chunk_size):
+        need_text = {
+            qid
+            for row in partition
+            if any(isinstance(a, dict) and a.get("selected_index") is None for a in row.answers or ())
+            for qid in row.question_ids
+        }
+        bodies = await fetch_question_bodies(write_db, need_text)
+        question_ids, x, attempt_idx = _responses(partition, bodies)
+        if not question_ids:
+            continue
+
+        items = acc.ids(question_ids)
+        n_attempts = len(partition)
+        k = np.bincount(attempt_idx, minlength=n_attempts).astype(np.float64)
+        raw = np.bincount(attempt_idx, weights=x, minlength=n_attempts)
+
+        if difficulty is not None:
+            # Вопросы, появившиеся после предыдущего прохода, считаются средней трудности
+            b = np.where(items < len(difficulty), difficulty[np.minimum(items, len(difficulty) - 1)], 0.0)
+            item_mean = np.bincount(attempt_idx, weights=b, minlength=n_attempts) / np.maximum(k, 1)
+            item_sq = np.bincount(attempt_idx, weights=b ** 2, minlength=n_attempts) / np.maximum(k, 1)
+            item_var = np.maximum(item_sq - item_mean ** 2, 0.0)
+        else:
+            item_mean = item_var = np.zeros(n_attempts)
+        theta = _person_theta(raw, k, item_mean, item_var)[attempt_idx]
+
+        # Доля верных ответов на остальные вопросы попытки (без текущего)
+        others = k[attempt_idx] - 1
+        has_rest = others > 0
+        rest = np.where(has_rest, (raw[attempt_idx] - x) / np.maximum(others, 1), 0.0)
+
+        acc.add(items, x, theta, rest, has_rest)
+    return acc
+
+
+def _item_statistics(acc: _ItemAccumulator):
+    size = len(acc.index)
+    n, s = acc.n[:size], acc.s[:size]
+    safe_n = np.maximum(n, 1)
+    p_value = s / safe_n
+
+    rn = np.maximum(acc.rest_n[:size], 1)
+    p_rest = acc.rest_x[:size] / rn
+    cov = acc.x_rest[:size] / rn - p_rest * (acc.rest_sum[:size] / rn)
+    var_rest = acc.rest_sq[:size] / rn - (acc.rest_sum[:size] / rn) ** 2
+    var_x = p_rest * (1 - p_rest)
+    denom = np.sqrt(var_x * var_rest)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        discrimination = np.where(denom > 1e-12, cov / denom, np.nan)
+
+    mu = acc.theta_sum[:size] / safe_n
+    sigma2 = np.maximum(acc.theta_sq[:size] / safe_n - mu ** 2, 0.0)
+    difficulty = mu + np.sqrt(1.0 + sigma2 / PROX_SCALE) * np.log((n - s + 0.5) / (s + 0.5))
+    return n, p_value, discrimination, difficulty
+
+
+async def calibrate_items(chunk_size: int = 20_000) -> int:
+    difficulty, index, acc = None, None, None
+    async with AsyncSessionLocal() as read_db, AsyncSessionLocal() as write_db:
+        for _ in range(PROX_PASSES):
+            acc = await _accumulate(read_db, write_db, chunk_size, difficulty, index)
+            index = acc.index
+            if not index:
+                return 0
+            n, p_value, discrimination, difficulty = _item_statistics(acc)
+            # Шкала Раша определена с точностью до сдвига: средняя трудность ответов = 0
+            if n.sum() > 0:
+                difficulty = difficulty - np.average(difficulty, weights=n)
+
+        levels = np.searchsorted(DIFFICULTY_BINS, difficulty) + 1
+        calibrated = n >= MIN_RESPONSES
+        now = datetime.now()
+        rows = [
+            {
+                "qid": qid,
+                "responses_count": int(n[i]),
+                "p_value": float(p_value[i]),
+                "discrimination": None if np.isnan(discrimination[i]) else float(discrimination[i]),
+                "irt_difficulty": float(difficulty[i]) if calibrated[i] else None,
+                "calibrated_difficulty": int(levels[i]) if calibrated[i] else None,
+                "calibrated_at": now,
+            }
+            for qid, i in index.items()
+        ]
+        table = Question.__table__
+        stmt = (
+            update(table)
+            .where(table.c.id == bindparam("qid"))
+            .values(
+                responses_count=bindparam("responses_count"),
+                p_value=bindparam("p_value"),
+                discrimination=bindparam("discrimination"),
+                irt_difficulty=bindparam("irt_difficulty"),
+                calibrated_difficulty=bindparam("calibrated_difficulty"),
+                calibrated_at=bindparam("calibrated_at"),
+            )
+        )
+        for start in range(0, len(rows), chunk_size):
+            await write_db.execute(stmt, rows[start:start + chunk_size])
+        await write_db.commit()
+        return len(rows)
+
+
+if __name__ == "__main__":
+    count = asyncio.run(calibrate_items())
+    print(f"✅ Откалибровано вопросов: {count}")
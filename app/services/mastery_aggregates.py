@@ -0,0 +1,88 @@
+import asyncio
+from uuid import UUID
+from typing import Optional
+
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal
+from app.models.models import StudentSubjectMastery, StudentTopicMastery, Topic
+
+
+async def apply_topic_mastery_change(
+    db: AsyncSession,
+    student_id: UUID,
+    subject_id: UUID,
+    old_level: Optional[float],
+    old_attempts: Optional[int],
+    new_level: float,
+    new_attempts: int,
+):
+    # Инкрементальное обновление агрегата по предмету: добавляем только разницу по одной теме
+    old_level = old_level or 0.0
+    old_attempts = old_attempts or 0
+    table = StudentSubjectMastery.__table__
+
+    stmt = insert(table).values(
+        student_id=student_id,
+        subject_id=subject_id,
+        mastery_sum=new_level,
+        tested_topics=1,
+        weighted_sum=new_level * new_attempts,
+        attempts_total=new_attempts,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.student_id, table.c.subject_id],
+        set_={
+            "mastery_sum": table.c.mastery_sum + (new_level - old_level),
+            "tested_topics": table.c.tested_topics + (1 if old_attempts == 0 else 0),
+            "weighted_sum": table.c.weighted_sum + (new_level * new_attempts - old_level * old_attempts),
+            "attempts_total": table.c.attempts_total + (new_attempts - old_attempts),
+            "updated_at": func.now(),
+        },
+    )
+    await db.execute(stmt)
+
+
+async def rebuild_subject_mastery(db: AsyncSession, student_id: Optional[UUID] = None):
+    # Полный пересчет агрегатов из student_topic_mastery (бэкфилл / исправление рассинхрона)
+    level = func.coalesce(StudentTopicMastery.mastery_level, 0.0)
+    attempts = func.coalesce(StudentTopicMastery.attempts_count, 0)
+
+    source = (
+        select(
+            StudentTopicMastery.student_id,
+            Topic.subject_id,
+            func.sum(level),
+            func.count(),
+            func.sum(level * attempts),
+            func.sum(attempts),
+        )
+        .join(Topic, Topic.id == StudentTopicMastery.topic_id)
+        .where(StudentTopicMastery.attempts_count > 0)
+        .group_by(StudentTopicMastery.student_id, Topic.subject_id)
+    )
+    cleanup = delete(StudentSubjectMastery)
+    if student_id is not None:
+        source = source.where(StudentTopicMastery.student_id == student_id)
+        cleanup = cleanup.where(StudentSubjectMastery.student_id == student_id)
+
+    await db.execute(cleanup)
+    await db.execute(
+        insert(StudentSubjectMastery).from_select(
+            ["student_id", "subject_id", "mastery_sum", "tested_topics", "weighted_sum", "attempts_total"],
+            source,
+        )
+    )
+
+
+async def main():
+    async with AsyncSessionLocal() as db:
+        await rebuild_subject_mastery(db)
+        await db.commit()
+    print("✅ Агрегаты student_subject_mastery пересчитаны")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,181 @@
+import asyncio
+from typing import Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal
+from app.models.models import Exam, ExamAttempt, StudentTopicMastery
+from app.services.mastery_aggregates import rebuild_subject_mastery
+from app.services.review_scheduler import reschedule_reviews
+
+
+# Байесовское отслеживание знаний (BKT).
+# Попытка с k верными ответами из n обновляет вероятность освоения темы одним шагом:
+#   P(k | знает)    ~ (1 - slip)^k * slip^(n - k)
+#   P(k | не знает) ~ guess^k * (1 - guess)^(n - k)
+# после чего применяется переход "научился" с вероятностью P_TRANSIT.
+# Порядок вопросов внутри попытки не важен, поэтому онлайн-обновление в submit_exam
+# и пакетный пересчет дают одинаковый результат.
+P_INIT = 0.2
+P_TRANSIT = 0.1
+P_SLIP = 0.1
+P_GUESS = 0.25 # 4 варианта ответа
+
+# Уверенность = n / (n + CONFIDENCE_PRIOR), где n - число отвеченных вопросов по теме
+CONFIDENCE_PRIOR = 10.0
+
+_LOG_KNOWN = (np.log(1 - P_SLIP), np.log(P_SLIP))
+_LOG_UNKNOWN = (np.log(P_GUESS), np.log(1 - P_GUESS))
+
+
+def bkt_update(prior, correct, total):
+    prior = np.asarray(prior, dtype=np.float64)
+    correct = np.asarray(correct, dtype=np.float64)
+    wrong = np.asarray(total, dtype=np.float64) - correct
+
+    log_ratio = (
+        correct * (_LOG_UNKNOWN[0] - _LOG_KNOWN[0])
+        + wrong * (_LOG_UNKNOWN[1] - _LOG_KNOWN[1])
+    )
+    with np.errstate(over="ignore"):
+        posterior = prior / (prior + (1 - prior) * np.exp(log_ratio))
+    return posterior + (1 - posterior) * P_TRANSIT
+
+
+def confidence_update(confidence, total):
+    confidence = np.minimum(np.asarray(confidence, dtype=np.float64), 0.999999)
+    observed = CONFIDENCE_PRIOR * confidence / (1 - confidence) + np.asarray(total, dtype=np.float64)
+    return observed / (observed + CONFIDENCE_PRIOR)
+
+
+def estimate_mastery(
+    mastery_level: Optional[float],
+    confidence: Optional[float],
+    attempts_count: Optional[int],
+    correct: int,
+    total: int,
+) -> Tuple[float, float]:
+    # Онлайн-обновление после одной попытки; mastery_level хранится в процентах, как и score
+    prior = (mastery_level or 0.0) / 100 if attempts_count else P_INIT
+    level = bkt_update(prior, correct, total)
+    return float(level) * 100, float(confidence_update(confidence or 0.0, total))
+
+
+def _estimate_segments(segment, correct, total, n_segments):
+    # Последовательности попыток по (студент, тема) обрабатываются шагами по номеру попытки:
+    # на каждом шаге одно векторное обновление сразу для всех последовательностей
+    rank = np.arange(len(segment)) - np.searchsorted(segment, segment)
+    order = np.argsort(rank, kind="stable")
+    steps = np.bincount(rank)
+
+    level = np.full(n_segments, P_INIT)
+    observed = np.zeros(n_segments)
+    offset = 0
+    for count in steps:
+        idx = order[offset:offset + count]
+        offset += count
+        seg = segment[idx]
+        level[seg] = bkt_update(level[seg], correct[idx], total[idx])
+        observed[seg] += total[idx]
+
+    confidence = observed / (observed + CONFIDENCE_PRIOR)
+    attempts = np.bincount(segment, minlength=n_segments)
+    return level * 100, confidence, attempts
+
+
+async def _write_estimates(db: AsyncSession, rows):
+    keys, last_tested, segment = [], [], []
+    for row in rows:
+        key = (row.student_id, row.topic_id)
+        if not keys or keys[-1] != key:
+            keys.append(key)
+            last_tested.append(row.submitted_at)
+        last_tested[-1] = row.submitted_at
+        segment.append(len(keys) - 1)
+
+    total = np.fromiter((row.questions_count for row in rows), dtype=np.float64, count=len(rows))
+    score = np.fromiter((row.score for row in rows), dtype=np.float64, count=len(rows))
+    correct = np.rint(score / 100 * total)
+
+    level, confidence, attempts = _estimate_segments(
+        np.asarray(segment, dtype=np.int64), correct, total, len(keys)
+    )
+
+    stmt = insert(StudentTopicMastery.__table__)
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_student_topic",
+        set_={
+            "mastery_level": stmt.excluded.mastery_level,
+            "confidence": stmt.excluded.confidence,
+            "attempts_count": stmt.excluded.attempts_count,
+            "last_tested_at": stmt.excluded.last_tested_at,
+            "updated_at": func.now(),
+        },
+    )
+    await db.execute(
+        stmt,
+        [
+            {
+                "student_id": student_id,
+                "topic_id": topic_id,
+                "mastery_level": float(level[i]),
+                "confidence": float(confidence[i]),
+                "attempts_count": int(attempts[i]),
+                "last_tested_at": last_tested[i],
+            }
+            for i, (student_id, topic_id) in enumerate(keys)
+        ],
+    )
+
+
+async def recompute_all(chunk_size: int = 50_000):
+    # Пакетный пересчет по всей истории попыток. Строки читаются серверным курсором
+    # в порядке (студент, тема, время), так что в памяти держится не больше одного чанка
+    query = (
+        select(
+            ExamAttempt.student_id,
+            Exam.topic_id,
+            ExamAttempt.score,
+            ExamAttempt.submitted_at,
+            func.cardinality(Exam.answer_key).label("questions_count"),
+        )
+        .join(Exam, Exam.id == ExamAttempt.exam_id)
+        .where(
+            Exam.topic_id.isnot(None),
+            Exam.answer_key.isnot(None),
+            ExamAttempt.score.isnot(None),
+        )
+        .order_by(ExamAttempt.student_id, Exam.topic_id, ExamAttempt.submitted_at)
+        .execution_options(yield_per=chunk_size)
+    )
+
+    async with AsyncSessionLocal() as read_db, AsyncSessionLocal() as write_db:
+        result = await read_db.stream(query)
+        carry = []
+        async for partition in result.partitions(chunk_size):
+            rows = carry + list(partition)
+
+            # Хвост последней пары (студент, тема) может продолжиться в следующем чанке
+            last_key = (rows[-1].student_id, rows[-1].topic_id)
+            split = len(rows)
+            while split > 0 and (rows[split - 1].student_id, rows[split - 1].topic_id) == last_key:
+                split -= 1
+            carry = rows[split:]
+            if split:
+                await _write_estimates(write_db, rows[:split])
+                await write_db.commit()
+
+        if carry:
+            await _write_estimates(write_db, carry)
+
+        await rebuild_subject_mastery(write_db)
+        await reschedule_reviews(write_db)
+        await write_db.commit()
+
+
+if __name__ == "__main__":
+    asyncio.run(recompute_all())
+    print("✅ Уровни освоения тем пересчитаны")
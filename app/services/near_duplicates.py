@@ -0,0 +1,186 @@
+import asyncio
+import hashlib
+import re
+import zlib
+from typing import List, Optional
+from uuid import UUID
+
+import numpy as np
+from sqlalchemy import select, tuple_, or_, exists
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal
+from app.models.models import (
+    AnswerLshBand, AnswerSignature, AnswerSimilarityFlag, AnswerType, ExamAttempt
+)
+
+
+# Поиск списанных ответов: MinHash по словесным шинглам + LSH.
+# Сигнатура делится на BANDS полос по ROWS значений; ответы с совпавшей полосой - кандидаты.
+# Поиск кандидатов - индексные выборки по (band, bucket), без сравнения со всеми прошлыми ответами
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+MIN_WORDS = 8 # короткие ответы совпадают и без списывания
+SIMILARITY_THRESHOLD = 0.7
+
+_MERSENNE = (1 << 31) - 1
+_rng = np.random.default_rng(20261019)
+# a < 2^31 и хеш шингла < 2^32: произведение помещается в uint64
+_A = _rng.integers(1, _MERSENNE, NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, _MERSENNE, NUM_PERM, dtype=np.uint64)
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _words(text: str) -> List[str]:
+    return _WORD_RE.findall(text.lower().replace("ё", "е"))
+
+
+def minhash_signature(text: str) -> Optional[np.ndarray]:
+    words = _words(text)
+    if len(words) < MIN_WORDS:
+        return None
+    shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    return ((_A[:, None] * hashes[None, :] + _B[:, None]) % _MERSENNE).min(axis=1)
+
+
+def band_buckets(signature: np.ndarray) -> List[tuple]:
+    buckets = []
+    for band in range(BANDS):
+        chunk = signature[band * ROWS:(band + 1) * ROWS].astype(np.uint32).tobytes()
+        bucket = int.from_bytes(hashlib.blake2b(chunk, digest_size=8).digest(), "big", signed=True)
+        buckets.append((band, bucket))
+    return buckets
+
+
+def attempt_text(answers, extracted_text: Optional[str] = None) -> str:
+    # Текст попытки: открытые ответы по порядку вопросов и/или текст загруженного документа
+    parts = []
+    if isinstance(answers, list):
+        items = [a for a in answers if isinstance(a, dict) and a.get("answer_text")]
+        items.sort(key=lambda a: a.get("question_index") or 0)
+        parts.extend(a["answer_text"] for a in items)
+    if extracted_text:
+        parts.append(extracted_text)
+    return "\n".join(parts)
+
+
+async def index_answer(
+    db: AsyncSession,
+    attempt_id: UUID,
+    exam_id: UUID,
+    student_id: UUID,
+    text: str,
+) -> List[tuple]:
+    """Добавляет ответ в индекс и помечает похожие ответы других студентов.
+
+    Возвращает [(other_attempt_id, similarity)]. Коммит - на стороне вызывающего.
+    """
+    signature = minhash_signature(text)
+    if signature is None:
+        return []
+    buckets = band_buckets(signature)
+
+    candidates = await db.execute(
+        select(AnswerSignature.attempt_id, AnswerSignature.signature).where(
+            AnswerSignature.attempt_id.in_(
+                select(AnswerLshBand.attempt_id).where(
+                    tuple_(AnswerLshBand.band, AnswerLshBand.bucket).in_(buckets)
+                )
+            ),
+            AnswerSignature.student_id != student_id,
+            AnswerSignature.attempt_id != attempt_id,
+        )
+    )
+    matches = []
+    for row in candidates:
+        # Доля совпавших минимумов - оценка коэффициента Жаккара
+        similarity = float(np.mean(np.asarray(row.signature, dtype=np.uint64) == signature))
+        if similarity >= SIMILARITY_THRESHOLD:
+            matches.append((row.attempt_id, similarity))
+
+    await db.execute(
+        insert(AnswerSignature)
+        .values(
+            attempt_id=attempt_id,
+            exam_id=exam_id,
+            student_id=student_id,
+            signature=[int(v) for v in signature],
+        )
+        .on_conflict_do_nothing(index_elements=[AnswerSignature.attempt_id])
+    )
+    await db.execute(
+        insert(AnswerLshBand)
+        .values([{"band": band, "bucket": bucket, "attempt_id": attempt_id} for band, bucket in buckets])
+        .on_conflict_do_nothing()
+    )
+    if matches:
+        stmt = insert(AnswerSimilarityFlag).values([
+            {"attempt_id": attempt_id, "other_attempt_id": other_id, "similarity": similarity}
+            for other_id, similarity in matches
+        ])
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[AnswerSimilarityFlag.attempt_id, AnswerSimilarityFlag.other_attempt_id],
+                set_={"similarity": stmt.excluded.similarity},
+            )
+        )
+    return matches
+
+
+async def index_attempt(attempt_id: UUID):
+    # Отдельная сессия - для фоновой обработки (текст документа появляется после загрузки)
+    async with AsyncSessionLocal() as db:
+        res = await db.execute(
+            select(
+                ExamAttempt.id, ExamAttempt.exam_id, ExamAttempt.student_id,
+                ExamAttempt.answers, ExamAttempt.extracted_text,
+            ).where(ExamAttempt.id == attempt_id)
+        )
+        row = res.first()
+        if row is None:
+            return
+        await index_answer(db, row.id, row.exam_id, row.student_id, attempt_text(row.answers, row.extracted_text))
+        await db.commit()
+
+
+async def backfill_index(chunk_size: int = 500):
+    # Индексирует все открытые и документные ответы, у которых еще нет сигнатуры
+    # В порядке отправки: более поздний ответ помечается как похожий на более ранний
+    query = (
+        select(
+            ExamAttempt.id, ExamAttempt.exam_id, ExamAttempt.student_id,
+            ExamAttempt.answers, ExamAttempt.extracted_text,
+        )
+        .where(
+            or_(
+                ExamAttempt.answer_type.in_([AnswerType.open_text, AnswerType.document]),
+                ExamAttempt.extracted_text.isnot(None),
+            ),
+            ~exists().where(AnswerSignature.attempt_id == ExamAttempt.id),
+        )
+        .order_by(ExamAttempt.submitted_at)
+        .execution_options(yield_per=chunk_size)
+    )
+
+    total = 0
+    async with AsyncSessionLocal() as read_db, AsyncSessionLocal() as write_db:
+        result = await read_db.stream(query)
+        async for partition in result.partitions(chunk_size):
+            for attempt in partition:
+                await index_answer(
+                    write_db, attempt.id, attempt.exam_id, attempt.student_id,
+                    attempt_text(attempt.answers, attempt.extracted_text),
+                )
+            await write_db.commit()
+            total += len(partition)
+    return total
+
+
+if __name__ == "__main__":
+    count = asyncio.run(backfill_index())
+    print(f"✅ Проиндексировано ответов: {count}")
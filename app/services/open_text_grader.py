@@ -0,0 +1,166 @@
+import asyncio
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.ai_service import grade_open_answer
+from app.services.grading import reference_answers
+
+try:
+    from scipy import sparse
+except ImportError:  # без scipy матрица строится плотной - для одного экзамена это десятки строк
+    sparse = None
+
+
+# Открытые ответы проверяются локально: символьные n-граммы + TF-IDF + косинусная близость
+# к эталонным ответам, все ответы экзамена векторизуются одной матрицей.
+# В LLM уходят только неуверенные случаи - близость между REJECT_BELOW и ACCEPT_ABOVE
+NGRAM_RANGE = (3, 5)
+ACCEPT_ABOVE = 0.75
+REJECT_BELOW = 0.35
+# Порог для неуверенных случаев, если LLM недоступна
+FALLBACK_THRESHOLD = 0.55
+MAX_CONCURRENT_LLM_CALLS = 4
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+@dataclass
+class OpenTextResult:
+    question_index: int
+    similarity: float
+    correct: bool
+    method: str # similarity | llm | fallback
+    feedback: Optional[str] = None
+
+
+@dataclass
+class UncertainAnswer:
+    question_index: int
+    question: str
+    answer: str
+    references: List[str]
+    similarity: float
+
+
+def _normalize(text: str) -> str:
+    return " ".join(_WORD_RE.findall(text.lower().replace("ё", "е")))
+
+
+def _char_ngrams(text: str) -> List[str]:
+    # n-граммы внутри слов с границами (как analyzer="char_wb"): устойчивы к окончаниям и опечаткам
+    grams = []
+    lo, hi = NGRAM_RANGE
+    for word in text.split():
+        padded = f" {word} "
+        for n in range(lo, hi + 1):
+            grams.extend(padded[i:i + n] for i in range(len(padded) - n + 1))
+    return grams
+
+
+def _tfidf_matrix(documents: List[str]):
+    """Строки - документы, L2-нормированные TF-IDF векторы (sublinear tf, сглаженный idf)."""
+    vocab: Dict[str, int] = {}
+    rows, cols, counts = [], [], []
+    for row, doc in enumerate(documents):
+        doc_counts: Dict[int, int] = {}
+        for gram in _char_ngrams(doc):
+            col = vocab.setdefault(gram, len(vocab))
+            doc_counts[col] = doc_counts.get(col, 0) + 1
+        rows.extend([row] * len(doc_counts))
+        cols.extend(doc_counts.keys())
+        counts.extend(doc_counts.values())
+
+    n_docs, n_terms = len(documents), max(len(vocab), 1)
+    rows = np.asarray(rows, dtype=np.int64)
+    cols = np.asarray(cols, dtype=np.int64)
+    tf = 1.0 + np.log(np.asarray(counts, dtype=np.float64))
+
+    df = np.bincount(cols, minlength=n_terms)
+    idf = np.log((1.0 + n_docs) / (1.0 + df)) + 1.0
+    values = tf * idf[cols]
+
+    norms = np.sqrt(np.bincount(rows, weights=values ** 2, minlength=n_docs))
+    norms[norms == 0] = 1.0
+    values = values / norms[rows]
+
+    if sparse is not None:
+        return sparse.csr_matrix((values, (rows, cols)), shape=(n_docs, n_terms))
+    dense = np.zeros((n_docs, n_terms))
+    dense[rows, cols] = values
+    return dense
+
+
+def similarity_scores(pairs: List[tuple]) -> List[float]:
+    """pairs: [(ответ, [эталоны])] -> максимальная косинусная близость ответа к эталонам.
+
+    Все тексты пакета векторизуются одной матрицей, близости считаются одним умножением.
+    """
+    documents = [_normalize(answer) for answer, _ in pairs]
+    ref_rows = []
+    for _, refs in pairs:
+        start = len(documents)
+        documents.extend(_normalize(r) for r in refs)
+        ref_rows.append((start, len(documents)))
+    if not pairs:
+        return []
+
+    matrix = _tfidf_matrix(documents)
+    answers = matrix[:len(pairs)]
+    refs = matrix[len(pairs):]
+    sims = answers @ refs.T
+    if sparse is not None:
+        sims = sims.toarray()
+
+    scores = []
+    for i, (start, end) in enumerate(ref_rows):
+        start, end = start - len(pairs), end - len(pairs)
+        scores.append(float(sims[i, start:end].max()) if end > start else 0.0)
+    return scores
+
+
+def grade_open_answers_locally(
+    questions: list, answers: Dict[int, str]
+) -> Tuple[Dict[int, OpenTextResult], List[UncertainAnswer]]:
+    """answers: {индекс открытого вопроса: текст ответа}. Пустые ответы не оцениваются.
+
+    Возвращает уверенные оценки по близости и неуверенные ответы для escalate_uncertain_answers.
+    """
+    items = [
+        (i, text, reference_answers(questions[i]))
+        for i, text in answers.items()
+        if text and text.strip() and 0 <= i < len(questions)
+    ]
+    scores = similarity_scores([(text, refs) for _, text, refs in items])
+
+    results: Dict[int, OpenTextResult] = {}
+    uncertain = []
+    for (i, text, refs), score in zip(items, scores):
+        if score >= ACCEPT_ABOVE:
+            results[i] = OpenTextResult(i, score, True, "similarity")
+        elif score <= REJECT_BELOW:
+            results[i] = OpenTextResult(i, score, False, "similarity")
+        else:
+            uncertain.append(UncertainAnswer(i, questions[i].get("question", ""), text, refs, score))
+    return results, uncertain
+
+
+async def escalate_uncertain_answers(uncertain: List[UncertainAnswer]) -> Dict[int, OpenTextResult]:
+    # Вызовы LLM; вызывающий код не должен держать в это время соединение с БД
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_LLM_CALLS)
+
+    async def escalate(u: UncertainAnswer):
+        async with semaphore:
+            try:
+                verdict = await grade_open_answer(u.question, u.references, u.answer)
+                return OpenTextResult(
+                    u.question_index, u.similarity, bool(verdict.get("correct")), "llm", verdict.get("feedback")
+                )
+            except Exception as e:
+                print(f"Open answer grading error: {e}")
+                return OpenTextResult(u.question_index, u.similarity, u.similarity >= FALLBACK_THRESHOLD, "fallback")
+
+    return {r.question_index: r for r in await asyncio.gather(*(escalate(u) for u in uncertain))}
+
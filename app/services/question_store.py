@@ -0,0 +1,124 @@
+import hashlib
+import json
+from typing import Dict, Iterable, List, Optional
+from uuid import UUID
+
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import Exam, ExamAttempt, Question
+from app.services.ai_service import generate_quiz
+
+
+# Вопросы хранятся один раз, ключ - sha256 от канонического JSON.
+# Экзамен ссылается на упорядоченный список этих ключей (exams.question_ids)
+QUIZ_SIZE = 3 # вопросов с вариантами в тесте (как в промпте generate_quiz)
+MIN_POOL_DISCRIMINATION = 0.2 # вопросы с меньшей дискриминацией плохо отличают знающих
+
+def question_hash(question: dict) -> str:
+    canonical = json.dumps(question, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+async def store_questions(db: AsyncSession, questions: list) -> List[str]:
+    question_ids = [question_hash(q) for q in questions]
+    unique = dict(zip(question_ids, questions))
+    if unique:
+        await db.execute(
+            insert(Question)
+            .values([{"id": qid, "body": body} for qid, body in unique.items()])
+            .on_conflict_do_nothing(index_elements=[Question.id])
+        )
+    return question_ids
+
+
+async def fetch_question_bodies(db: AsyncSession, question_ids: Iterable[str]) -> Dict[str, dict]:
+    ids = set(question_ids)
+    if not ids:
+        return {}
+    res = await db.execute(select(Question.id, Question.body).where(Question.id.in_(ids)))
+    return {row.id: row.body for row in res}
+
+
+async def load_question_texts(db: AsyncSession, question_ids: Iterable[str]) -> Dict[str, Optional[str]]:
+    # Только текст вопросов (body->>'question'), без вариантов ответа и эталонов
+    ids = set(question_ids)
+    if not ids:
+        return {}
+    res = await db.execute(
+        select(Question.id, Question.body["question"].astext.label("text")).where(Question.id.in_(ids))
+    )
+    return {row.id: row.text for row in res}
+
+
+async def load_questions(db: AsyncSession, question_ids: List[str]) -> list:
+    bodies = await fetch_question_bodies(db, question_ids)
+    return [bodies.get(qid, {}) for qid in question_ids]
+
+
+async def load_exam_questions(db: AsyncSession, exam_id: UUID) -> list:
+    res = await db.execute(select(Exam.question_ids, Exam.questions).where(Exam.id == exam_id))
+    row = res.first()
+    if row is None:
+        return []
+    if row.question_ids is not None:
+        return await load_questions(db, row.question_ids)
+    # Экзамены, еще не перенесенные в хранилище вопросов
+    return row.questions or []
+
+
+async def pooled_questions(
+    db: AsyncSession,
+    topic_id: UUID,
+    difficulty: int,
+    limit: int = QUIZ_SIZE,
+    student_id: Optional[UUID] = None,
+) -> list:
+    # Уже использованные по теме вопросы с откалиброванной трудностью (services/item_statistics.py)
+    # и достаточной дискриминацией; случайный порядок, чтобы тесты студентов различались
+    used = (
+        select(func.unnest(Exam.question_ids).label("question_id"))
+        .where(Exam.topic_id == topic_id, Exam.question_ids.isnot(None))
+        .subquery()
+    )
+    query = (
+        select(Question.body)
+        .where(
+            Question.id.in_(select(used.c.question_id)),
+            Question.calibrated_difficulty == difficulty,
+            Question.discrimination >= MIN_POOL_DISCRIMINATION,
+        )
+        .order_by(func.random())
+        .limit(limit)
+    )
+    if student_id is not None:
+        # Вопросы, которые студент уже видел в своих попытках по теме, не повторяем
+        seen = (
+            select(func.unnest(Exam.question_ids).label("question_id"))
+            .join(ExamAttempt, ExamAttempt.exam_id == Exam.id)
+            .where(Exam.topic_id == topic_id, ExamAttempt.student_id == student_id)
+            .subquery()
+        )
+        query = query.where(Question.id.not_in(select(seen.c.question_id)))
+    res = await db.execute(query)
+    return list(res.scalars())
+
+
+async def quiz_questions(
+    db: AsyncSession,
+    topic_id: UUID,
+    topic_title: str,
+    difficulty: int,
+    student_id: Optional[UUID],
+    open_questions: int = 0,
+) -> list:
+    """Вопросы нового теста: из откалиброванного пула, если его хватает, иначе - генерация LLM.
+
+    student_id=None (тест для группы) - без исключения уже виденных студентом вопросов.
+    """
+    if open_questions == 0:
+        pooled = await pooled_questions(db, topic_id, difficulty, QUIZ_SIZE, student_id)
+        if len(pooled) == QUIZ_SIZE:
+            return pooled
+    return await generate_quiz(topic_name=topic_title, difficulty=difficulty, open_questions=open_questions)
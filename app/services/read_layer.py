@@ -0,0 +1,128 @@
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from sqlalchemy import select, func, true
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.models.models import Course, CourseEnrollment, Lesson, LessonProgress, StudentTopicMastery
+
+
+# Чтение для списков и карточек: Core-проекции ровно нужных колонок, результат - строки (Row).
+# ORM-сущности здесь не создаются: нет identity map, отслеживания изменений, коллекций
+# relationship и лишних колонок. Для записи по-прежнему используются ORM-модели
+
+
+async def course_list_rows(
+    db: AsyncSession,
+    institution_id: Optional[UUID],
+    student_id: UUID,
+    after: Optional[UUID] = None,
+    limit: Optional[int] = None,
+) -> List[Row]:
+    """Активные курсы учреждения: id, title, description, is_active, lessons_count, enrolled."""
+    if settings.USE_LESSONS_COUNTER:
+        lessons_count = Course.lessons_count
+    else:
+        lessons_count = (
+            select(func.count(Lesson.id))
+            .where(Lesson.course_id == Course.id)
+            .scalar_subquery()
+        )
+
+    enrolled = (
+        select(CourseEnrollment.course_id)
+        .where(
+            CourseEnrollment.course_id == Course.id,
+            CourseEnrollment.student_id == student_id,
+        )
+        .exists()
+    )
+
+    # Пагинация по ключу (after = id последнего курса)
+    query = (
+        select(
+            Course.id,
+            Course.title,
+            Course.description,
+            Course.is_active,
+            lessons_count.label("lessons_count"),
+            enrolled.label("enrolled"),
+        )
+        .where(
+            Course.institution_id == institution_id,
+            Course.is_active == True,
+        )
+        .order_by(Course.id)
+    )
+    if after is not None:
+        query = query.where(Course.id > after)
+    if limit is not None:
+        query = query.limit(limit)
+
+    res = await db.execute(query)
+    return res.all()
+
+
+async def course_header_row(db: AsyncSession, course_id: UUID) -> Optional[Row]:
+    res = await db.execute(
+        select(Course.id, Course.title, Course.description, Course.is_active)
+        .where(Course.id == course_id)
+    )
+    return res.first()
+
+
+async def course_lesson_rows(
+    db: AsyncSession,
+    course_id: UUID,
+    student_id: UUID,
+    with_content: bool,
+    published_only: bool,
+) -> List[Row]:
+    """Уроки курса по порядку вместе с прогрессом студента (progress_status = None, если не начат)."""
+    # Уникальности (lesson_id, student_id) в lesson_progress нет - берем последнюю запись,
+    # чтобы урок не задваивался
+    progress = (
+        select(LessonProgress.status, LessonProgress.progress_percent)
+        .where(LessonProgress.lesson_id == Lesson.id, LessonProgress.student_id == student_id)
+        .order_by(LessonProgress.last_accessed_at.desc().nulls_last())
+        .limit(1)
+        .lateral()
+    )
+    columns = [
+        Lesson.id,
+        Lesson.title,
+        Lesson.description,
+        Lesson.duration_minutes,
+        Lesson.order_num,
+        Lesson.is_published,
+        progress.c.status.label("progress_status"),
+        progress.c.progress_percent,
+    ]
+    if with_content:
+        columns += [Lesson.video_url, Lesson.content]
+
+    query = (
+        select(*columns)
+        .outerjoin(progress, true())
+        .where(Lesson.course_id == course_id)
+        .order_by(Lesson.order_num, Lesson.id)
+    )
+    if published_only:
+        query = query.where(Lesson.is_published == True)
+
+    res = await db.execute(query)
+    return res.all()
+
+
+async def topic_mastery_rows(db: AsyncSession, student_id: UUID) -> Dict[UUID, Row]:
+    """{topic_id: (topic_id, mastery_level, attempts_count)} по всем темам, которые студент сдавал."""
+    res = await db.execute(
+        select(
+            StudentTopicMastery.topic_id,
+            StudentTopicMastery.mastery_level,
+            StudentTopicMastery.attempts_count,
+        ).where(StudentTopicMastery.student_id == student_id)
+    )
+    return {row.topic_id: row for row in res}
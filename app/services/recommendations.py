@@ -0,0 +1,123 @@
+import re
+from datetime import datetime
+from typing import Iterable, List, Optional, Set
+from uuid import UUID
+
+from sqlalchemy import select, delete, insert, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import StudentRecommendation, StudentTopicMastery
+from app.services.curriculum import TopicNode, get_curriculum
+
+
+TOP_K = 5
+MASTERED_LEVEL = 80.0 # выше этого уровня тему не рекомендуем, если нет других причин
+
+WEAK_TOPIC_BOOST = 0.5
+REVIEW_DUE_BOOST = 0.2
+NEXT_TOPIC_SCORE = 0.4
+
+_WORD_RE = re.compile(r"\w{3,}")
+
+
+def _words(text: str) -> Set[str]:
+    return set(_WORD_RE.findall(text.lower()))
+
+
+def match_weak_topics(weak_topics: Iterable[str], topics: Iterable[TopicNode]) -> Set[UUID]:
+    # LLM возвращает слабые места свободным текстом: сопоставляем их с названиями тем
+    # по вхождению строки или пересечению слов (коэффициент Жаккара)
+    phrases = [(w.lower().strip(), _words(w)) for w in weak_topics if isinstance(w, str) and w.strip()]
+    matched = set()
+    for topic in topics:
+        title = topic.title.lower()
+        title_words = _words(title)
+        for phrase, words in phrases:
+            if phrase in title or title in phrase:
+                matched.add(topic.id)
+                break
+            if words and title_words and len(words & title_words) / len(words | title_words) >= 0.5:
+                matched.add(topic.id)
+                break
+    return matched
+
+
+async def refresh_recommendations(
+    db: AsyncSession,
+    student_id: UUID,
+    subject_id: UUID,
+    weak_topics: Optional[List[str]] = None,
+):
+    # Топ-K перезаписывается целиком (delete + insert по ключу (student_id, rank)): без блокировки
+    # две параллельные отправки одного студента вставили бы одни и те же ключи -> IntegrityError.
+    # Блокировка до конца транзакции, оценки ниже читаются уже после нее
+    await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(f"recommendations:{student_id}"))))
+
+    curriculum = await get_curriculum(db)
+    mastery_res = await db.execute(
+        select(
+            StudentTopicMastery.topic_id,
+            StudentTopicMastery.mastery_level,
+            StudentTopicMastery.next_review_at,
+        ).where(StudentTopicMastery.student_id == student_id)
+    )
+    masteries = {m.topic_id: m for m in mastery_res}
+
+    # Рассматриваем предмет текущего теста и все предметы, которые студент уже начал
+    subject_ids = {subject_id}
+    for topic_id in masteries:
+        topic = curriculum.topics_by_id.get(topic_id)
+        if topic is not None:
+            subject_ids.add(topic.subject_id)
+
+    current_subject = curriculum.subjects_by_id.get(subject_id)
+    weak_ids = match_weak_topics(weak_topics or [], current_subject.topics if current_subject else ())
+    now = datetime.now()
+
+    candidates = []
+    for subj in curriculum.subjects:
+        if subj.id not in subject_ids:
+            continue
+        next_topic_found = False
+        for position, topic in enumerate(subj.topics):
+            m = masteries.get(topic.id)
+            weak = topic.id in weak_ids
+
+            if m is None:
+                # Непройденные темы: только ближайшая по порядку (или названная слабым местом)
+                if next_topic_found and not weak:
+                    continue
+                next_topic_found = True
+                score, reason = NEXT_TOPIC_SCORE, "next_topic"
+            else:
+                level = m.mastery_level or 0.0
+                due = m.next_review_at is not None and m.next_review_at <= now
+                if level >= MASTERED_LEVEL and not (weak or due):
+                    continue
+                score, reason = 1 - level / 100, "low_mastery"
+                if due:
+                    score += REVIEW_DUE_BOOST
+                    reason = "review_due"
+
+            if weak:
+                score += WEAK_TOPIC_BOOST
+                reason = "weak_topic"
+            candidates.append((score, position, topic.id, reason))
+
+    candidates.sort(key=lambda c: (-c[0], c[1]))
+
+    await db.execute(delete(StudentRecommendation).where(StudentRecommendation.student_id == student_id))
+    if candidates:
+        await db.execute(
+            insert(StudentRecommendation),
+            [
+                {
+                    "student_id": student_id,
+                    "rank": rank,
+                    "topic_id": topic_id,
+                    "score": score,
+                    "reason": reason,
+                }
+                for rank, (score, _, topic_id, reason) in enumerate(candidates[:TOP_K])
+            ],
+        )
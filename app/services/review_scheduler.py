@@ -0,0 +1,68 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import update, func, literal_column, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal
+from app.models.models import StudentTopicMastery
+
+
+# Интервал повторения растет экспоненциально с "прочностью" знания:
+# 0 -> MIN_INTERVAL_DAYS, 1 -> MAX_INTERVAL_DAYS.
+# Прочность = освоение темы (0..1), приглушенное низкой уверенностью модели.
+MIN_INTERVAL_DAYS = 1.0
+MAX_INTERVAL_DAYS = 60.0
+
+
+def review_interval_days(mastery_level: Optional[float], confidence: Optional[float]) -> float:
+    strength = (mastery_level or 0.0) / 100 * (0.5 + 0.5 * (confidence or 0.0))
+    return MIN_INTERVAL_DAYS * (MAX_INTERVAL_DAYS / MIN_INTERVAL_DAYS) ** strength
+
+
+def next_review_at(
+    mastery_level: Optional[float],
+    confidence: Optional[float],
+    last_tested_at: datetime,
+) -> datetime:
+    return last_tested_at + timedelta(days=review_interval_days(mastery_level, confidence))
+
+
+def _review_interval_days_sql():
+    # Та же формула, что и review_interval_days, но в SQL для пакетного пересчета
+    strength = (
+        func.coalesce(StudentTopicMastery.mastery_level, 0.0) / 100
+        * (0.5 + 0.5 * func.coalesce(StudentTopicMastery.confidence, 0.0))
+    )
+    return MIN_INTERVAL_DAYS * func.power(MAX_INTERVAL_DAYS / MIN_INTERVAL_DAYS, strength)
+
+
+async def reschedule_reviews(db: AsyncSession) -> int:
+    # Ночная задача: пересчитывает next_review_at, если формула интервала изменилась.
+    # Обычно значение уже посчитано при сдаче теста - такие строки не переписываются
+    # (допуск в секунду на разницу округления Python и SQL), иначе каждая ночь - запись всей таблицы
+    # и лишнее обновление updated_at, от которого зависят ETag и кеши
+    expected = StudentTopicMastery.last_tested_at + _review_interval_days_sql() * literal_column("interval '1 day'")
+    drift = func.abs(func.extract("epoch", StudentTopicMastery.next_review_at - expected))
+    res = await db.execute(
+        update(StudentTopicMastery)
+        .where(
+            StudentTopicMastery.last_tested_at.isnot(None),
+            or_(StudentTopicMastery.next_review_at.is_(None), drift > 1),
+        )
+        .values(next_review_at=expected)
+        .execution_options(synchronize_session=False)
+    )
+    return res.rowcount
+
+
+async def main():
+    async with AsyncSessionLocal() as db:
+        count = await reschedule_reviews(db)
+        await db.commit()
+    print(f"✅ Расписание повторений пересчитано, изменено строк: {count}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
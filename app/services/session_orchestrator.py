@@ -0,0 +1,360 @@
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException
+from sqlalchemy import select, update, func, and_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import AsyncSessionLocal
+from app.models.models import (
+    AiAnalysis, Exam, ExamAttempt, LearningSession, SessionStatus, Topic
+)
+from app.schemas import SessionState
+from app.services.ai_service import analyze_errors, generate_practice_tasks, generate_quiz
+from app.services.grading import build_answer_key
+from app.services.question_store import load_exam_questions, store_questions
+from app.services.recommendations import refresh_recommendations
+
+
+# Сессия обучения: testing -> explaining -> practicing -> retesting -> completed.
+# Как только начинается этап, в фоне готовятся материалы следующего (задания, повторный тест),
+# поэтому переход между этапами не ждет LLM. Материалы хранятся в БД, запись идемпотентна
+# и защищена advisory-блокировкой, так что параллельные воркеры не записывают их дважды.
+# Сам вызов LLM выполняется вне транзакции: соединение с БД на это время возвращается в пул
+NEXT_STAGE = {
+    SessionStatus.testing: SessionStatus.explaining,
+    SessionStatus.explaining: SessionStatus.practicing,
+    SessionStatus.practicing: SessionStatus.retesting,
+    SessionStatus.retesting: SessionStatus.completed,
+}
+PREFETCH_TIMEOUT_SECONDS = 120.0
+
+# {(session_id, этап): задача подготовки} - только в памяти процесса
+_prefetch_tasks: Dict[Tuple[UUID, SessionStatus], asyncio.Task] = {}
+
+
+@dataclass
+class _SessionContext:
+    id: UUID
+    student_id: UUID
+    subject_id: UUID
+    status: SessionStatus
+    retest_exam_id: Optional[UUID]
+    exam_id: Optional[UUID] = None
+    topic_id: Optional[UUID] = None
+    topic_title: Optional[str] = None
+    difficulty: Optional[int] = None
+    attempt_id: Optional[UUID] = None
+    answers: Optional[list] = None
+    score: Optional[float] = None
+    explanation: Optional[str] = None
+    weak_topics: Optional[list] = None
+    recommendations: Optional[str] = None
+    extra_tasks: Optional[list] = None
+    retest_submitted: bool = False
+
+
+async def _load_context(db: AsyncSession, session_id: UUID) -> Optional[_SessionContext]:
+    res = await db.execute(
+        select(
+            LearningSession.id, LearningSession.student_id, LearningSession.subject_id,
+            LearningSession.status, LearningSession.assigned_exam_id, LearningSession.retest_exam_id,
+        ).where(LearningSession.id == session_id)
+    )
+    session = res.first()
+    if session is None:
+        return None
+    ctx = _SessionContext(
+        id=session.id,
+        student_id=session.student_id,
+        subject_id=session.subject_id,
+        status=session.status,
+        retest_exam_id=session.retest_exam_id,
+    )
+
+    # Тест этапа testing: назначенный группе или последний созданный в сессии (кроме повторного)
+    if session.assigned_exam_id is not None:
+        exam_filter = Exam.id == session.assigned_exam_id
+    elif session.retest_exam_id is not None:
+        exam_filter = and_(Exam.session_id == session.id, Exam.id != session.retest_exam_id)
+    else:
+        exam_filter = Exam.session_id == session.id
+    exam_res = await db.execute(
+        select(Exam.id, Exam.topic_id, Exam.difficulty, Topic.title)
+        .outerjoin(Topic, Topic.id == Exam.topic_id)
+        .where(exam_filter)
+        .order_by(Exam.created_at.desc())
+        .limit(1)
+    )
+    exam = exam_res.first()
+    if exam is None:
+        return ctx
+    ctx.exam_id, ctx.topic_id, ctx.difficulty, ctx.topic_title = exam.id, exam.topic_id, exam.difficulty, exam.title
+
+    attempt_res = await db.execute(
+        select(
+            ExamAttempt.id, ExamAttempt.answers, ExamAttempt.score,
+            AiAnalysis.explanation, AiAnalysis.weak_topics, AiAnalysis.recommendations, AiAnalysis.extra_tasks,
+        )
+        .outerjoin(AiAnalysis, AiAnalysis.attempt_id == ExamAttempt.id)
+        .where(ExamAttempt.exam_id == exam.id, ExamAttempt.student_id == session.student_id)
+        .order_by(ExamAttempt.submitted_at.desc())
+        .limit(1)
+    )
+    attempt = attempt_res.first()
+    if attempt is not None:
+        ctx.attempt_id, ctx.answers, ctx.score = attempt.id, attempt.answers, attempt.score
+        ctx.explanation, ctx.weak_topics = attempt.explanation, attempt.weak_topics
+        ctx.recommendations, ctx.extra_tasks = attempt.recommendations, attempt.extra_tasks
+
+    if session.retest_exam_id is not None:
+        retest_res = await db.execute(
+            select(ExamAttempt.id).where(
+                ExamAttempt.exam_id == session.retest_exam_id,
+                ExamAttempt.student_id == session.student_id,
+            ).limit(1)
+        )
+        ctx.retest_submitted = retest_res.first() is not None
+    return ctx
+
+
+def _stage_ready(ctx: _SessionContext, stage: SessionStatus) -> bool:
+    if stage == SessionStatus.explaining:
+        return ctx.explanation is not None
+    if stage == SessionStatus.practicing:
+        return ctx.extra_tasks is not None
+    if stage == SessionStatus.retesting:
+        return ctx.retest_exam_id is not None
+    if stage == SessionStatus.completed:
+        return ctx.retest_submitted
+    return True
+
+
+async def _upsert_analysis(db: AsyncSession, attempt_id: UUID, **values):
+    stmt = insert(AiAnalysis.__table__).values(attempt_id=attempt_id, **values)
+    await db.execute(stmt.on_conflict_do_update(index_elements=["attempt_id"], set_=values))
+
+
+async def _generate_explaining(ctx: _SessionContext, questions: list) -> dict:
+    # Разбор ошибок ИИ: запускается в фоне сразу после отправки теста (on_exam_submitted)
+    return await analyze_errors(ctx.topic_title, questions, ctx.answers or [])
+
+
+async def _store_explaining(db: AsyncSession, ctx: _SessionContext, analysis: dict):
+    await _upsert_analysis(
+        db,
+        ctx.attempt_id,
+        score=ctx.score,
+        explanation=analysis.get("explanation"),
+        weak_topics=analysis.get("weak_topics"),
+        recommendations=analysis.get("recommendation"),
+    )
+    weak_topics = analysis.get("weak_topics")
+    await refresh_recommendations(
+        db,
+        student_id=ctx.student_id,
+        subject_id=ctx.subject_id,
+        weak_topics=weak_topics if isinstance(weak_topics, list) else None,
+    )
+
+
+async def _generate_practicing(ctx: _SessionContext) -> list:
+    return await generate_practice_tasks(ctx.topic_title, ctx.weak_topics or [], ctx.explanation or "")
+
+
+async def _store_practicing(db: AsyncSession, ctx: _SessionContext, tasks: list):
+    await _upsert_analysis(db, ctx.attempt_id, extra_tasks=tasks)
+
+
+async def _generate_retesting(ctx: _SessionContext) -> Tuple[int, list]:
+    difficulty = ctx.difficulty if ctx.difficulty is not None else 3
+    return difficulty, await generate_quiz(topic_name=ctx.topic_title, difficulty=difficulty)
+
+
+async def _store_retesting(db: AsyncSession, ctx: _SessionContext, generated: Tuple[int, list]):
+    difficulty, questions_json = generated
+    exam = Exam(
+        session_id=ctx.id,
+        topic_id=ctx.topic_id,
+        difficulty=difficulty,
+        question_ids=await store_questions(db, questions_json),
+        answer_key=build_answer_key(questions_json),
+        is_retest=True,
+    )
+    db.add(exam)
+    await db.flush()
+    await db.execute(
+        update(LearningSession).where(LearningSession.id == ctx.id).values(retest_exam_id=exam.id)
+    )
+
+
+# {этап: (генерация без БД, запись результата)}
+_PREPARERS = {
+    SessionStatus.explaining: (_generate_explaining, _store_explaining),
+    SessionStatus.practicing: (_generate_practicing, _store_practicing),
+    SessionStatus.retesting: (_generate_retesting, _store_retesting),
+}
+
+
+async def _locked_context(db: AsyncSession, session_id: UUID, stage: SessionStatus) -> Optional[_SessionContext]:
+    # Блокировка до конца транзакции: второй воркер дождется и увидит записанные материалы
+    await db.execute(select(func.pg_advisory_xact_lock(func.hashtext(f"session:{session_id}:{stage.value}"))))
+    return await _load_context(db, session_id)
+
+
+def _needs_preparation(ctx: Optional[_SessionContext], stage: SessionStatus) -> bool:
+    return ctx is not None and ctx.attempt_id is not None and not _stage_ready(ctx, stage)
+
+
+async def _generation_inputs(db: AsyncSession, ctx: _SessionContext, stage: SessionStatus) -> dict:
+    # Все, что генерации нужно из БД, читается до вызова LLM
+    if stage == SessionStatus.explaining:
+        return {"questions": await load_exam_questions(db, ctx.exam_id)}
+    return {}
+
+
+async def _prepare(session_id: UUID, stage: SessionStatus):
+    generate, store = _PREPARERS[stage]
+
+    # 1. Проверка под блокировкой, транзакция закрывается до вызова LLM
+    async with AsyncSessionLocal() as db:
+        ctx = await _locked_context(db, session_id, stage)
+        if not _needs_preparation(ctx, stage):
+            await db.commit()
+            return
+        inputs = await _generation_inputs(db, ctx, stage)
+        await db.commit()
+
+    result = await generate(ctx, **inputs)
+
+    # 2. Запись под той же блокировкой; если другой воркер успел раньше, результат отбрасывается
+    async with AsyncSessionLocal() as db:
+        ctx = await _locked_context(db, session_id, stage)
+        if _needs_preparation(ctx, stage):
+            await store(db, ctx, result)
+        await db.commit()
+
+
+def _on_prefetch_done(key, task: asyncio.Task):
+    _prefetch_tasks.pop(key, None)
+    if not task.cancelled() and task.exception() is not None:
+        print(f"Session prefetch error {key}: {task.exception()}")
+
+
+def prefetch(session_id: UUID, stage: Optional[SessionStatus]):
+    """Запускает фоновую подготовку материалов этапа, если она еще не идет."""
+    if stage not in _PREPARERS:
+        return
+    key = (session_id, stage)
+    if key in _prefetch_tasks:
+        return
+    task = asyncio.create_task(_prepare(session_id, stage))
+    _prefetch_tasks[key] = task
+    task.add_done_callback(lambda t: _on_prefetch_done(key, t))
+
+
+async def _ensure_ready(session_id: UUID, stage: SessionStatus):
+    # Ожидание общей фоновой задачи, с ограничением по времени
+    prefetch(session_id, stage)
+    task = _prefetch_tasks.get((session_id, stage))
+    try:
+        if task is not None:
+            await asyncio.wait_for(asyncio.shield(task), PREFETCH_TIMEOUT_SECONDS)
+    except Exception as e:
+        print(f"Session stage preparation error: {e}")
+        raise HTTPException(status_code=503, detail="Материалы следующего этапа еще готовятся")
+
+
+def _state(ctx: _SessionContext) -> SessionState:
+    next_stage = NEXT_STAGE.get(ctx.status)
+    return SessionState(
+        id=ctx.id,
+        status=ctx.status.value,
+        subject_id=ctx.subject_id,
+        exam_id=ctx.exam_id,
+        topic_id=ctx.topic_id,
+        topic=ctx.topic_title,
+        explanation=ctx.explanation,
+        recommendations=ctx.recommendations,
+        weak_topics=ctx.weak_topics if isinstance(ctx.weak_topics, list) else None,
+        extra_tasks=ctx.extra_tasks if isinstance(ctx.extra_tasks, list) else None,
+        retest_exam_id=ctx.retest_exam_id,
+        next_status=next_stage.value if next_stage else None,
+        next_ready=_stage_ready(ctx, next_stage) if next_stage else False,
+    )
+
+
+async def get_session_state(db: AsyncSession, session_id: UUID, student_id: UUID) -> SessionState:
+    ctx = await _load_context(db, session_id)
+    if ctx is None or ctx.student_id != student_id:
+        raise HTTPException(status_code=404, detail="Сессия не найдена")
+    return _state(ctx)
+
+
+async def advance(db: AsyncSession, session_id: UUID, student_id: UUID) -> SessionState:
+    ctx = await _load_context(db, session_id)
+    if ctx is None or ctx.student_id != student_id:
+        raise HTTPException(status_code=404, detail="Сессия не найдена")
+    next_stage = NEXT_STAGE.get(ctx.status)
+    if next_stage is None:
+        raise HTTPException(status_code=409, detail="Сессия уже завершена")
+    if ctx.status == SessionStatus.testing and ctx.attempt_id is None:
+        raise HTTPException(status_code=409, detail="Сначала нужно пройти тест")
+    if ctx.status == SessionStatus.retesting and not ctx.retest_submitted:
+        raise HTTPException(status_code=409, detail="Сначала нужно пройти повторный тест")
+
+    # Обычно материалы уже подготовлены в фоне - тогда ожидания нет
+    if next_stage in _PREPARERS and not _stage_ready(ctx, next_stage):
+        # Пока идет генерация, запрос не держит соединение с БД
+        await db.commit()
+        await _ensure_ready(session_id, next_stage)
+        ready_ctx = await _load_context(db, session_id)
+        if ready_ctx is None or not _stage_ready(ready_ctx, next_stage):
+            raise HTTPException(status_code=503, detail="Материалы следующего этапа еще готовятся")
+
+    values = {"status": next_stage}
+    if next_stage == SessionStatus.completed:
+        values["completed_at"] = datetime.now()
+    res = await db.execute(
+        update(LearningSession)
+        .where(LearningSession.id == session_id, LearningSession.status == ctx.status)
+        .values(**values)
+        .returning(LearningSession.id)
+    )
+    if res.first() is None:
+        raise HTTPException(status_code=409, detail="Состояние сессии изменилось, обновите страницу")
+    await db.commit()
+
+    # Новый этап начался - готовим следующий
+    prefetch(session_id, NEXT_STAGE.get(next_stage))
+
+    ctx = await _load_context(db, session_id)
+    return _state(ctx)
+
+
+async def on_exam_submitted(db: AsyncSession, session_id: UUID, student_id: UUID, exam_id: UUID):
+    # Сдан тест этапа testing (свой или назначенный группе) или повторный тест.
+    # Сессия переходит дальше сразу, только если материалы следующего этапа уже готовы;
+    # иначе они готовятся в фоне, а переход - через POST /sessions/{id}/advance.
+    # Отправка теста никогда не ждет LLM
+    ctx = await _load_context(db, session_id)
+    if ctx is None or ctx.student_id != student_id:
+        return
+    if not (
+        (ctx.status == SessionStatus.testing and exam_id == ctx.exam_id)
+        or (ctx.status == SessionStatus.retesting and exam_id == ctx.retest_exam_id)
+    ):
+        return
+
+    next_stage = NEXT_STAGE[ctx.status]
+    if not _stage_ready(ctx, next_stage):
+        prefetch(session_id, next_stage)
+        return
+    try:
+        await advance(db, session_id, student_id)
+    except HTTPException as e:
+        print(f"Session advance error: {e.detail}")
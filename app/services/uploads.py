@@ -0,0 +1,303 @@
+import asyncio
+import hashlib
+import io
+import os
+import tempfile
+from typing import Dict, Optional, Tuple
+from uuid import UUID
+
+from fastapi import HTTPException, Request
+from sqlalchemy import update
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.models import ExamAttempt
+from app.services.file_storage import FileStorage, StoredFile, get_storage
+from app.services.near_duplicates import index_attempt
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+
+# Файл пишется в хранилище по мере чтения тела запроса: в памяти воркера
+# находится только текущий чанк, независимо от размера загрузки
+MAX_FIELD_BYTES = 64 * 1024
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+ALLOWED_EXTENSIONS = {
+    ".jpg", ".jpeg", ".png", ".webp", ".heic",
+    ".pdf", ".txt", ".doc", ".docx", ".odt",
+}
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".heic"}
+
+THUMBNAIL_SIZE = (320, 320)
+MAX_EXTRACTED_CHARS = 20000
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"Файл слишком большой (максимум {max_bytes // (1024 * 1024)} МБ)"
+    )
+
+
+def _part_disposition(headers: Dict[bytes, bytes]) -> Tuple[Optional[str], Optional[str]]:
+    _, params = parse_options_header(headers.get(b"content-disposition", b""))
+    name = params.get(b"name")
+    filename = params.get(b"filename")
+    return (
+        name.decode("utf-8", "replace") if name is not None else None,
+        filename.decode("utf-8", "replace") if filename is not None else None,
+    )
+
+
+class _UploadState:
+    def __init__(self, storage: FileStorage, file_field: str, max_bytes: int):
+        self.storage = storage
+        self.file_field = file_field
+        self.max_bytes = max_bytes
+        self.fields: Dict[str, str] = {}
+        self.stored: Optional[StoredFile] = None
+
+        self._handle = None
+        self._hasher = None
+        self._size = 0
+        self._extension = ""
+        self._content_type: Optional[str] = None
+        self._field_name: Optional[str] = None
+        self._field_buf = bytearray()
+
+    async def on_headers(self, headers: Dict[bytes, bytes]):
+        name, filename = _part_disposition(headers)
+        if filename is not None and name == self.file_field and self.stored is None and self._handle is None:
+            extension = os.path.splitext(filename)[1].lower()
+            if extension not in ALLOWED_EXTENSIONS:
+                raise HTTPException(status_code=415, detail="Неподдерживаемый тип файла")
+            self._extension = extension
+            ctype = headers.get(b"content-type")
+            self._content_type = ctype.decode("latin-1") if ctype else None
+            self._hasher = hashlib.sha256()
+            self._size = 0
+            self._handle = await self.storage.begin()
+        else:
+            self._field_name = name if filename is None else None
+            self._field_buf.clear()
+
+    async def on_data(self, data: bytes):
+        if self._handle is not None:
+            self._size += len(data)
+            if self._size > self.max_bytes:
+                raise _too_large(self.max_bytes)
+            # Хеш считается на лету, повторно файл не читается
+            self._hasher.update(data)
+            await self.storage.write(self._handle, data)
+        elif self._field_name is not None:
+            if len(self._field_buf) + len(data) > MAX_FIELD_BYTES:
+                raise HTTPException(status_code=413, detail="Слишком большое поле формы")
+            self._field_buf += data
+
+    async def on_part_end(self):
+        if self._handle is not None:
+            sha256 = self._hasher.hexdigest()
+            key = await self.storage.commit(self._handle, sha256, self._extension)
+            self._handle = None
+            self.stored = StoredFile(
+                key=key,
+                size=self._size,
+                sha256=sha256,
+                content_type=self._content_type,
+            )
+        elif self._field_name is not None:
+            self.fields[self._field_name] = self._field_buf.decode("utf-8", "replace")
+            self._field_name = None
+
+    async def cleanup(self):
+        if self._handle is not None:
+            await self.storage.abort(self._handle)
+            self._handle = None
+
+
+async def receive_upload(
+    request: Request,
+    file_field: str = "file",
+    max_bytes: Optional[int] = None,
+    storage: Optional[FileStorage] = None,
+) -> Tuple[StoredFile, Dict[str, str]]:
+    """Потоково разбирает multipart/form-data и сохраняет файл из поля file_field.
+
+    Возвращает сохраненный файл и текстовые поля формы.
+    """
+    storage = storage or get_storage()
+    max_bytes = max_bytes or settings.MAX_UPLOAD_BYTES
+
+    ctype, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if ctype != b"multipart/form-data" or not boundary:
+        raise HTTPException(status_code=400, detail="Ожидается multipart/form-data")
+
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes + FORM_OVERHEAD_BYTES:
+        # Заведомо слишком большой запрос отклоняем, не читая тело
+        raise _too_large(max_bytes)
+
+    # Колбэки парсера синхронные: собираем события и обрабатываем их асинхронно после каждого чанка
+    events = []
+    header_field = bytearray()
+    header_value = bytearray()
+    headers: Dict[bytes, bytes] = {}
+
+    def on_part_begin():
+        headers.clear()
+
+    def on_header_field(data, start, end):
+        header_field.extend(data[start:end])
+
+    def on_header_value(data, start, end):
+        header_value.extend(data[start:end])
+
+    def on_header_end():
+        headers[bytes(header_field).lower()] = bytes(header_value)
+        header_field.clear()
+        header_value.clear()
+
+    def on_headers_finished():
+        events.append(("headers", dict(headers)))
+
+    def on_part_data(data, start, end):
+        events.append(("data", bytes(data[start:end])))
+
+    def on_part_end():
+        events.append(("end", None))
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+    state = _UploadState(storage, file_field, max_bytes)
+
+    async def drain():
+        for kind, payload in events:
+            if kind == "headers":
+                await state.on_headers(payload)
+            elif kind == "data":
+                await state.on_data(payload)
+            else:
+                await state.on_part_end()
+        events.clear()
+
+    try:
+        async for chunk in request.stream():
+            if chunk:
+                parser.write(chunk)
+                await drain()
+        parser.finalize()
+        await drain()
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Некорректный multipart-запрос: {e}")
+    finally:
+        await state.cleanup()
+
+    if state.stored is None:
+        raise HTTPException(status_code=400, detail=f"Файл не передан (поле {file_field})")
+    return state.stored, state.fields
+
+
+def is_image(stored: StoredFile) -> bool:
+    if stored.content_type and stored.content_type.startswith("image/"):
+        return True
+    return os.path.splitext(stored.key)[1] in IMAGE_EXTENSIONS
+
+
+def attempt_file_url(attempt_id: UUID, thumbnail: bool = False) -> str:
+    # Файлы раздаются только через эндпоинт с проверкой доступа
+    url = f"/exams/attempts/{attempt_id}/file"
+    return f"{url}?thumbnail=true" if thumbnail else url
+
+
+def thumbnail_key(key: str) -> str:
+    return f"{key}.thumb.jpg"
+
+
+def _make_thumbnail(path: str) -> Optional[bytes]:
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    with Image.open(path) as img:
+        img.thumbnail(THUMBNAIL_SIZE)
+        out = io.BytesIO()
+        img.convert("RGB").save(out, "JPEG", quality=80)
+    return out.getvalue()
+
+
+def _extract_text(path: str) -> Optional[str]:
+    extension = os.path.splitext(path)[1]
+    if extension == ".txt":
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return f.read(MAX_EXTRACTED_CHARS)
+    if extension == ".pdf":
+        try:
+            from pypdf import PdfReader
+        except ImportError:
+            return None
+        parts, length = [], 0
+        for page in PdfReader(path).pages:
+            text = page.extract_text() or ""
+            parts.append(text)
+            length += len(text)
+            if length >= MAX_EXTRACTED_CHARS:
+                break
+        return "\n".join(parts)[:MAX_EXTRACTED_CHARS]
+    return None
+
+
+async def _download(storage: FileStorage, key: str) -> str:
+    # Файл из объектного хранилища - во временный файл для Pillow / pypdf
+    fd, path = tempfile.mkstemp(suffix=os.path.splitext(key)[1])
+    with os.fdopen(fd, "wb") as f:
+        async for chunk in storage.read(key):
+            await asyncio.to_thread(f.write, chunk)
+    return path
+
+
+async def process_upload(attempt_id: UUID, key: str, image: bool):
+    """Фоновая обработка после ответа клиенту: миниатюра для фото, текст для документов."""
+    storage = get_storage()
+    values = {}
+    temp_path = None
+    try:
+        path = storage.local_path(key)
+        if path is None:
+            path = temp_path = await _download(storage, key)
+        if image:
+            thumbnail = await asyncio.to_thread(_make_thumbnail, path)
+            if thumbnail:
+                await storage.save(thumbnail_key(key), thumbnail)
+                values["thumbnail_url"] = attempt_file_url(attempt_id, thumbnail=True)
+        else:
+            text = await asyncio.to_thread(_extract_text, path)
+            if text:
+                values["extracted_text"] = text
+    except Exception as e:
+        print(f"Upload processing error: {e}")
+        return
+    finally:
+        if temp_path is not None:
+            os.remove(temp_path)
+
+    if values:
+        async with AsyncSessionLocal() as db:
+            await db.execute(update(ExamAttempt).where(ExamAttempt.id == attempt_id).values(**values))
+            await db.commit()
+    if "extracted_text" in values:
+        # Текст документа попадает в индекс поиска списанных ответов
+        await index_attempt(attempt_id)
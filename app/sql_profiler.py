@@ -0,0 +1,138 @@
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Tuple
+
+from sqlalchemy import event
+
+from app.config import settings
+
+
+# Профилирование SQL по запросам: события движка пишут каждый оператор во все активные
+# профили текущего контекста (HTTP-запрос, метрики, assert_max_queries в тестах).
+# Повторяющиеся операторы одной формы - признак N+1
+N_PLUS_ONE_THRESHOLD = 5
+
+_active_profiles: ContextVar[Tuple["QueryProfile", ...]] = ContextVar("active_query_profiles", default=())
+
+_CAST_RE = re.compile(r"::\w+(?:\[\])?")
+_PARAM_RE = re.compile(r"\$\d+|%\(\w+\)s|\?")
+_PARAM_LIST_RE = re.compile(r"\?(?:\s*,\s*\?)+")
+_NUMBER_RE = re.compile(r"\b\d+\b")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    # Форма оператора без значений параметров: IN (...) с любым числом элементов - одна форма
+    shape = _PARAM_RE.sub("?", _CAST_RE.sub("", statement))
+    shape = _NUMBER_RE.sub("?", shape)
+    shape = _PARAM_LIST_RE.sub("?", shape)
+    return _SPACE_RE.sub(" ", shape).strip()
+
+
+class QueryProfile:
+    __slots__ = ("count", "duration", "shapes", "track_shapes")
+
+    def __init__(self, track_shapes: bool = True):
+        self.count = 0
+        self.duration = 0.0
+        self.track_shapes = track_shapes
+        self.shapes: Counter = Counter()
+
+    def record(self, statement: str, elapsed: float):
+        self.count += 1
+        self.duration += elapsed
+        if self.track_shapes:
+            self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold: int = N_PLUS_ONE_THRESHOLD):
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+    def report(self) -> str:
+        lines = [f"{self.count} statements, {self.duration * 1000:.1f} ms"]
+        lines.extend(f"  {n}x {shape}" for shape, n in self.shapes.most_common())
+        return "\n".join(lines)
+
+
+@contextmanager
+def profile_queries(track_shapes: bool = True):
+    profile = QueryProfile(track_shapes)
+    token = _active_profiles.set(_active_profiles.get() + (profile,))
+    try:
+        yield profile
+    finally:
+        _active_profiles.reset(token)
+
+
+@contextmanager
+def assert_max_queries(max_count: int):
+    """Тестовый помощник: падает, если внутри блока выполнено больше max_count SQL-операторов.
+
+    Приложение должно выполняться в том же контексте, например через
+    httpx.AsyncClient(transport=httpx.ASGITransport(app=app)):
+
+        with assert_max_queries(4):
+            await client.get("/courses")
+    """
+    with profile_queries() as profile:
+        yield profile
+    if profile.count > max_count:
+        raise AssertionError(f"Ожидалось не больше {max_count} SQL-запросов, выполнено:\n{profile.report()}")
+
+
+def instrument_engine(engine):
+    sync_engine = engine.sync_engine
+
+    # Время начала хранится в контексте выполнения оператора, а не в соединении:
+    # при ошибке after_cursor_execute не вызывается, и в пуле не остается висящих записей
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None and _active_profiles.get():
+            context._query_start = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        profiles = _active_profiles.get()
+        start = getattr(context, "_query_start", None)
+        if not profiles or start is None:
+            return
+        elapsed = time.perf_counter() - start
+        for profile in profiles:
+            profile.record(statement, elapsed)
+
+
+def _server_timing(profile: QueryProfile) -> bytes:
+    # Клиенту - только число и время запросов; текст операторов (формы N+1) - только в лог
+    return f'db;dur={profile.duration * 1000:.1f};desc="{profile.count} queries"'.encode("latin-1")
+
+
+class SqlProfilerMiddleware:
+    """Server-Timing с числом и временем SQL-запросов и предупреждения о N+1 (SQL_PROFILER=true)."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with profile_queries() as profile:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [(b"server-timing", _server_timing(profile))]
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+
+        for shape, n in profile.repeated():
+            print(f"Possible N+1 in {scope['method']} {scope['path']}: {n}x {shape[:200]}")
+
+
+def install_sql_profiler(app, engine):
+    instrument_engine(engine)
+    if settings.SQL_PROFILER:
+        app.add_middleware(SqlProfilerMiddleware)
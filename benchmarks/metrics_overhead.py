@@ -0,0 +1,71 @@
+"""Накладные расходы MetricsMiddleware на запрос: in-process ASGI-цикл с метриками и без.
+
+Запуск из корня проекта (нужен prometheus_client):
+
+    python -m benchmarks.metrics_overhead --requests 20000
+
+Сеть, роутинг FastAPI и БД не участвуют - замеряется только то, что добавляет middleware
+(счетчики, гистограммы, контекст профиля SQL).
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.metrics import METRICS_ENABLED, MetricsMiddleware
+
+WARMUP_REQUESTS = 1000
+
+
+class _Route:
+    # Шаблон маршрута, который в приложении проставляет роутер Starlette
+    path = "/bench/{item_id}"
+
+
+async def _endpoint(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": [(b"content-type", b"application/json")]})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def _receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def _send(message):
+    pass
+
+
+async def _per_request_seconds(app, requests: int) -> float:
+    scope = {"type": "http", "method": "GET", "path": "/bench/1", "headers": [], "route": _Route()}
+    for _ in range(WARMUP_REQUESTS):
+        await app(dict(scope), _receive, _send)
+    start = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), _receive, _send)
+    return (time.perf_counter() - start) / requests
+
+
+async def main(requests: int, rounds: int):
+    if not METRICS_ENABLED:
+        raise SystemExit("Метрики выключены: нужен prometheus_client и METRICS_ENABLED=true")
+
+    instrumented = MetricsMiddleware(_endpoint)
+    base, metrics = [], []
+    # Чередуем варианты, чтобы дрейф частоты процессора не ложился на один из них
+    for _ in range(rounds):
+        base.append(await _per_request_seconds(_endpoint, requests))
+        metrics.append(await _per_request_seconds(instrumented, requests))
+
+    base_us = statistics.median(base) * 1e6
+    metrics_us = statistics.median(metrics) * 1e6
+    print(f"без метрик:  {base_us:8.2f} мкс/запрос")
+    print(f"с метриками: {metrics_us:8.2f} мкс/запрос")
+    print(f"накладные расходы: {metrics_us - base_us:8.2f} мкс/запрос")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.rounds))
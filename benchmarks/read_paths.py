@@ -0,0 +1,231 @@
+"""Латентность и пик памяти чтения: Core-проекции (app/services/read_layer.py) против ORM-сущностей.
+
+Нужна база из DATABASE_URL с примененными миграциями. Данные создаются под отдельное
+учреждение и удаляются после замера. Запуск из корня проекта:
+
+    python -m benchmarks.read_paths --courses 500 --lessons 300
+
+Сценарии:
+  - карточка курса: раньше select(Course) + selectinload(Course.lessons) и все записи
+    lesson_progress студента по всем курсам; теперь course_header_row + course_lesson_rows
+    (в режиме outline и с текстом уроков);
+  - список курсов: ORM-сущности Course против course_list_rows;
+  - прогресс по темам: ORM-сущности StudentTopicMastery против topic_mastery_rows.
+Латентность - медиана по --rounds прогонам, каждый в новой сессии (как отдельный запрос);
+пик памяти - отдельный прогон под tracemalloc, чтобы трассировка не искажала время.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+
+from sqlalchemy import delete, func, insert, select, text
+from sqlalchemy.orm import selectinload
+
+from app.database import AsyncSessionLocal, engine
+from app.models.models import (
+    Course, CourseEnrollment, Institution, Lesson, LessonProgress, StudentTopicMastery, Subject, Topic, User,
+    UserRole,
+)
+from app.services.read_layer import course_header_row, course_lesson_rows, course_list_rows, topic_mastery_rows
+
+LESSON_CONTENT = "Текст урока с формулами и примерами. " * 100
+LESSONS_PER_OTHER_COURSE = 5
+
+
+# Прежний путь через ORM (до read_layer)
+
+async def orm_course_detail(db, course_id, student_id, with_content: bool):
+    loader = selectinload(Course.lessons)
+    if with_content:
+        loader = loader.undefer(Lesson.content)
+    res = await db.execute(select(Course).where(Course.id == course_id).options(loader))
+    course = res.scalars().first()
+    progress_res = await db.execute(select(LessonProgress).where(LessonProgress.student_id == student_id))
+    progress_map = {p.lesson_id: p for p in progress_res.scalars().all()}
+    return [
+        (lesson, progress_map.get(lesson.id))
+        for lesson in sorted(course.lessons, key=lambda l: l.order_num)
+        if lesson.is_published
+    ]
+
+
+async def orm_course_list(db, institution_id, student_id):
+    lessons_count = select(func.count(Lesson.id)).where(Lesson.course_id == Course.id).scalar_subquery()
+    enrolled = (
+        select(CourseEnrollment.course_id)
+        .where(CourseEnrollment.course_id == Course.id, CourseEnrollment.student_id == student_id)
+        .exists()
+    )
+    res = await db.execute(
+        select(Course, lessons_count, enrolled)
+        .where(Course.institution_id == institution_id, Course.is_active == True)
+        .order_by(Course.id)
+    )
+    return res.all()
+
+
+async def orm_topic_mastery(db, student_id):
+    res = await db.execute(select(StudentTopicMastery).where(StudentTopicMastery.student_id == student_id))
+    return {m.topic_id: m for m in res.scalars()}
+
+
+# Новый путь
+
+async def core_course_detail(db, course_id, student_id, with_content: bool):
+    header = await course_header_row(db, course_id)
+    return header, await course_lesson_rows(db, course_id, student_id, with_content, published_only=True)
+
+
+async def _seed(n_courses: int, n_lessons: int, n_topics: int):
+    suffix = uuid.uuid4().hex[:8]
+    now = datetime.now()
+    ids = {
+        "institution": uuid.uuid4(),
+        "student": uuid.uuid4(),
+        "subject": uuid.uuid4(),
+        "courses": [uuid.uuid4() for _ in range(n_courses)],
+        "topics": [uuid.uuid4() for _ in range(n_topics)],
+    }
+    lessons = []
+    for c, course_id in enumerate(ids["courses"]):
+        for i in range(n_lessons if c == 0 else LESSONS_PER_OTHER_COURSE):
+            lessons.append({
+                "id": uuid.uuid4(),
+                "course_id": course_id,
+                "title": f"Урок {i}",
+                "description": "Краткое описание урока",
+                "content": LESSON_CONTENT,
+                "video_url": f"https://video.example.com/{i}",
+                "duration_minutes": 45,
+                "order_num": i,
+                "is_published": True,
+            })
+
+    async with AsyncSessionLocal() as db:
+        await db.execute(insert(Institution), [{
+            "id": ids["institution"], "name": f"bench-{suffix}", "short_code": f"bench-{suffix}",
+        }])
+        await db.execute(insert(User), [{
+            "id": ids["student"], "email": f"bench-{suffix}@example.com", "password_hash": "-",
+            "role": UserRole.student, "full_name": "Benchmark", "institution_id": ids["institution"],
+        }])
+        await db.execute(insert(Subject), [{"id": ids["subject"], "name": f"bench-{suffix}"}])
+        await db.execute(insert(Topic), [
+            {"id": topic_id, "subject_id": ids["subject"], "title": f"Тема {i}", "order_num": i}
+            for i, topic_id in enumerate(ids["topics"])
+        ])
+        await db.execute(insert(Course), [
+            {"id": course_id, "title": f"Курс {i}", "description": "Описание курса",
+             "institution_id": ids["institution"], "is_active": True}
+            for i, course_id in enumerate(ids["courses"])
+        ])
+        await db.execute(insert(Lesson), lessons)
+        # Прогресс студента по всем курсам - прежний путь читал его целиком
+        await db.execute(insert(LessonProgress), [
+            {"lesson_id": lesson["id"], "student_id": ids["student"], "status": "in_progress",
+             "progress_percent": 50.0, "last_accessed_at": now}
+            for lesson in lessons
+        ])
+        await db.execute(insert(CourseEnrollment), [
+            {"course_id": course_id, "student_id": ids["student"]} for course_id in ids["courses"][::2]
+        ])
+        await db.execute(insert(StudentTopicMastery), [
+            {"student_id": ids["student"], "topic_id": topic_id, "mastery_level": 50.0, "attempts_count": 3}
+            for topic_id in ids["topics"]
+        ])
+        await db.commit()
+    return ids
+
+
+async def _cleanup(ids):
+    course_lessons = select(Lesson.id).where(Lesson.course_id.in_(ids["courses"]))
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(LessonProgress).where(LessonProgress.lesson_id.in_(course_lessons)))
+        await db.execute(delete(CourseEnrollment).where(CourseEnrollment.student_id == ids["student"]))
+        await db.execute(delete(StudentTopicMastery).where(StudentTopicMastery.student_id == ids["student"]))
+        await db.execute(delete(Lesson).where(Lesson.course_id.in_(ids["courses"])))
+        await db.execute(delete(Course).where(Course.id.in_(ids["courses"])))
+        await db.execute(delete(Topic).where(Topic.subject_id == ids["subject"]))
+        await db.execute(delete(Subject).where(Subject.id == ids["subject"]))
+        await db.execute(delete(User).where(User.id == ids["student"]))
+        await db.execute(delete(Institution).where(Institution.id == ids["institution"]))
+        await db.commit()
+
+
+async def _latency_ms(read, rounds: int) -> float:
+    samples = []
+    for _ in range(rounds):
+        async with AsyncSessionLocal() as db:
+            start = time.perf_counter()
+            await read(db)
+            samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+async def _peak_kb(read) -> float:
+    async with AsyncSessionLocal() as db:
+        tracemalloc.start()
+        try:
+            result = await read(db)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        del result
+    return peak / 1024
+
+
+async def main(n_courses: int, n_lessons: int, n_topics: int, rounds: int):
+    try:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    except Exception as e:
+        raise SystemExit(f"База данных недоступна: {e}")
+
+    ids = await _seed(n_courses, n_lessons, n_topics)
+    course_id, student_id, institution_id = ids["courses"][0], ids["student"], ids["institution"]
+    scenarios = [
+        (
+            f"карточка курса, outline ({n_lessons} уроков)",
+            lambda db: orm_course_detail(db, course_id, student_id, with_content=False),
+            lambda db: core_course_detail(db, course_id, student_id, with_content=False),
+        ),
+        (
+            f"карточка курса с текстом ({n_lessons} уроков)",
+            lambda db: orm_course_detail(db, course_id, student_id, with_content=True),
+            lambda db: core_course_detail(db, course_id, student_id, with_content=True),
+        ),
+        (
+            f"список курсов ({n_courses})",
+            lambda db: orm_course_list(db, institution_id, student_id),
+            lambda db: course_list_rows(db, institution_id, student_id),
+        ),
+        (
+            f"прогресс по темам ({n_topics})",
+            lambda db: orm_topic_mastery(db, student_id),
+            lambda db: topic_mastery_rows(db, student_id),
+        ),
+    ]
+    try:
+        print(f"{'сценарий':<40} {'путь':<6} {'мс (медиана)':>13} {'пик памяти, КБ':>15}")
+        for label, orm_read, core_read in scenarios:
+            for path, read in (("ORM", orm_read), ("Core", core_read)):
+                latency = await _latency_ms(read, rounds)
+                peak = await _peak_kb(read)
+                print(f"{label:<40} {path:<6} {latency:13.2f} {peak:15.0f}")
+    finally:
+        await _cleanup(ids)
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--courses", type=int, default=500)
+    parser.add_argument("--lessons", type=int, default=300)
+    parser.add_argument("--topics", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.courses, args.lessons, args.topics, args.rounds))
@@ -0,0 +1,148 @@
+"""CPU-время на один крупный ответ: response_model + jsonable_encoder против ModelResponse.
+
+Запуск из корня проекта (база данных не нужна):
+
+    python -m benchmarks.response_serialization --items 2000
+
+Старый путь повторяет то, что делал FastAPI с возвращенными моделями: модели собираются
+с валидацией, перед ответом переводятся в dict, снова валидируются по response_model,
+проходят jsonable_encoder и кодируются json.dumps (JSONResponse). Новый путь
+(app/responses.py) - model_construct и TypeAdapter.dump_json в pydantic-core.
+"""
+import argparse
+import json
+import statistics
+import time
+import uuid
+from functools import lru_cache
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pydantic import TypeAdapter
+
+from app.responses import ModelResponse
+from app.routers.courses import CourseDetailOut, CourseOut, LessonOut, LessonProgressOut
+
+LESSON_CONTENT = "Текст урока с формулами и примерами. " * 60
+COURSE_ID = uuid.uuid4()
+
+
+def _course_rows(n: int) -> List[dict]:
+    return [
+        {
+            "id": uuid.uuid4(),
+            "title": f"Курс {i}",
+            "description": "Описание курса для списка " * 4,
+            "is_active": True,
+            "lessons_count": i % 40,
+            "enrolled": i % 3 == 0,
+        }
+        for i in range(n)
+    ]
+
+
+def _lesson_rows(n: int) -> List[dict]:
+    return [
+        {
+            "id": uuid.uuid4(),
+            "title": f"Урок {i}",
+            "description": "Краткое описание урока",
+            "duration_minutes": 45,
+            "order_num": i,
+            "is_published": True,
+            "progress": {"status": "in_progress", "progress_percent": 50.0} if i % 2 else None,
+            "video_url": f"https://video.example.com/{i}",
+            "content": LESSON_CONTENT,
+        }
+        for i in range(n)
+    ]
+
+
+@lru_cache(maxsize=None)
+def _response_field(response_type) -> TypeAdapter:
+    # FastAPI тоже строит поле response_model один раз при регистрации маршрута
+    return TypeAdapter(response_type)
+
+
+def _old_response(model, response_type, content) -> bytes:
+    # Как FastAPI до ModelResponse: валидация при сборке, model_dump, валидация по response_model,
+    # jsonable_encoder, json.dumps
+    built = model(content)
+    dumped = [m.model_dump() for m in built] if isinstance(built, list) else built.model_dump()
+    validated = _response_field(response_type).validate_python(dumped)
+    return JSONResponse(jsonable_encoder(validated)).body
+
+
+def _build_courses(rows, construct: bool):
+    make = CourseOut.model_construct if construct else CourseOut
+    return [make(**row) for row in rows]
+
+
+def _build_detail(lessons, construct: bool):
+    if construct:
+        items = [
+            LessonOut.model_construct(
+                **{**row, "progress": LessonProgressOut.model_construct(**row["progress"]) if row["progress"] else None}
+            )
+            for row in lessons
+        ]
+        return CourseDetailOut.model_construct(
+            id=COURSE_ID, title="Курс", description=None, is_active=True, enrolled=True, lessons=items
+        )
+    return CourseDetailOut(
+        id=COURSE_ID, title="Курс", description=None, is_active=True, enrolled=True,
+        lessons=[LessonOut(**row) for row in lessons],
+    )
+
+
+def _cpu_per_call(fn, repeat: int, rounds: int) -> float:
+    fn()
+    samples = []
+    for _ in range(rounds):
+        start = time.process_time()
+        for _ in range(repeat):
+            fn()
+        samples.append((time.process_time() - start) / repeat)
+    return statistics.median(samples)
+
+
+def _compare(label: str, old, new, repeat: int, rounds: int):
+    # Оба пути должны давать один и тот же JSON
+    if json.loads(old()) != json.loads(new()):
+        raise SystemExit(f"{label}: ответы старого и нового пути различаются")
+    old_ms = _cpu_per_call(old, repeat, rounds) * 1000
+    new_ms = _cpu_per_call(new, repeat, rounds) * 1000
+    print(f"{label}")
+    print(f"  response_model + jsonable_encoder:           {old_ms:8.2f} мс CPU/ответ")
+    print(f"  ModelResponse (model_construct + dump_json): {new_ms:8.2f} мс CPU/ответ")
+    print(f"  ускорение: x{old_ms / new_ms:.1f}, размер ответа {len(new()) / 1024:.0f} КБ")
+
+
+def main(items: int, repeat: int, rounds: int):
+    courses = _course_rows(items)
+    lessons = _lesson_rows(max(items // 10, 1))
+
+    _compare(
+        f"GET /courses, {len(courses)} курсов",
+        lambda: _old_response(lambda rows: _build_courses(rows, construct=False), List[CourseOut], courses),
+        lambda: ModelResponse(_build_courses(courses, construct=True), List[CourseOut]).body,
+        repeat,
+        rounds,
+    )
+    _compare(
+        f"GET /courses/{{id}}, {len(lessons)} уроков с текстом",
+        lambda: _old_response(lambda rows: _build_detail(rows, construct=False), CourseDetailOut, lessons),
+        lambda: ModelResponse(_build_detail(lessons, construct=True), CourseDetailOut).body,
+        repeat,
+        rounds,
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    main(args.items, args.repeat, args.rounds)
@@ -410,6 +410,7 @@ async def seed():
                         is_published=True,
                     )
                     db.add(lesson)
+                course.lessons_count = len(course_data["lessons"])
                 print(f"     └─ {len(course_data['lessons'])} уроков добавлено")
             else:
                 print(f"  ✅ Курс уже есть: {course.title}")
@@ -0,0 +1,66 @@
+"""Проверка ответов по компактному ключу (app/services/grading.py)."""
+from types import SimpleNamespace
+
+from app.services.grading import (
+    OPEN_TEXT, UNKNOWN_OPTION, build_answer_key, grade_answers, grade_with_key, resolve_selected,
+)
+
+
+QUESTIONS = [
+    {"question": "2 + 2?", "options": ["3", "4", "5"], "correct_answer": "4"},
+    {"question": "Столица Франции?", "options": ["Рим", "Париж"], "correct_answer": "Париж"},
+    {"question": "Что такое фотосинтез?", "reference_answer": "Образование органических веществ на свету"},
+    {"question": "Битый вопрос", "options": ["a", "b"], "correct_answer": "c"},
+]
+
+
+def test_build_answer_key():
+    assert build_answer_key(QUESTIONS) == [1, 1, OPEN_TEXT, UNKNOWN_OPTION]
+
+
+def test_resolve_selected_first_answer_wins():
+    answers = [
+        {"question_index": 0, "selected_index": 2},
+        {"question_index": 0, "selected_index": 1},
+        SimpleNamespace(question_index=1, selected_index=0, selected_option=None),
+    ]
+    assert resolve_selected(answers) == {0: 2, 1: 0}
+
+
+def test_resolve_selected_maps_option_text_only_with_questions():
+    answers = [
+        {"question_index": 1, "selected_option": "Париж"},
+        {"question_index": 0, "selected_option": "42"},
+    ]
+    assert resolve_selected(answers) == {1: None, 0: None}
+    assert resolve_selected(answers, QUESTIONS) == {1: 1, 0: UNKNOWN_OPTION}
+
+
+def test_grade_with_key_counts_and_errors():
+    key = [1, 1, UNKNOWN_OPTION]
+    correct, errors = grade_with_key(key, {0: 1, 1: 0, 2: UNKNOWN_OPTION})
+    assert correct == 1
+    assert [(e["question_index"], e["error_type"]) for e in errors] == [(1, "wrong_answer"), (2, "wrong_answer")]
+
+    correct, errors = grade_with_key(key, {})
+    assert correct == 0
+    assert {e["error_type"] for e in errors} == {"no_answer"}
+
+
+def test_grade_with_key_open_questions():
+    key = [1, OPEN_TEXT, OPEN_TEXT]
+    # Без результатов проверки открытые вопросы пропускаются
+    assert grade_with_key(key, {0: 1}) == (1, [])
+
+    correct, errors = grade_with_key(key, {0: 1}, {1: True})
+    assert correct == 2
+    assert errors == [{"question_index": 2, "question": None, "error_type": "no_answer"}]
+
+    correct, errors = grade_with_key(key, {0: 1}, {1: True, 2: False})
+    assert errors[0]["error_type"] == "wrong_answer"
+
+
+def test_grade_answers_fills_question_text():
+    correct, errors = grade_answers(QUESTIONS[:2], [{"question_index": 0, "selected_option": "4"}])
+    assert correct == 1
+    assert errors == [{"question_index": 1, "question": "Столица Франции?", "error_type": "no_answer"}]
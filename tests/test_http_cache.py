@@ -0,0 +1,85 @@
+"""Условные GET-запросы: ETag / If-None-Match и Last-Modified / If-Modified-Since (app/http_cache.py)."""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException, Response
+from starlette.requests import Request
+
+from app.http_cache import ConditionalRequest, etag_matches, latest, weak_etag
+
+
+MODIFIED = datetime(2026, 10, 19, 12, 30, 15, 250000)
+
+
+def _conditional(**headers) -> ConditionalRequest:
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()],
+    }
+    return ConditionalRequest(Request(scope), Response())
+
+
+def test_weak_etag_is_stable_and_weak():
+    etag = weak_etag("user", 3, MODIFIED)
+    assert etag.startswith('W/"') and etag.endswith('"')
+    assert etag == weak_etag("user", 3, MODIFIED)
+    assert etag != weak_etag("user", 4, MODIFIED)
+
+
+def test_etag_matches_uses_weak_comparison():
+    assert etag_matches('W/"abc"', 'W/"abc"')
+    assert etag_matches('"abc"', 'W/"abc"')
+    assert etag_matches('"x", W/"abc"', '"abc"')
+    assert etag_matches("*", 'W/"abc"')
+    assert not etag_matches('W/"abd"', 'W/"abc"')
+    assert not etag_matches(None, 'W/"abc"')
+    assert not etag_matches("", 'W/"abc"')
+
+
+def test_check_sets_validators_when_modified():
+    cache = _conditional()
+    cache.check('W/"v1"', last_modified=MODIFIED)
+    assert cache.response.headers["etag"] == 'W/"v1"'
+    assert cache.response.headers["last-modified"] == "Mon, 19 Oct 2026 12:30:15 GMT"
+    assert cache.headers["Cache-Control"] == "private, no-cache"
+
+
+def test_check_returns_304_for_matching_etag():
+    cache = _conditional(if_none_match='W/"v1"')
+    with pytest.raises(HTTPException) as exc:
+        cache.check('W/"v1"')
+    assert exc.value.status_code == 304
+    assert exc.value.headers["ETag"] == 'W/"v1"'
+
+
+def test_if_none_match_takes_precedence_over_if_modified_since():
+    cache = _conditional(if_none_match='W/"old"', if_modified_since="Mon, 19 Oct 2026 13:00:00 GMT")
+    cache.check('W/"v2"', last_modified=MODIFIED)
+
+
+@pytest.mark.parametrize("since, not_modified", [
+    ("Mon, 19 Oct 2026 12:30:15 GMT", True), # метка с точностью до секунды
+    ("Mon, 19 Oct 2026 12:31:00 GMT", True),
+    ("Mon, 19 Oct 2026 12:30:14 GMT", False),
+    ("не дата", False),
+])
+def test_if_modified_since(since, not_modified):
+    cache = _conditional(if_modified_since=since)
+    if not_modified:
+        with pytest.raises(HTTPException):
+            cache.check('W/"v1"', last_modified=MODIFIED)
+    else:
+        cache.check('W/"v1"', last_modified=MODIFIED)
+
+
+def test_if_modified_since_without_last_modified_is_ignored():
+    _conditional(if_modified_since="Mon, 19 Oct 2026 12:31:00 GMT").check('W/"v1"')
+
+
+def test_latest_picks_newest_timestamp():
+    aware = datetime(2026, 10, 20, tzinfo=timezone.utc)
+    assert latest(MODIFIED, None, MODIFIED + timedelta(hours=1)) == MODIFIED + timedelta(hours=1)
+    assert latest(aware, None) == aware
+    assert latest(None, None) is None
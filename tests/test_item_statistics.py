@@ -0,0 +1,105 @@
+"""PROX-калибровка и точечно-бисериальная дискриминация вопросов (app/services/item_statistics.py).
+
+Попытки подаются из памяти вместо серверного курсора; ответы с selected_index, поэтому
+тексты вопросов не запрашиваются и база не нужна.
+"""
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.services.item_statistics import PROX_PASSES, _accumulate, _item_statistics
+
+
+TRUE_DIFFICULTY = np.array([-1.5, -0.5, 0.0, 0.5, 1.5])
+QUESTION_IDS = [f"q{i}" for i in range(len(TRUE_DIFFICULTY))]
+
+
+class _Stream:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def partitions(self, size):
+        for start in range(0, len(self.rows), size):
+            yield self.rows[start:start + size]
+
+
+class _ReadSession:
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def stream(self, query):
+        return _Stream(self.rows)
+
+
+def _simulate(n_students=2000, seed=3):
+    rng = np.random.default_rng(seed)
+    theta = rng.normal(0.0, 1.0, n_students)
+    p = 1 / (1 + np.exp(-(theta[:, None] - TRUE_DIFFICULTY[None, :])))
+    x = (rng.random(p.shape) < p).astype(int)
+    rows = [
+        SimpleNamespace(
+            question_ids=QUESTION_IDS,
+            answer_key=[0] * len(QUESTION_IDS),
+            # Верный вариант - 0, неверный - 1
+            answers=[{"question_index": q, "selected_index": 0 if x[s, q] else 1} for q in range(len(QUESTION_IDS))],
+        )
+        for s in range(n_students)
+    ]
+    return rows, x
+
+
+def _calibrate(rows, chunk_size=300):
+    async def run():
+        difficulty, index = None, None
+        for _ in range(PROX_PASSES):
+            acc = await _accumulate(_ReadSession(rows), None, chunk_size, difficulty, index)
+            index = acc.index
+            n, p_value, discrimination, difficulty = _item_statistics(acc)
+            difficulty = difficulty - np.average(difficulty, weights=n)
+        return index, n, p_value, discrimination, difficulty
+    return asyncio.run(run())
+
+
+def test_p_value_and_point_biserial_match_direct_computation():
+    rows, x = _simulate()
+    index, n, p_value, discrimination, _ = _calibrate(rows)
+    order = [index[qid] for qid in QUESTION_IDS]
+
+    assert np.array_equal(n[order], np.full(len(QUESTION_IDS), len(rows)))
+    assert p_value[order] == pytest.approx(x.mean(axis=0))
+
+    rest = (x.sum(axis=1, keepdims=True) - x) / (x.shape[1] - 1)
+    expected = [np.corrcoef(x[:, q], rest[:, q])[0, 1] for q in range(x.shape[1])]
+    assert discrimination[order] == pytest.approx(expected, abs=1e-9)
+
+
+def test_prox_recovers_difficulty_order_and_scale():
+    rows, _ = _simulate()
+    index, _, _, _, difficulty = _calibrate(rows)
+    estimated = difficulty[[index[qid] for qid in QUESTION_IDS]]
+
+    assert np.all(np.diff(estimated) > 0)
+    assert estimated == pytest.approx(TRUE_DIFFICULTY - TRUE_DIFFICULTY.mean(), abs=0.35)
+
+
+def test_chunking_does_not_change_statistics():
+    rows, _ = _simulate(n_students=500)
+    whole = _calibrate(rows, chunk_size=len(rows))
+    chunked = _calibrate(rows, chunk_size=37)
+    for a, b in zip(whole[1:], chunked[1:]):
+        assert a == pytest.approx(b)
+
+
+def test_unscorable_questions_are_skipped():
+    row = SimpleNamespace(
+        question_ids=["open", "scored"],
+        answer_key=[-2, 1],
+        answers=[{"question_index": 1, "selected_index": 1}],
+    )
+    index, n, p_value, discrimination, _ = _calibrate([row])
+    assert list(index) == ["scored"]
+    assert p_value[index["scored"]] == 1.0
+    # Без остальных вопросов в попытке дискриминацию не посчитать
+    assert np.isnan(discrimination[index["scored"]])
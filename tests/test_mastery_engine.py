@@ -0,0 +1,46 @@
+"""BKT: пакетный пересчет должен совпадать с онлайн-обновлениями (app/services/mastery_engine.py)."""
+import numpy as np
+import pytest
+
+from app.services.mastery_engine import P_INIT, _estimate_segments, bkt_update, estimate_mastery
+
+
+def _online(history):
+    level, confidence, attempts = None, None, 0
+    for correct, total in history:
+        level, confidence = estimate_mastery(level, confidence, attempts, correct, total)
+        attempts += 1
+    return level, confidence, attempts
+
+
+def test_batch_matches_online_updates():
+    rng = np.random.default_rng(7)
+    histories = []
+    for _ in range(30):
+        n_attempts = rng.integers(1, 8)
+        totals = rng.integers(3, 12, n_attempts)
+        histories.append([(int(rng.integers(0, t + 1)), int(t)) for t in totals])
+
+    # Строки упорядочены по (студент, тема, время), как в recompute_all
+    segment = np.repeat(np.arange(len(histories)), [len(h) for h in histories])
+    correct = np.array([c for h in histories for c, _ in h], dtype=np.float64)
+    total = np.array([t for h in histories for _, t in h], dtype=np.float64)
+
+    level, confidence, attempts = _estimate_segments(segment, correct, total, len(histories))
+
+    for i, history in enumerate(histories):
+        online_level, online_confidence, online_attempts = _online(history)
+        assert level[i] == pytest.approx(online_level, rel=1e-9)
+        assert confidence[i] == pytest.approx(online_confidence, rel=1e-6)
+        assert attempts[i] == online_attempts
+
+
+def test_first_attempt_starts_from_prior():
+    level, _ = estimate_mastery(None, None, 0, correct=5, total=10)
+    assert level == pytest.approx(float(bkt_update(P_INIT, 5, 10)) * 100)
+
+
+def test_more_correct_answers_raise_mastery():
+    low, _ = estimate_mastery(50.0, 0.5, 3, correct=2, total=10)
+    high, _ = estimate_mastery(50.0, 0.5, 3, correct=9, total=10)
+    assert low < 50.0 < high
@@ -0,0 +1,64 @@
+"""MinHash-сигнатуры и LSH-бакеты для поиска списанных ответов (app/services/near_duplicates.py)."""
+import numpy as np
+
+from app.services.near_duplicates import (
+    BANDS, NUM_PERM, SHINGLE_SIZE, attempt_text, band_buckets, minhash_signature,
+)
+
+
+TEXT = (
+    "Фотосинтез это процесс образования органических веществ из углекислого газа и воды "
+    "на свету при участии хлорофилла в листьях зеленых растений"
+)
+
+
+def _jaccard(a: str, b: str) -> float:
+    def shingles(text):
+        words = text.lower().split()
+        return {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(len(words) - SHINGLE_SIZE + 1)}
+    sa, sb = shingles(a), shingles(b)
+    return len(sa & sb) / len(sa | sb)
+
+
+def _estimate(a: np.ndarray, b: np.ndarray) -> float:
+    return float(np.mean(a == b))
+
+
+def test_signature_is_deterministic_and_normalized():
+    signature = minhash_signature(TEXT)
+    assert signature.shape == (NUM_PERM,)
+    assert np.array_equal(signature, minhash_signature(TEXT.upper().replace(" ", "  ")))
+
+
+def test_short_answers_are_not_indexed():
+    assert minhash_signature("Да, это так") is None
+
+
+def test_signature_agreement_estimates_jaccard():
+    edited = TEXT.replace("зеленых растений", "растений и водорослей")
+    expected = _jaccard(TEXT, edited)
+    estimate = _estimate(minhash_signature(TEXT), minhash_signature(edited))
+    # Стандартная ошибка оценки при 128 перестановках - около 0.04
+    assert abs(estimate - expected) < 0.15
+
+    unrelated = "Кошка сидела на ковре и смотрела в окно на птиц которые летали над домом весь день"
+    assert _estimate(minhash_signature(TEXT), minhash_signature(unrelated)) < 0.1
+
+
+def test_near_duplicates_share_lsh_buckets():
+    buckets = band_buckets(minhash_signature(TEXT))
+    assert len(buckets) == BANDS
+    assert [band for band, _ in buckets] == list(range(BANDS))
+
+    copied = band_buckets(minhash_signature(TEXT + " и водорослей"))
+    assert set(buckets) & set(copied)
+
+
+def test_attempt_text_orders_open_answers():
+    answers = [
+        {"question_index": 2, "answer_text": "второй"},
+        {"question_index": 0, "answer_text": "первый"},
+        {"question_index": 1, "selected_index": 3},
+    ]
+    assert attempt_text(answers, "документ") == "первый\nвторой\nдокумент"
+    assert attempt_text({"comment": "x"}) == ""
@@ -0,0 +1,74 @@
+"""Локальная проверка открытых ответов и эскалация в LLM (app/services/open_text_grader.py)."""
+import asyncio
+
+import pytest
+
+from app.services import open_text_grader
+from app.services.open_text_grader import (
+    ACCEPT_ABOVE, FALLBACK_THRESHOLD, REJECT_BELOW, UncertainAnswer,
+    escalate_uncertain_answers, grade_open_answers_locally, similarity_scores,
+)
+
+
+REFERENCE = "Фотосинтез - образование органических веществ из углекислого газа и воды на свету"
+QUESTIONS = [
+    {"question": "2 + 2?", "options": ["3", "4"], "correct_answer": "4"},
+    {"question": "Что такое фотосинтез?", "reference_answer": REFERENCE},
+]
+
+
+def test_similarity_scores():
+    same, reworded, unrelated = similarity_scores([
+        (REFERENCE.upper(), [REFERENCE]),
+        ("образование органических веществ из воды и углекислого газа на свету", [REFERENCE]),
+        ("Кошка сидела на ковре", [REFERENCE]),
+    ])
+    assert same == pytest.approx(1.0)
+    assert unrelated < reworded < same
+    assert unrelated <= REJECT_BELOW
+
+
+def test_similarity_uses_best_reference():
+    [score] = similarity_scores([("ответ номер два", ["совсем другое", "ответ номер два"])])
+    assert score == pytest.approx(1.0)
+    assert similarity_scores([("ответ", [])]) == [0.0]
+    assert similarity_scores([]) == []
+
+
+def test_grade_locally_splits_confident_and_uncertain(monkeypatch):
+    monkeypatch.setattr(open_text_grader, "similarity_scores", lambda pairs: [0.9, 0.1, 0.5][:len(pairs)])
+    questions = [QUESTIONS[1]] * 3
+    results, uncertain = grade_open_answers_locally(
+        questions, {0: "верный", 1: "неверный", 2: "может быть", 3: "вне теста"}
+    )
+    assert {i: (r.correct, r.method) for i, r in results.items()} == {
+        0: (True, "similarity"),
+        1: (False, "similarity"),
+    }
+    assert [(u.question_index, u.question, u.similarity) for u in uncertain] == [
+        (2, "Что такое фотосинтез?", 0.5)
+    ]
+    assert ACCEPT_ABOVE > 0.5 > REJECT_BELOW
+
+
+def test_grade_locally_skips_empty_answers():
+    results, uncertain = grade_open_answers_locally(QUESTIONS, {1: "   "})
+    assert results == {} and uncertain == []
+
+
+def test_escalation_uses_llm_verdict_and_falls_back(monkeypatch):
+    async def fake_llm(question, references, answer):
+        if answer == "сломано":
+            raise RuntimeError("LLM недоступна")
+        return {"correct": answer == "да", "feedback": "ok"}
+
+    monkeypatch.setattr(open_text_grader, "grade_open_answer", fake_llm)
+    uncertain = [
+        UncertainAnswer(0, "q", "да", [REFERENCE], 0.4),
+        UncertainAnswer(1, "q", "сломано", [REFERENCE], FALLBACK_THRESHOLD + 0.01),
+        UncertainAnswer(2, "q", "сломано", [REFERENCE], FALLBACK_THRESHOLD - 0.01),
+    ]
+    results = asyncio.run(escalate_uncertain_answers(uncertain))
+    assert (results[0].correct, results[0].method, results[0].feedback) == (True, "llm", "ok")
+    assert (results[1].correct, results[1].method) == (True, "fallback")
+    assert (results[2].correct, results[2].method) == (False, "fallback")
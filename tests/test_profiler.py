@@ -0,0 +1,48 @@
+"""Сэмплирующий профилировщик (app/profiler.py)."""
+import threading
+import time
+
+from app import profiler
+
+
+def _busy(seconds: float):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_sampler_collects_stacks_of_target_thread():
+    sampler = profiler.Sampler("test", interval=0.001)
+    sampler.start()
+    _busy(0.05)
+    sampler.stop()
+    sampler.join()
+    assert sum(sampler.stacks.values()) > 0
+    assert any(frame[0] == "_busy" for stack in sampler.stacks for frame in stack)
+    assert "_busy" in sampler.collapsed()
+
+
+def test_stop_does_not_wait_for_sampler_thread():
+    released = threading.Event()
+    sampler = profiler.Sampler("test", interval=0.001, on_exit=released.set)
+    sampler.start()
+    sampler.stop()
+    # Поток завершается сам и только тогда сообщает о выходе
+    assert released.wait(1.0)
+    sampler.join()
+
+
+def test_only_one_sampler_until_previous_thread_exits():
+    first = profiler.try_start("first", interval=0.001)
+    assert first is not None
+    try:
+        assert profiler.try_start("second") is None
+    finally:
+        profile_id = profiler.finish(first)
+    first.join()
+    assert profiler.get_profile(profile_id) is first
+
+    second = profiler.try_start("second", interval=0.001)
+    assert second is not None
+    profiler.finish(second)
+    second.join()
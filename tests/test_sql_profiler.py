@@ -0,0 +1,56 @@
+"""Формы SQL-операторов и учет запросов профилировщика (app/sql_profiler.py)."""
+import pytest
+
+from app.sql_profiler import (
+    N_PLUS_ONE_THRESHOLD, QueryProfile, _server_timing, assert_max_queries, profile_queries, statement_shape,
+)
+
+
+def test_statement_shape_drops_parameters_casts_and_numbers():
+    assert statement_shape(
+        "SELECT lessons.id \n  FROM lessons WHERE lessons.course_id = $1::UUID LIMIT 10"
+    ) == "SELECT lessons.id FROM lessons WHERE lessons.course_id = ? LIMIT ?"
+    assert statement_shape("UPDATE t SET a = %(a)s WHERE id = %(id_1)s") == "UPDATE t SET a = ? WHERE id = ?"
+
+
+def test_in_lists_of_any_length_have_one_shape():
+    short = statement_shape("SELECT * FROM questions WHERE id IN ($1::VARCHAR, $2::VARCHAR)")
+    long = statement_shape("SELECT * FROM questions WHERE id IN ($1, $2, $3, $4, $5)")
+    assert short == long == "SELECT * FROM questions WHERE id IN (?)"
+
+
+def test_identifiers_with_digits_are_kept():
+    assert statement_shape("SELECT anon_1.id FROM anon_1") == "SELECT anon_1.id FROM anon_1"
+
+
+def test_repeated_shapes_are_reported_as_n_plus_one():
+    profile = QueryProfile()
+    for i in range(N_PLUS_ONE_THRESHOLD):
+        profile.record(f"SELECT * FROM topics WHERE id = {i}", 0.001)
+    profile.record("SELECT 1", 0.001)
+    assert profile.count == N_PLUS_ONE_THRESHOLD + 1
+    assert profile.repeated() == [("SELECT * FROM topics WHERE id = ?", N_PLUS_ONE_THRESHOLD)]
+
+
+def test_server_timing_has_no_statement_text():
+    profile = QueryProfile()
+    profile.record("SELECT secret FROM users WHERE email = 'a@b.c'", 0.0125)
+    assert _server_timing(profile) == b'db;dur=12.5;desc="1 queries"'
+
+
+def test_nested_profiles_all_record():
+    with profile_queries() as outer, profile_queries(track_shapes=False) as inner:
+        for profile in (outer, inner):
+            profile.record("SELECT 1", 0.001)
+    assert outer.shapes and not inner.shapes
+
+
+def test_assert_max_queries():
+    with assert_max_queries(2) as profile:
+        profile.record("SELECT 1", 0.0)
+        profile.record("SELECT 2", 0.0)
+
+    with pytest.raises(AssertionError, match="не больше 1"):
+        with assert_max_queries(1) as profile:
+            profile.record("SELECT 1", 0.0)
+            profile.record("SELECT 2", 0.0)